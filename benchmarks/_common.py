@@ -0,0 +1,65 @@
+"""Helpers shared by the benchmarks: image sizes, messages, common arguments and fresh processes"""
+import math
+import multiprocessing
+import sys
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_WORDS = (
+    "meet", "at", "the", "north", "gate", "noon", "bring", "key", "files", "ready", "42", "tonight"
+)
+
+
+def image_dimensions(megapixels):
+    """Return a 4:3 (width, height) with about megapixels million pixels"""
+    width = max(int(round(math.sqrt(megapixels * 1e6 * 4 / 3))), 1)
+    return width, max(int(round(megapixels * 1e6 / width)), 1)
+
+
+def make_message(size, seed=0):
+    """Return size bytes of word-like text, which compresses about as well as real messages"""
+    rng = np.random.default_rng(seed)
+    words = rng.choice(_WORDS, size // 3 + 1)
+    return " ".join(words).encode()[:size]
+
+
+def peak_rss_bytes():
+    """Return this process's peak resident set size in bytes, or None where unsupported"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def add_size_arguments(parser, default_sizes):
+    """Add the --sizes, --message-kib and --json arguments of the per-size benchmarks"""
+    parser.add_argument(
+        "--sizes", default=default_sizes,
+        help="comma-separated megapixel counts (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--message-kib", type=int, default=16,
+        help="message size in KiB (capped by capacity)"
+    )
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+
+
+def parse_sizes(sizes):
+    """Return the megapixel counts of a comma-separated --sizes value"""
+    return [float(size) for size in sizes.split(",") if size.strip()]
+
+
+def in_fresh_process(function, *args):
+    """Run function(*args) in a new spawned process and return its result
+
+    Each run starts from a clean interpreter, so the peak RSS it reports is
+    its own and no caches carry over from earlier runs.
+    """
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        return pool.apply(function, args)
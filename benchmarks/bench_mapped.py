@@ -0,0 +1,110 @@
+"""Benchmark the memory-mapped raw profile against decoding and re-encoding the cover
+
+Uncompressed BMP, TIFF and .npy covers are hidden in with the raw profile,
+which patches a copy of the file through a memory map, and BMP/TIFF covers
+also with the tiff profile, which decodes the cover and encodes a new
+image. Each run happens in a fresh process so its peak RSS can be compared:
+
+    python benchmarks/bench_mapped.py --sizes 1,12,50
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position,wrong-import-order
+import stego_core  # noqa: E402
+from _common import (  # noqa: E402
+    add_size_arguments, image_dimensions, in_fresh_process, make_message, parse_sizes,
+    peak_rss_bytes
+)
+# pylint: enable=wrong-import-position,wrong-import-order
+
+DEFAULT_SIZES = "1,12,50"
+FORMATS = ("bmp", "tif", "npy")
+
+
+def make_raw_cover(path, width, height, seed=0):
+    """Write a noisy gradient cover as an uncompressed BMP, TIFF or .npy file"""
+    rng = np.random.default_rng(seed)
+    pixels = np.empty((height, width, 3), dtype=np.uint8)
+    pixels[..., 0] = (np.arange(width) * 255 // max(width - 1, 1)).astype(np.uint8)
+    pixels[..., 1] = (np.arange(height) * 255 // max(height - 1, 1)).astype(np.uint8)[:, None]
+    pixels[..., 2] = pixels[..., 0] // 2 + pixels[..., 1] // 2
+    pixels ^= rng.integers(0, 4, pixels.shape, dtype=np.uint8)
+    if path.endswith(".npy"):
+        np.save(path, pixels)
+    else:
+        Image.fromarray(pixels, "RGB").save(path)
+    return path
+
+
+def run_profile(cover_path, profile, message_size):
+    """Hide a message in cover_path with profile and extract it again; runs in a fresh process"""
+    message = make_message(message_size).decode()
+    output_path = stego_core.default_output_path(cover_path, os.path.dirname(cover_path), profile)
+    started = time.perf_counter()
+    hidden = stego_core.hide_message(cover_path, message, output_path, profile=profile)
+    hide_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    extracted = stego_core.extract_message(hidden.output_path, hidden.key)
+    extract_seconds = time.perf_counter() - started
+    if extracted != message:
+        raise RuntimeError(f"round trip through the {profile} profile lost the message")
+    os.remove(hidden.output_path)
+    return {
+        "profile": profile,
+        "hide_seconds": hide_seconds,
+        "extract_seconds": extract_seconds,
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def run_size(megapixels, directory, message_size):
+    """Benchmark every cover format at one size, each run in a fresh process"""
+    width, height = image_dimensions(megapixels)
+    results = []
+    for extension in FORMATS:
+        cover_path = os.path.join(directory, f"cover_{width}x{height}.{extension}")
+        in_fresh_process(make_raw_cover, cover_path, width, height)
+        profiles = ("raw",) if extension == "npy" else ("raw", "tiff")
+        for profile in profiles:
+            result = in_fresh_process(run_profile, cover_path, profile, message_size)
+            results.append(dict(result, megapixels=megapixels, cover=extension))
+        os.remove(cover_path)
+    return results
+
+
+def main(argv=None):
+    """Run the benchmark and print a table (or JSON)"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_size_arguments(parser, DEFAULT_SIZES)
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for megapixels in parse_sizes(args.sizes):
+            results += run_size(megapixels, directory, args.message_kib * 1024)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'MP':>6} {'cover':<6} {'profile':<8} {'hide s':>8} {'extract s':>10} {'peak MiB':>9}")
+    for row in results:
+        rss = row["peak_rss_bytes"]
+        print(
+            f"{row['megapixels']:>6} {row['cover']:<6} {row['profile']:<8} "
+            f"{row['hide_seconds']:>8.3f} "
+            f"{row['extract_seconds']:>10.3f} {rss / 2 ** 20 if rss else float('nan'):>9.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
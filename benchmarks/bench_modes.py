@@ -0,0 +1,136 @@
+"""Benchmark embedding modes: embed/extract throughput (bits/s) and visual error (PSNR)
+
+With --scatter each mode is also run scattered, to compare its cost with
+sequential embedding. Scattered embed/extract times use cached slot
+indexes (as batch jobs reusing a key and image size do); drawing the
+indexes the first time is reported separately as "index ms".
+Run from the repository root:
+
+    python benchmarks/bench_modes.py --size 2000x1500 --payload-kib 128 --scatter
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+import stego_container  # noqa: E402
+import stego_core  # noqa: E402
+import stego_engine  # noqa: E402
+import stego_payload  # noqa: E402
+# pylint: enable=wrong-import-position
+
+
+def synthetic_cover(width, height, seed=0):
+    """Return a smooth RGBA test image with mild noise, like a photo with alpha"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    channels = [
+        (x * 255 // max(width - 1, 1)),
+        (y * 255 // max(height - 1, 1)),
+        ((x + y) * 127 // max(width + height, 1)) + 64,
+        np.full_like(x, 255),
+    ]
+    pixels = np.stack(channels, axis=-1) + rng.integers(-4, 5, (height, width, 4))
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), "RGBA")
+
+
+def psnr(original, modified):
+    """Peak signal-to-noise ratio in dB between two uint8 arrays"""
+    error = np.mean((original.astype(np.float64) - modified.astype(np.float64)) ** 2)
+    return math.inf if error == 0 else 10 * math.log10(255 ** 2 / error)
+
+
+def bench_mode(cover, mode, payload, repeat, scatter=False):
+    """Time embed and extract for one mode and measure PSNR of the result"""
+    layout = stego_core.mode_layout(mode)
+    flags = stego_payload.CODEC_NONE | stego_container.layout_flags(layout)
+    bits = len(payload) * 8
+    seed = index_seconds = None
+    if scatter:
+        flags |= stego_container.FLAG_SCATTER
+        seed = stego_core.scatter_seed(stego_core.generate_key())
+        pixel_count = cover.width * cover.height
+        started = time.perf_counter()
+        stego_engine.scatter_slots(
+            seed, stego_container.body_slots(pixel_count, layout),
+            stego_engine.slot_count(len(payload), layout.depth)
+        )
+        index_seconds = time.perf_counter() - started
+        # Warm the cache the timed runs draw from
+        stego_container.scattered_slots(seed, pixel_count, layout, len(payload))
+
+    embed_times, extract_times = [], []
+    for _ in range(repeat):
+        image = cover.copy()
+        started = time.perf_counter()
+        stego_container.embed_payload(image, payload, flags, seed=seed)
+        embed_times.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        _, extracted = stego_container.extract_payload(image, seed)
+        extract_times.append(time.perf_counter() - started)
+        if extracted != payload:
+            raise RuntimeError(f"{mode}: extracted payload does not match")
+
+    channels = slice(0, layout.channels)
+    return {
+        "mode": mode,
+        "scatter": scatter,
+        "index_seconds": index_seconds,
+        "payload_bits": bits,
+        "embed_bits_per_s": bits / min(embed_times),
+        "extract_bits_per_s": bits / min(extract_times),
+        "psnr_db": psnr(np.asarray(cover)[..., channels], np.asarray(image)[..., channels]),
+    }
+
+
+def main(argv=None):
+    """Run the benchmark and print a table (or JSON)"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="2000x1500", help="cover size as WIDTHxHEIGHT")
+    parser.add_argument("--payload-kib", type=int, default=128, help="payload size in KiB")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per mode (best is kept)")
+    parser.add_argument("--scatter", action="store_true", help="also run every mode scattered")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    width, height = (int(value) for value in args.size.lower().split("x"))
+    cover = synthetic_cover(width, height)
+    rng = np.random.default_rng(1)
+    payload = rng.integers(0, 256, args.payload_kib * 1024, dtype=np.uint8).tobytes()
+
+    results = []
+    for mode in stego_core.MODES:
+        for scatter in (False, True) if args.scatter else (False,):
+            name = f"{mode} scattered" if scatter else mode
+            layout = stego_core.mode_layout(mode)
+            capacity = stego_container.capacity_bits(width * height, layout, scatter)
+            if stego_container.container_bits(len(payload)) > capacity:
+                print(f"skipping {name}: payload does not fit", file=sys.stderr)
+                continue
+            results.append(bench_mode(cover, mode, payload, args.repeat, scatter))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':<17} {'embed Mbit/s':>13} {'extract Mbit/s':>15} {'PSNR dB':>9}"
+          f" {'index ms':>9}")
+    for result in results:
+        name = f"{result['mode']} scattered" if result["scatter"] else result["mode"]
+        index = f"{result['index_seconds'] * 1000:.1f}" if result["scatter"] else "-"
+        print(
+            f"{name:<17} {result['embed_bits_per_s'] / 1e6:>13.1f} "
+            f"{result['extract_bits_per_s'] / 1e6:>15.1f} {result['psnr_db']:>9.2f} {index:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Benchmark output profiles: encode time against file size for a stego-image
+
+Run from the repository root:
+
+    python benchmarks/bench_output.py --size 2000x1500
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position,wrong-import-order
+import stego_container  # noqa: E402
+import stego_output  # noqa: E402
+from bench_modes import synthetic_cover  # noqa: E402
+# pylint: enable=wrong-import-position,wrong-import-order
+
+
+def stego_image(width, height, payload_kib):
+    """Return a synthetic RGB cover carrying a random payload, like a real stego-image"""
+    image = synthetic_cover(width, height).convert("RGB")
+    capacity = stego_container.capacity_bits(width * height) // 8 - stego_container.HEADER.size
+    size = min(payload_kib * 1024, capacity)
+    payload = np.random.default_rng(2).integers(0, 256, size, dtype=np.uint8).tobytes()
+    return stego_container.embed_payload(image, payload)
+
+
+def bench_profile(image, profile, directory, repeat):
+    """Time saving image with one profile and report the resulting file size"""
+    path = os.path.join(directory, f"bench_{profile}{stego_output.get_profile(profile).extension}")
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        stego_output.save_image(image, path, profile)
+        times.append(time.perf_counter() - started)
+    size = os.path.getsize(path)
+    pixels = image.width * image.height
+    return {
+        "profile": profile,
+        "encode_seconds": min(times),
+        "megapixels_per_s": pixels / 1e6 / min(times),
+        "file_bytes": size,
+        "bits_per_pixel": size * 8 / pixels,
+    }
+
+
+def main(argv=None):
+    """Run the benchmark and print a table (or JSON)"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="2000x1500", help="image size as WIDTHxHEIGHT")
+    parser.add_argument("--payload-kib", type=int, default=64, help="embedded payload size in KiB")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per profile (best is kept)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    width, height = (int(value) for value in args.size.lower().split("x"))
+    image = stego_image(width, height, args.payload_kib)
+    with tempfile.TemporaryDirectory() as directory:
+        results = [
+            bench_profile(image, profile, directory, args.repeat)
+            for profile, chosen in stego_output.PROFILES.items() if chosen.format
+        ]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'profile':<8} {'encode s':>9} {'MP/s':>7} {'file KiB':>10} {'bits/px':>8}")
+    for result in results:
+        print(
+            f"{result['profile']:<8} {result['encode_seconds']:>9.3f} "
+            f"{result['megapixels_per_s']:>7.1f} "
+            f"{result['file_bytes'] / 1024:>10.0f} {result['bits_per_pixel']:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
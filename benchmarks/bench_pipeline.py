@@ -0,0 +1,139 @@
+"""Benchmark a pipelined batch against hiding in each cover one after another
+
+Generates a set of covers and a manifest, hides a message in every cover
+sequentially (decode, embed, encode, write per image) and then through the
+read → embed → encode pipeline of `batch --pipeline`. The report shows each
+stage's busy time and utilisation, and the wall time the pipeline could
+reach at best: that of its slowest stage.
+
+    python benchmarks/bench_pipeline.py --images 24 --readers 2 --embedders 2 --encoders 4
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position,wrong-import-order
+import stego_batch  # noqa: E402
+import stego_core  # noqa: E402
+import stego_output  # noqa: E402
+from _common import make_message  # noqa: E402
+from bench_stages import make_cover  # noqa: E402
+# pylint: enable=wrong-import-position,wrong-import-order
+
+
+def make_rows(directory, images, width, height, message_size, profile):
+    """Write images covers into directory and return manifest rows hiding a message in each"""
+    message = make_message(message_size).decode()
+    rows = []
+    for index in range(images):
+        cover_path = make_cover(os.path.join(directory, f"cover_{index}.png"), width, height,
+                                seed=index)
+        rows.append({
+            "cover": cover_path,
+            "message": message,
+            "output": stego_core.default_output_path(
+                cover_path, os.path.join(directory, "out"), profile
+            ),
+            "key": None,
+            "mode": stego_core.DEFAULT_MODE,
+            "profile": profile,
+            "scatter": False,
+        })
+    return rows
+
+
+def run_sequential(rows):
+    """Hide in every row one after another, returning the wall time"""
+    started = time.perf_counter()
+    for row in rows:
+        result = stego_batch.hide_row(row)
+        if result["status"] != "ok":
+            raise RuntimeError(f"{row['cover']}: {result['error']}")
+    return time.perf_counter() - started
+
+
+def run_pipelined(rows, report_path, readers, embedders, encoders, queue_size):
+    """Hide in every row through the pipeline, returning its report"""
+    succeeded, failed, report = stego_batch.run_pipeline(
+        rows, report_path, readers, embedders, encoders, queue_size
+    )
+    if failed:
+        raise RuntimeError(f"{failed} of {succeeded + failed} images failed; see {report_path}")
+    return report
+
+
+def main(argv=None):
+    """Run both ways and print stage utilisation (or JSON)"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--images", type=int, default=16,
+        help="covers to hide in (default: %(default)s)"
+    )
+    parser.add_argument("--size", default="2000x1500", help="cover size as WIDTHxHEIGHT")
+    parser.add_argument("--message-kib", type=int, default=16, help="message size in KiB")
+    parser.add_argument(
+        "--profile", default=stego_output.DEFAULT_PROFILE,
+        choices=[name for name, profile in stego_output.PROFILES.items() if profile.format],
+        help="output profile for the encode stage"
+    )
+    parser.add_argument(
+        "--readers", type=int, default=stego_batch.DEFAULT_READERS,
+        help="reader threads"
+    )
+    parser.add_argument("--embedders", type=int, help="embed threads (default: CPU count)")
+    parser.add_argument(
+        "--encoders", type=int, default=stego_batch.DEFAULT_ENCODERS,
+        help="encoder threads"
+    )
+    parser.add_argument(
+        "--queue-size", type=int,
+        help="items queued per stage (default: 2 per worker)"
+    )
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    width, height = (int(value) for value in args.size.lower().split("x"))
+    with tempfile.TemporaryDirectory() as directory:
+        rows = make_rows(directory, args.images, width, height, args.message_kib * 1024,
+                         args.profile)
+        os.makedirs(os.path.join(directory, "out"))
+        sequential = run_sequential(rows)
+        report = run_pipelined(rows, os.path.join(directory, "report.jsonl"), args.readers,
+                               args.embedders, args.encoders, args.queue_size)
+
+    # The pipeline can finish no sooner than its busiest stage, spread over that stage's workers
+    bound = max(stage["busy_seconds"] / stage["workers"] for stage in report["stages"])
+    result = {
+        "images": args.images,
+        "size": f"{width}x{height}",
+        "profile": args.profile,
+        "cpus": os.cpu_count(),
+        "sequential_seconds": round(sequential, 6),
+        "pipelined_seconds": report["seconds"],
+        "slowest_stage_seconds": round(bound, 6),
+        "stages": report["stages"],
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{'stage':<8} {'workers':>7} {'busy s':>8} {'starved s':>10} {'blocked s':>10}"
+          f" {'utilisation':>12}")
+    for stage in report["stages"]:
+        print(
+            f"{stage['stage']:<8} {stage['workers']:>7} {stage['busy_seconds']:>8.2f}"
+            f" {stage['starved_seconds']:>10.2f}"
+            f" {stage['blocked_seconds']:>10.2f} {stage['utilisation'] * 100:>11.0f}%"
+        )
+    print(f"{args.images} images of {width}x{height} on {os.cpu_count()} CPUs:"
+          f" sequential {sequential:.2f} s,"
+          f" pipelined {report['seconds']:.2f} s ({sequential / report['seconds']:.2f}x),"
+          f" slowest stage {bound:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""Benchmark every stage of the hide and extract pipelines across image sizes
+
+Each image size runs in a fresh process, so the peak RSS reported is that
+of one hide + extract round trip. Results can be saved as JSON and compared
+with a run from another commit:
+
+    python benchmarks/bench_stages.py --sizes 0.1,1,12 --output before.json
+    python benchmarks/bench_stages.py --sizes 0.1,1,12 --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from cryptography.fernet import Fernet
+from PIL import Image
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+# pylint: disable=wrong-import-position,wrong-import-order
+import stego_container  # noqa: E402
+import stego_core  # noqa: E402
+import stego_engine  # noqa: E402
+import stego_output  # noqa: E402
+import stego_payload  # noqa: E402
+from _common import (  # noqa: E402
+    add_size_arguments, image_dimensions, in_fresh_process, make_message, parse_sizes,
+    peak_rss_bytes
+)
+# pylint: enable=wrong-import-position,wrong-import-order
+
+DEFAULT_SIZES = "0.1,1,5,12,50"
+
+HIDE_STAGES = ("decode", "compress", "encrypt", "bits", "embed", "store", "save")
+EXTRACT_STAGES = ("extract_read", "decrypt", "decompress")
+STAGES = HIDE_STAGES + EXTRACT_STAGES
+
+def make_cover(path, width, height, seed=0):
+    """Write a smooth gradient PNG with mild noise, like a photo, without large temporaries"""
+    rng = np.random.default_rng(seed)
+    pixels = np.empty((height, width, 3), dtype=np.uint8)
+    column = (np.arange(width) * 255 // max(width - 1, 1)).astype(np.uint8)
+    for top in range(0, height, 512):
+        rows = np.arange(top, min(top + 512, height))
+        band = pixels[top:top + len(rows)]
+        band[..., 0] = column
+        band[..., 1] = (rows * 255 // max(height - 1, 1)).astype(np.uint8)[:, None]
+        band[..., 2] = (band[..., 0] // 2 + band[..., 1] // 2)
+        band ^= rng.integers(0, 4, band.shape, dtype=np.uint8)
+    Image.fromarray(pixels, "RGB").save(path, compress_level=1)
+    return path
+
+
+def timed(timings, stage, function, *args, **kwargs):
+    """Run function, keeping the fastest time seen for stage"""
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    elapsed = time.perf_counter() - started
+    timings[stage] = min(timings.get(stage, elapsed), elapsed)
+    return result
+
+
+def run_stages(cover_path, message_size, profile, repeat):
+    """Time each pipeline stage on one cover (in its own process) and return a result row"""
+    fernet = Fernet(Fernet.generate_key())
+    extension = stego_output.get_profile(profile).extension
+    output_path = os.path.splitext(cover_path)[0] + "_stego" + extension
+    with Image.open(cover_path) as probe:
+        width, height = probe.size
+    capacity = stego_container.capacity_bits(width * height) // 8
+    # Leave room for the header, Fernet overhead and an incompressible worst case
+    message = make_message(min(message_size, max(capacity // 2 - 200, 1)))
+
+    timings = {}
+    for _ in range(repeat):
+        image = timed(timings, "decode", lambda: stego_engine.normalize_image(_loaded(cover_path)))
+        codec_id, body = timed(timings, "compress", stego_payload.compress, message)
+        token = timed(timings, "encrypt", _encrypt, fernet, body)
+        streams = timed(timings, "bits", stego_container.container_streams, token, codec_id)
+        block = timed(timings, "embed", _embed, image, streams)
+        timed(timings, "store", stego_engine.store_block, image, block)
+        timed(timings, "save", stego_output.save_image, image, output_path, profile)
+
+        header, payload = timed(timings, "extract_read", stego_core.extract_token, output_path)
+        body_out = timed(timings, "decrypt", fernet.decrypt, stego_payload.text_token(payload))
+        recovered = timed(
+            timings, "decompress", stego_payload.decompress,
+            header.flags & stego_payload.CODEC_MASK, body_out
+        )
+        if recovered != message:
+            raise RuntimeError(f"{cover_path}: round trip did not return the message")
+        del image, block
+
+    return {
+        "megapixels": round(width * height / 1e6, 3),
+        "width": width,
+        "height": height,
+        "message_bytes": len(message),
+        "payload_bytes": len(token),
+        "output_bytes": os.path.getsize(output_path),
+        "seconds": {stage: round(timings[stage], 6) for stage in STAGES},
+        "hide_seconds": round(sum(timings[stage] for stage in HIDE_STAGES), 6),
+        "extract_seconds": round(sum(timings[stage] for stage in EXTRACT_STAGES), 6),
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def _loaded(path):
+    """Open and fully decode an image"""
+    image = Image.open(path)
+    image.load()
+    return image
+
+
+def _encrypt(fernet, body):
+    """Encrypt body and convert the token to the raw bytes the container stores"""
+    return stego_payload.raw_token(fernet.encrypt(body))
+
+
+def _embed(image, streams):
+    """Write container streams into a pixel block copy of image (the LSB loop)"""
+    block = stego_engine.pixel_block(image)
+    for values, offset, layout in streams:
+        stego_engine.write_block(block, values, offset, layout)
+    return block
+
+
+def run_size(megapixels, directory, message_size, profile, repeat):
+    """Generate a cover and benchmark it, each step in a fresh process"""
+    width, height = image_dimensions(megapixels)
+    cover_path = os.path.join(directory, f"cover_{width}x{height}.png")
+    in_fresh_process(make_cover, cover_path, width, height)
+    return in_fresh_process(run_stages, cover_path, message_size, profile, repeat)
+
+
+def environment():
+    """Describe the machine and code version a run was made on"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pillow": Image.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def print_table(results, baseline=None):
+    """Print seconds per stage, or the ratio to a baseline run when one is given"""
+    base = {row["megapixels"]: row for row in (baseline or {}).get("results", [])}
+    columns = STAGES + ("hide_seconds", "extract_seconds")
+    headings = " ".join(f"{name.replace('_seconds', ''):>12}" for name in columns)
+    print(f"{'MP':>6} {headings} {'peak MiB':>9}")
+    for row in results:
+        values = dict(row["seconds"], hide_seconds=row["hide_seconds"],
+                      extract_seconds=row["extract_seconds"])
+        old = base.get(row["megapixels"])
+        if old:
+            old_values = dict(old["seconds"], hide_seconds=old["hide_seconds"],
+                              extract_seconds=old["extract_seconds"])
+            cells = [_ratio(old_values[name], values[name]) for name in columns]
+        else:
+            cells = [f"{values[name]:.4f}" for name in columns]
+        rss = row["peak_rss_bytes"]
+        print(f"{row['megapixels']:>6} " + " ".join(f"{cell:>12}" for cell in cells)
+              + f" {rss / 2 ** 20 if rss else float('nan'):>9.0f}")
+    if baseline:
+        commit = baseline["environment"].get("commit") or "baseline"
+        print(f"(speedup against {commit}: >1x is faster)")
+
+
+def _ratio(old, new):
+    """Format old / new as a speedup"""
+    return f"{old / new:.2f}x" if new else "-"
+
+
+def main(argv=None):
+    """Run the benchmark over every requested size"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_size_arguments(parser, DEFAULT_SIZES)
+    parser.add_argument(
+        "--profile", default=stego_output.DEFAULT_PROFILE,
+        choices=[name for name, profile in stego_output.PROFILES.items() if profile.format],
+        help="output profile for the save stage"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3,
+        help="runs per size (fastest is kept per stage)"
+    )
+    parser.add_argument("-o", "--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON from an earlier run to show speedups against")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for megapixels in parse_sizes(args.sizes):
+            results.append(run_size(megapixels, directory, args.message_kib * 1024, args.profile,
+                                    args.repeat))
+            print(f"{megapixels} MP done", file=sys.stderr)
+
+    report = {
+        "environment": environment(),
+        "profile": args.profile,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+    print_table(results, baseline)
+
+
+if __name__ == "__main__":
+    main()
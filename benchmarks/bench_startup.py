@@ -0,0 +1,127 @@
+"""Measure cold-start cost: per-module import time and the GUI's time to first paint
+
+Import times come from `python -X importtime`, each run in a fresh
+interpreter. Time to first paint launches the GUI (from source, or the
+packaged executable with --executable) with STEGOEXPRESS_STARTUP_PROBE set,
+so it exits as soon as the first frame is drawn, and is checked against
+--target-ms. The paint run needs a display and customtkinter.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --executable dist/steganography_app --target-ms 1500
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = "steganography_app,stegoexpress,stego_core,stego_mail"
+FIRST_PAINT_TARGET_MS = 1000
+STARTUP_PROBE_ENV = "STEGOEXPRESS_STARTUP_PROBE"
+
+
+def import_times(module):
+    """Import module in a fresh interpreter, returning [(depth, name, self_us, cumulative_us)]"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_DIR, capture_output=True, text=True, check=False
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((depth, name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def report_imports(module, repeat, top):
+    """Print the fastest total import time of module and its slowest direct imports"""
+    runs = []
+    for _ in range(repeat):
+        try:
+            runs.append(import_times(module))
+        except RuntimeError as e:
+            print(f"{module}: cannot import ({e})")
+            return
+    best = min(runs, key=lambda rows: rows[-1][3])
+    total_ms = best[-1][3] / 1000
+    print(f"{module}: {total_ms:.1f} ms (best of {repeat})")
+    children = sorted((row for row in best if row[0] == 1), key=lambda row: -row[3])
+    for _, name, _, cumulative_us in children[:top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+
+def first_paint(command):
+    """Launch the GUI with the startup probe, returning (seconds to first frame, loaded backends)"""
+    env = dict(os.environ, **{STARTUP_PROBE_ENV: "1"})
+    started = time.perf_counter()
+    completed = subprocess.run(command, cwd=REPO_DIR, env=env, capture_output=True, text=True,
+                               check=False)
+    elapsed = time.perf_counter() - started
+    for line in completed.stdout.splitlines():
+        if line.startswith("first paint:"):
+            backends = line.split(":", 1)[1].strip()
+            return elapsed, backends.split(",") if backends else []
+    message = (completed.stderr.strip().splitlines() or ["no first-paint report"])[-1]
+    raise RuntimeError(message)
+
+
+def main(argv=None):
+    """Report import times, then time to first paint against the target"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--modules", default=DEFAULT_MODULES,
+        help="comma-separated modules to time imports of"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5,
+        help="runs per measurement (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--top", type=int, default=8,
+        help="slowest direct imports listed per module"
+    )
+    parser.add_argument(
+        "--executable",
+        help="time this packaged GUI instead of steganography_app.py"
+    )
+    parser.add_argument(
+        "--target-ms", type=float, default=FIRST_PAINT_TARGET_MS,
+        help="time to first paint to stay under (default: %(default)s ms)"
+    )
+    parser.add_argument("--no-paint", action="store_true", help="only measure import times")
+    args = parser.parse_args(argv)
+
+    if not args.executable:
+        for module in (name.strip() for name in args.modules.split(",") if name.strip()):
+            report_imports(module, args.repeat, args.top)
+    if args.no_paint:
+        return 0
+
+    command = [args.executable] if args.executable else [sys.executable, "steganography_app.py"]
+    try:
+        samples = [first_paint(command) for _ in range(args.repeat)]
+    except (OSError, RuntimeError) as e:
+        print(f"first paint: not measured ({e})")
+        return 0
+    times_ms = [seconds * 1000 for seconds, _ in samples]
+    median_ms = statistics.median(times_ms)
+    backends = samples[-1][1]
+    print(f"first paint: median {median_ms:.0f} ms, best {min(times_ms):.0f} ms"
+          f" (target {args.target_ms:.0f} ms)")
+    print(f"backends loaded before first paint: {', '.join(backends) or 'none'}")
+    if median_ms > args.target_ms:
+        print("first paint is over target")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+"""Load-test the local HTTP service: requests/sec and latency percentiles per endpoint
+
+Runs against a service that is already up (--url), or starts one on a free
+port with --spawn. Each client thread keeps one connection open and sends
+requests back to back. A 503 from the service's backpressure is resent after
+its Retry-After delay and counted as rejected, not failed; latencies include
+those waits, so req/s and percentiles measure completed requests.
+
+    python benchmarks/load_service.py --spawn --endpoint hide --requests 200 --concurrency 8
+    python benchmarks/load_service.py --url http://127.0.0.1:8765 --endpoint extract
+"""
+import argparse
+import http.client
+import io
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+# pylint: disable=wrong-import-position,wrong-import-order
+from bench_modes import synthetic_cover  # noqa: E402
+# pylint: enable=wrong-import-position,wrong-import-order
+
+ENDPOINTS = ("hide", "extract", "capacity")
+
+# Wait before resending a 503 that names no Retry-After
+DEFAULT_RETRY_SECONDS = 1.0
+
+
+def cover_png(megapixels):
+    """Return a synthetic 4:3 cover of about megapixels million pixels as PNG bytes"""
+    width = max(int((megapixels * 1e6 * 4 / 3) ** 0.5), 1)
+    height = max(int(megapixels * 1e6 / width), 1)
+    buffer = io.BytesIO()
+    synthetic_cover(width, height).convert("RGB").save(buffer, "PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+def multipart(fields):
+    """Encode {name: (file name or None, bytes)} as a multipart/form-data body"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, (file_name, data) in fields.items():
+        disposition = f'form-data; name="{name}"'
+        if file_name:
+            disposition += f'; filename="{file_name}"'
+        head = f"--{boundary}\r\nContent-Disposition: {disposition}\r\n\r\n"
+        parts.append(head.encode() + data + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return f"multipart/form-data; boundary={boundary}", b"".join(parts)
+
+
+def build_request(endpoint, url, cover, message):
+    """Return (path, headers, body) for an endpoint request, preparing a stego-image for extract"""
+    if endpoint == "capacity":
+        return "/capacity", {}, cover
+    content_type, body = multipart({
+        "cover": ("cover.png", cover), "message": (None, message.encode())
+    })
+    if endpoint == "hide":
+        return "/hide", {"Content-Type": content_type}, body
+    connection = _connect(url)
+    connection.request("POST", "/hide", body, {"Content-Type": content_type})
+    response = connection.getresponse()
+    stego = response.read()
+    if response.status != 200:
+        raise RuntimeError(f"could not prepare a stego-image: {response.status} {stego[:200]!r}")
+    key = response.getheader("X-Stego-Key")
+    connection.close()
+    return "/extract", {"X-Stego-Key": key}, stego
+
+
+def run_load(url, request, total, concurrency):
+    """Send total requests from concurrency threads, returning (latencies, statuses, seconds)"""
+    path, headers, body = request
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    remaining = [total]
+
+    def client():
+        connection = _connect(url)
+        while True:
+            with lock:
+                if not remaining[0]:
+                    break
+                remaining[0] -= 1
+            started = time.perf_counter()
+            while True:
+                retry_after = None
+                try:
+                    connection.request("POST", path, body, headers)
+                    response = connection.getresponse()
+                    response.read()
+                    status = response.status
+                    retry_after = response.getheader("Retry-After")
+                    if response.getheader("Connection", "").lower() == "close":
+                        connection.close()
+                        connection = _connect(url)
+                except (OSError, http.client.HTTPException):
+                    status = "error"
+                    connection.close()
+                    connection = _connect(url)
+                if status != 503:
+                    break
+                # Rejected by backpressure: wait as asked and resend, without using up the budget
+                with lock:
+                    statuses[503] = statuses.get(503, 0) + 1
+                time.sleep(_retry_delay(retry_after))
+            elapsed = time.perf_counter() - started
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    latencies.append(elapsed)
+        connection.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - started
+
+
+def percentile(values, fraction):
+    """Return the nearest-rank percentile of values"""
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] if ordered else float("nan")
+
+
+def spawn_service(workers):
+    """Start `stegoexpress.py serve` on a free port, returning (process, url)"""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    command = [sys.executable, os.path.join(REPO_DIR, "stegoexpress.py"), "serve",
+               "--port", str(port), "--quiet"]
+    if workers:
+        command += ["--workers", str(workers)]
+    # The service outlives this function; the caller terminates it
+    process = subprocess.Popen(command)  # pylint: disable=consider-using-with
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            connection = _connect(url)
+            connection.request("GET", "/health")
+            connection.getresponse().read()
+            connection.close()
+            return process, url
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("service did not start")
+
+
+def _retry_delay(retry_after):
+    """Return the seconds to wait before resending a request the service rejected"""
+    try:
+        return max(float(retry_after), 0.0)
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_SECONDS
+
+
+def _connect(url):
+    """Open a keep-alive connection to the service"""
+    parts = urlsplit(url)
+    return http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=300)
+
+
+def main(argv=None):
+    """Run the load test and print (or emit as JSON) its throughput and latency"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--url", default="http://127.0.0.1:8765",
+        help="service to test (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--spawn", action="store_true",
+        help="start a service on a free port for the test"
+    )
+    parser.add_argument("--workers", type=int, help="worker processes for a spawned service")
+    parser.add_argument(
+        "--endpoint", default="hide", choices=ENDPOINTS,
+        help="endpoint to load (default: hide)"
+    )
+    parser.add_argument(
+        "--requests", type=int, default=100,
+        help="requests to send (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=4,
+        help="client threads (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--megapixels", type=float, default=1.0,
+        help="cover size (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--message", default="Meet at the north gate at noon",
+        help="message to hide"
+    )
+    parser.add_argument("--json", action="store_true", help="print JSON instead of text")
+    args = parser.parse_args(argv)
+
+    process = None
+    url = args.url
+    if args.spawn:
+        process, url = spawn_service(args.workers)
+    try:
+        request = build_request(args.endpoint, url, cover_png(args.megapixels), args.message)
+        latencies, statuses, seconds = run_load(url, request, args.requests, args.concurrency)
+    finally:
+        if process is not None:
+            # SIGINT lets the service shut its worker pool down cleanly
+            process.send_signal(signal.SIGINT if os.name == "posix" else signal.SIGTERM)
+            process.wait()
+
+    report = {
+        "endpoint": args.endpoint,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "megapixels": args.megapixels,
+        "ok": statuses.get(200, 0),
+        "rejected": statuses.get(503, 0),
+        "failed": sum(count for status, count in statuses.items() if status not in (200, 503)),
+        "seconds": round(seconds, 3),
+        "requests_per_second": round(statuses.get(200, 0) / seconds, 2) if seconds else None,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "max_ms": round(max(latencies, default=float("nan")) * 1000, 1),
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{args.endpoint}: {report['ok']} ok, {report['rejected']} rejected (503) and resent,"
+              f" {report['failed']} failed"
+              f" in {report['seconds']} s")
+        print(f"{report['requests_per_second']} req/s, p50 {report['p50_ms']} ms,"
+              f" p99 {report['p99_ms']} ms,"
+              f" max {report['max_ms']} ms")
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,32 @@
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
-from cryptography.fernet import Fernet
-from PIL import Image, ImageTk
-import smtplib
-import base64
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
 import threading
-import subprocess
-import webbrowser
-import http.server
-import socketserver
+from concurrent.futures import ThreadPoolExecutor
 import sys
 import os
+import time
+
+import stego_lazy
+import stego_options
+import stego_output
+import stego_preview
+import stego_trace
+
+# The crypto, imaging and mail backends load on first use, or from the
+# warm-up thread started once the window is on screen
+stego_core = stego_lazy.LazyModule("stego_core")
+stego_batch = stego_lazy.LazyModule("stego_batch")
+stego_mail = stego_lazy.LazyModule("stego_mail")
+ImageTk = stego_lazy.LazyModule("PIL.ImageTk")
+WARM_UP_MODULES = ("stego_core", "stego_mail", "PIL.ImageTk")
+WARM_UP_DELAY_MS = 200
+
+# Typing pause before the capacity label is refreshed; sizing a message
+# compresses it with every codec, which is too slow to run per keystroke
+CAPACITY_DEBOUNCE_MS = 300
+
+# Set by benchmarks/bench_startup.py: quit after the first frame, reporting loaded backends
+STARTUP_PROBE_ENV = "STEGOEXPRESS_STARTUP_PROBE"
 
 
 # Color Palette
@@ -30,6 +42,60 @@ COLORS = {
 }
 
 
+class JobCancelled(Exception):
+    """Raised inside a background job once the user has cancelled it"""
+
+
+class BackgroundJob:
+    """Runs one task at a time on a worker thread, reporting back through root.after"""
+    
+    def __init__(self, root):
+        self.root = root
+        self.thread = None
+        self.cancel_event = threading.Event()
+        self.on_progress = None
+        
+    def is_running(self):
+        """Return True while the worker thread is alive"""
+        return self.thread is not None and self.thread.is_alive()
+        
+    def start(self, task, on_progress, on_success, on_error, on_cancel):
+        """Run task(progress) in the background; returns False if a job is already running"""
+        if self.is_running():
+            return False
+        self.cancel_event.clear()
+        self.on_progress = on_progress
+        self.thread = threading.Thread(
+            target=self.run,
+            args=(task, on_success, on_error, on_cancel),
+            daemon=True
+        )
+        self.thread.start()
+        return True
+        
+    def cancel(self):
+        """Ask the running task to stop at its next progress report"""
+        if self.is_running():
+            self.cancel_event.set()
+            
+    def report(self, fraction):
+        """Progress callback handed to the task; raises JobCancelled after cancel()"""
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+        self.root.after(0, self.on_progress, fraction)
+        
+    def run(self, task, on_success, on_error, on_cancel):
+        """Worker thread body: run the task and post its outcome to the Tk thread"""
+        try:
+            result = task(self.report)
+        except JobCancelled:
+            self.root.after(0, on_cancel)
+        except Exception as e:
+            self.root.after(0, on_error, e)
+        else:
+            self.root.after(0, on_success, result)
+
+
 class SteganographyApp:
     def __init__(self, root):
         self.root = root
@@ -44,6 +110,43 @@ class SteganographyApp:
         self.image_path = ctk.StringVar()
         self.generated_key = ctk.StringVar()
         self.stego_image_path = None
+        self.cover_capacity = {}
+        self.cover_scatter_capacity = {}
+        self.capacity_update = None
+        self.embed_mode = ctk.StringVar(value=stego_options.DEFAULT_MODE)
+        self.scatter_embed = ctk.BooleanVar(value=False)
+        self.payload_file_path = ctk.StringVar()
+        self.output_dir = ctk.StringVar()
+        self.output_profile = ctk.StringVar(value=stego_output.DEFAULT_PROFILE)
+        self.smtp_security = ctk.StringVar(value="starttls")
+        
+        # Thumbnails are decoded on one worker thread and kept in an LRU cache;
+        # preview_requests holds the latest path asked for per preview label
+        self.thumbnails = stego_preview.ThumbnailCache()
+        self.preview_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="stego-preview"
+        )
+        self.preview_requests = {}
+        
+        # Pooled SMTP sessions, reused while the server settings stay the same
+        self.mail_queue = None
+        self.mail_config = None
+        
+        # Every hide, extract and send is logged with its stage timings;
+        # traces holds the latest finished trace per tab
+        stego_trace.configure(
+            os.environ.get("STEGOEXPRESS_TRACE_LOG") or stego_trace.DEFAULT_LOG_PATH
+        )
+        self.traces = {}
+        self.profile_next = ctk.BooleanVar(value=False)
+        
+        # Load the backends in the background once the first frame is drawn
+        self.root.after(WARM_UP_DELAY_MS, stego_lazy.warm_up, WARM_UP_MODULES)
+        
+        # One background job per tab, with its progress bar and cancel button
+        self.jobs = {"hide": BackgroundJob(self.root), "extract": BackgroundJob(self.root)}
+        self.progress_bars = {}
+        self.cancel_buttons = {}
         
         # Main container
         self.main_frame = ctk.CTkFrame(self.root, fg_color=COLORS["bg_primary"])
@@ -83,6 +186,14 @@ class SteganographyApp:
         )
         self.status_label.pack(side="left", padx=10, pady=5)
         
+        ctk.CTkCheckBox(
+            self.status_frame,
+            text="Profile next operation",
+            variable=self.profile_next,
+            font=("Arial", 11),
+            text_color=COLORS["text_secondary"]
+        ).pack(side="right", padx=10, pady=5)
+        
     def build_hide_tab(self):
         """Build the Hide Message tab UI"""
         # Create scrollable frame for all content
@@ -156,6 +267,137 @@ class SteganographyApp:
             font=("Arial", 11)
         )
         self.message_entry.pack(side="left", padx=10, pady=10, fill="x", expand=True)
+        self.message_entry.bind("<KeyRelease>", self.schedule_capacity_update)
+        
+        # Optional file to hide instead of the text message
+        file_frame = ctk.CTkFrame(scrollable_frame, fg_color=COLORS["bg_secondary"])
+        file_frame.pack(fill="x", padx=15, pady=5)
+        
+        ctk.CTkLabel(
+            file_frame,
+            text="Or Hide a File:",
+            font=("Arial", 13, "bold"),
+            text_color=COLORS["text_primary"]
+        ).pack(side="left", padx=10, pady=10)
+        
+        ctk.CTkEntry(
+            file_frame,
+            textvariable=self.payload_file_path,
+            width=400,
+            height=35,
+            placeholder_text="Any file (PDF, archive, key...) replaces the message",
+            font=("Arial", 11),
+            state="readonly"
+        ).pack(side="left", padx=10, pady=10)
+        
+        ctk.CTkButton(
+            file_frame,
+            text="Browse",
+            command=self.browse_payload_file,
+            width=100,
+            height=35,
+            fg_color=COLORS["accent"],
+            hover_color="#0099CC",
+            font=("Arial", 12, "bold")
+        ).pack(side="left", padx=10, pady=10)
+        
+        ctk.CTkButton(
+            file_frame,
+            text="Clear",
+            command=self.clear_payload_file,
+            width=80,
+            height=35,
+            fg_color=COLORS["border"],
+            hover_color=COLORS["bg_primary"],
+            font=("Arial", 12, "bold")
+        ).pack(side="left", padx=10, pady=10)
+        
+        # Live remaining capacity of the selected cover
+        self.capacity_label = ctk.CTkLabel(
+            scrollable_frame,
+            text="Capacity: select a cover image",
+            font=("Arial", 11),
+            text_color=COLORS["text_secondary"]
+        )
+        self.capacity_label.pack(anchor="w", padx=25)
+        
+        # Embedding mode: channels and LSBs per channel
+        mode_frame = ctk.CTkFrame(scrollable_frame, fg_color=COLORS["bg_secondary"])
+        mode_frame.pack(fill="x", padx=15, pady=5)
+        
+        ctk.CTkLabel(
+            mode_frame,
+            text="Embedding Mode:",
+            font=("Arial", 13, "bold"),
+            text_color=COLORS["text_primary"]
+        ).pack(side="left", padx=10, pady=10)
+        
+        ctk.CTkOptionMenu(
+            mode_frame,
+            values=stego_options.MODES,
+            variable=self.embed_mode,
+            command=self.update_capacity,
+            width=120,
+            fg_color=COLORS["accent"],
+            button_color="#0099CC"
+        ).pack(side="left", padx=10, pady=10)
+        
+        # Scattered payloads are spread over the image in a key-derived order
+        ctk.CTkCheckBox(
+            mode_frame,
+            text="Scatter",
+            variable=self.scatter_embed,
+            command=self.update_capacity,
+            font=("Arial", 11),
+            text_color=COLORS["text_primary"]
+        ).pack(side="left", padx=10, pady=10)
+        
+        ctk.CTkLabel(
+            mode_frame,
+            text="rgb = colour channels, rgba = with alpha; number = LSBs per channel",
+            font=("Arial", 11),
+            text_color=COLORS["text_secondary"]
+        ).pack(side="left", padx=10, pady=10)
+        
+        # Output directory and encoder profile
+        output_frame = ctk.CTkFrame(scrollable_frame, fg_color=COLORS["bg_secondary"])
+        output_frame.pack(fill="x", padx=15, pady=5)
+        
+        ctk.CTkLabel(
+            output_frame,
+            text="Save To:",
+            font=("Arial", 13, "bold"),
+            text_color=COLORS["text_primary"]
+        ).pack(side="left", padx=10, pady=10)
+        
+        ctk.CTkEntry(
+            output_frame,
+            textvariable=self.output_dir,
+            width=300,
+            height=35,
+            placeholder_text="Current folder",
+            font=("Arial", 11)
+        ).pack(side="left", padx=10, pady=10)
+        
+        ctk.CTkButton(
+            output_frame,
+            text="Browse",
+            command=self.browse_output_dir,
+            width=100,
+            height=35,
+            fg_color=COLORS["accent"],
+            hover_color="#0099CC",
+            font=("Arial", 12, "bold")
+        ).pack(side="left", padx=10, pady=10)
+        
+        ctk.CTkOptionMenu(
+            output_frame,
+            values=list(stego_output.PROFILES),
+            variable=self.output_profile,
+            width=110,
+            fg_color=COLORS["accent"],
+            button_color="#0099CC"
+        ).pack(side="left", padx=10, pady=10)
         
         # Encrypt button
         ctk.CTkButton(
@@ -169,6 +411,9 @@ class SteganographyApp:
             font=("Arial", 14, "bold")
         ).pack(pady=10)
         
+        # Progress and cancel controls
+        self.build_job_controls(scrollable_frame, "hide")
+        
         # Key display section (initially hidden)
         self.key_frame = ctk.CTkFrame(scrollable_frame, fg_color=COLORS["bg_secondary"])
         self.key_frame.pack(fill="x", padx=15, pady=5)
@@ -214,6 +459,29 @@ class SteganographyApp:
             text_color=COLORS["accent"]
         ).pack(pady=(10, 5))
         
+        # SMTP server, port and security
+        server_frame = ctk.CTkFrame(self.email_frame, fg_color="transparent")
+        server_frame.pack(fill="x", padx=10, pady=5)
+        
+        ctk.CTkLabel(
+            server_frame, text="SMTP Server:", width=120, anchor="w"
+        ).pack(side="left", padx=5)
+        self.smtp_host_entry = ctk.CTkEntry(server_frame, width=200, height=30)
+        self.smtp_host_entry.insert(0, stego_options.DEFAULT_HOST)
+        self.smtp_host_entry.pack(side="left", padx=5)
+        
+        self.smtp_port_entry = ctk.CTkEntry(
+            server_frame, width=70, height=30, placeholder_text="Port"
+        )
+        self.smtp_port_entry.pack(side="left", padx=5)
+        
+        ctk.CTkOptionMenu(
+            server_frame,
+            values=list(stego_options.SECURITY_MODES),
+            variable=self.smtp_security,
+            width=110
+        ).pack(side="left", padx=5)
+        
         # Sender email
         sender_frame = ctk.CTkFrame(self.email_frame, fg_color="transparent")
         sender_frame.pack(fill="x", padx=10, pady=5)
@@ -235,7 +503,9 @@ class SteganographyApp:
         recipient_frame.pack(fill="x", padx=10, pady=5)
         
         ctk.CTkLabel(recipient_frame, text="Recipient Email:", width=120, anchor="w").pack(side="left", padx=5)
-        self.recipient_email_entry = ctk.CTkEntry(recipient_frame, width=300, height=30)
+        self.recipient_email_entry = ctk.CTkEntry(
+            recipient_frame, width=300, height=30, placeholder_text="Separate several with commas"
+        )
         self.recipient_email_entry.pack(side="left", padx=5)
         
         # Send button
@@ -338,6 +608,9 @@ class SteganographyApp:
             font=("Arial", 14, "bold")
         ).pack(pady=10)
         
+        # Progress and cancel controls
+        self.build_job_controls(scrollable_frame, "extract")
+        
         # Decrypted message display
         result_frame = ctk.CTkFrame(scrollable_frame, fg_color=COLORS["bg_secondary"])
         result_frame.pack(fill="x", padx=15, pady=5)
@@ -357,21 +630,191 @@ class SteganographyApp:
         )
         self.decrypted_message_box.pack(fill="both", expand=True, padx=10, pady=(5, 10))
         
+        # Bulk extract: every image in a folder with the key above
+        bulk_frame = ctk.CTkFrame(scrollable_frame, fg_color=COLORS["bg_secondary"])
+        bulk_frame.pack(fill="x", padx=15, pady=5)
+        
+        ctk.CTkLabel(
+            bulk_frame,
+            text="📁 Bulk Extract (one key, every image in a folder):",
+            font=("Arial", 13, "bold"),
+            text_color=COLORS["text_primary"]
+        ).pack(anchor="w", padx=10, pady=(10, 5))
+        
+        self.bulk_folder = ctk.StringVar()
+        self.bulk_output_dir = ctk.StringVar()
+        for label, variable, command in (
+            ("Image Folder:", self.bulk_folder, self.browse_bulk_folder),
+            ("Save To:", self.bulk_output_dir, self.browse_bulk_output_dir),
+        ):
+            row = ctk.CTkFrame(bulk_frame, fg_color="transparent")
+            row.pack(fill="x", padx=10, pady=2)
+            ctk.CTkLabel(row, text=label, width=100, anchor="w").pack(side="left", padx=5)
+            ctk.CTkEntry(
+                row, textvariable=variable, width=400, height=30, font=("Arial", 11)
+            ).pack(side="left", padx=5)
+            ctk.CTkButton(
+                row,
+                text="Browse",
+                command=command,
+                width=100,
+                height=30,
+                fg_color=COLORS["accent"],
+                hover_color="#0099CC",
+                font=("Arial", 12, "bold")
+            ).pack(side="left", padx=5)
+        
+        ctk.CTkButton(
+            bulk_frame,
+            text="🔓 Extract All",
+            command=self.bulk_extract_action,
+            width=200,
+            height=40,
+            fg_color=COLORS["accent"],
+            hover_color="#0099CC",
+            font=("Arial", 14, "bold")
+        ).pack(pady=10)
+        
+        self.bulk_results_box = ctk.CTkTextbox(
+            bulk_frame,
+            height=180,
+            font=("Courier", 11),
+            wrap="none"
+        )
+        self.bulk_results_box.pack(fill="both", expand=True, padx=10, pady=(5, 10))
+        
+        
+    def build_job_controls(self, parent, tab):
+        """Build the progress bar and cancel button for a tab's background job"""
+        progress_frame = ctk.CTkFrame(parent, fg_color="transparent")
+        progress_frame.pack(fill="x", padx=15, pady=(0, 5))
+        
+        progress_bar = ctk.CTkProgressBar(progress_frame, progress_color=COLORS["accent"])
+        progress_bar.set(0)
+        progress_bar.pack(side="left", fill="x", expand=True, padx=10, pady=5)
+        
+        cancel_button = ctk.CTkButton(
+            progress_frame,
+            text="✖ Cancel",
+            command=self.jobs[tab].cancel,
+            width=100,
+            height=30,
+            fg_color=COLORS["error"],
+            hover_color="#CC3333",
+            font=("Arial", 12, "bold"),
+            state="disabled"
+        )
+        cancel_button.pack(side="left", padx=10, pady=5)
+        
+        self.progress_bars[tab] = progress_bar
+        self.cancel_buttons[tab] = cancel_button
+        
+    def start_job(self, tab, status_text, task, on_success, failure_text):
+        """Run task(progress) on the tab's background job with progress and cancellation"""
+        progress_bar = self.progress_bars[tab]
+        cancel_button = self.cancel_buttons[tab]
+        cprofile_path = self.take_profile_path(tab)
+        
+        def traced_task(progress):
+            with stego_trace.operation(tab, cprofile_path=cprofile_path) as trace:
+                self.traces[tab] = trace
+                return task(progress)
+        
+        def on_progress(fraction):
+            progress_bar.set(fraction)
+            self.update_status(f"{status_text} {fraction:.0%}", COLORS["accent"])
+            
+        def on_done(result):
+            cancel_button.configure(state="disabled")
+            progress_bar.set(1)
+            on_success(result)
+            
+        def on_error(error):
+            cancel_button.configure(state="disabled")
+            progress_bar.set(0)
+            self.update_status(f"{failure_text}: {str(error)}", COLORS["error"])
+            messagebox.showerror("Error", f"{failure_text}: {str(error)}")
+            
+        def on_cancel():
+            cancel_button.configure(state="disabled")
+            progress_bar.set(0)
+            self.update_status("Operation cancelled", COLORS["text_secondary"])
+            
+        if not self.jobs[tab].start(traced_task, on_progress, on_done, on_error, on_cancel):
+            messagebox.showwarning(
+                "Busy",
+                "An operation is already running on this tab. Wait for it or cancel it first."
+            )
+            return
+        progress_bar.set(0)
+        cancel_button.configure(state="normal")
+        self.update_status(status_text, COLORS["accent"])
+        
+    def take_profile_path(self, tab):
+        """Return a cProfile output path if profiling was requested for this operation"""
+        if not self.profile_next.get():
+            return None
+        self.profile_next.set(False)
+        name = f"{tab}-{time.strftime('%Y%m%d-%H%M%S')}.prof"
+        return os.path.join(stego_trace.DEFAULT_DIR, "profiles", name)
+        
+    def timing_text(self, trace):
+        """Return a trace's stage timings for the status bar, e.g. ' (embed 120 ms, save 340 ms)'"""
+        if trace is None or not trace.spans:
+            return ""
+        text = f" ({trace.summary()})"
+        if trace.cprofile_path:
+            text += f" - profile: {trace.cprofile_path}"
+        return text
         
     def browse_hide_image(self):
         """Browse and select image for hiding message"""
         file_path = filedialog.askopenfilename(
-            filetypes=[("Image Files", "*.png *.jpg *.jpeg")]
+            filetypes=[("Image Files", "*.png *.jpg *.jpeg *.bmp *.tif *.tiff *.webp")]
         )
         if file_path:
             self.image_path.set(file_path)
             self.update_image_preview(file_path, self.hide_preview_label)
+            self.load_cover_capacity(file_path)
             self.update_status(f"Selected: {os.path.basename(file_path)}", COLORS["success"])
             
+    def browse_payload_file(self):
+        """Browse and select a file to hide instead of the text message"""
+        file_path = filedialog.askopenfilename()
+        if file_path:
+            self.payload_file_path.set(file_path)
+            self.update_capacity()
+            self.update_status(f"File to hide: {os.path.basename(file_path)}", COLORS["success"])
+            
+    def clear_payload_file(self):
+        """Go back to hiding the text message"""
+        self.payload_file_path.set("")
+        self.update_capacity()
+        
+    def browse_output_dir(self):
+        """Choose the folder stego-images are saved to"""
+        directory = filedialog.askdirectory()
+        if directory:
+            self.output_dir.set(directory)
+            
+    def browse_bulk_folder(self):
+        """Choose the folder of stego-images for bulk extraction"""
+        directory = filedialog.askdirectory()
+        if directory:
+            self.bulk_folder.set(directory)
+            if not self.bulk_output_dir.get():
+                self.bulk_output_dir.set(os.path.join(directory, "extracted"))
+                
+    def browse_bulk_output_dir(self):
+        """Choose the folder bulk extraction writes messages and files to"""
+        directory = filedialog.askdirectory()
+        if directory:
+            self.bulk_output_dir.set(directory)
+            
     def browse_extract_image(self):
         """Browse and select stego-image for extraction"""
         file_path = filedialog.askopenfilename(
-            filetypes=[("Image Files", "*.png *.jpg *.jpeg")]
+            filetypes=[("Image Files", "*.png *.jpg *.jpeg *.bmp *.tif *.tiff *.webp")]
         )
         if file_path:
             self.extract_image_path.set(file_path)
@@ -379,76 +822,167 @@ class SteganographyApp:
             self.update_status(f"Selected: {os.path.basename(file_path)}", COLORS["success"])
             
     def update_image_preview(self, image_path, label_widget):
-        """Update image preview in the specified label"""
+        """Show a cached thumbnail at once, or decode one in the background"""
+        self.preview_requests[label_widget] = image_path
+        thumbnail = self.thumbnails.peek(image_path)
+        if thumbnail is not None:
+            self.show_preview(label_widget, thumbnail)
+            return
+        future = self.preview_executor.submit(self.thumbnails.get, image_path)
+        future.add_done_callback(
+            lambda done: self.root.after(0, self.on_preview_ready, label_widget, image_path, done)
+        )
+        
+    def on_preview_ready(self, label_widget, image_path, future):
+        """Show a finished thumbnail unless another image was selected meanwhile"""
+        if self.preview_requests.get(label_widget) != image_path:
+            return
+        if future.exception() is not None:
+            self.update_status(f"Failed to load image: {str(future.exception())}", COLORS["error"])
+            return
+        self.show_preview(label_widget, future.result())
+        
+    def show_preview(self, label_widget, thumbnail):
+        """Put a thumbnail into a preview label"""
+        photo = ImageTk.PhotoImage(thumbnail)
+        label_widget.configure(image=photo, text="")
+        label_widget.image = photo
+            
+    def load_cover_capacity(self, image_path):
+        """Read the cover's capacity from its header and refresh the capacity label"""
         try:
-            image = Image.open(image_path)
-            image.thumbnail((500, 400))
-            photo = ImageTk.PhotoImage(image)
-            label_widget.configure(image=photo, text="")
-            label_widget.image = photo
+            self.cover_capacity = stego_core.image_capacity(image_path)
+            self.cover_scatter_capacity = stego_core.image_capacity(image_path, scatter=True)
         except Exception as e:
-            self.update_status(f"Failed to load image: {str(e)}", COLORS["error"])
+            self.cover_capacity = {}
+            self.cover_scatter_capacity = {}
+            self.update_status(f"Failed to read image size: {str(e)}", COLORS["error"])
+        self.update_capacity()
+        
+    def schedule_capacity_update(self, _event=None):
+        """Refresh the capacity label once typing pauses, instead of on every keystroke"""
+        if self.capacity_update is not None:
+            self.root.after_cancel(self.capacity_update)
+        self.capacity_update = self.root.after(CAPACITY_DEBOUNCE_MS, self.update_capacity)
+
+    def update_capacity(self, _event=None):
+        """Show how much of the cover's capacity the current message would use"""
+        self.capacity_update = None
+        if not self.cover_capacity:
+            self.capacity_label.configure(
+                text="Capacity: select a cover image", text_color=COLORS["text_secondary"]
+            )
+            return
+        if self.scatter_embed.get():
+            capacities = self.cover_scatter_capacity
+        else:
+            capacities = self.cover_capacity
+        capacity_bits = capacities.get(self.embed_mode.get())
+        if capacity_bits is None:
+            self.capacity_label.configure(
+                text="Capacity: this image has no alpha channel, choose an rgb mode",
+                text_color=COLORS["error"]
+            )
+            return
+        payload_file = self.payload_file_path.get()
+        try:
+            if payload_file:
+                # Uncompressed size, so large files are never read on the Tk thread
+                needed = stego_core.required_file_bits(payload_file)
+            else:
+                needed = stego_core.required_bits(self.message_entry.get())
+        except OSError as e:
+            self.capacity_label.configure(
+                text=f"Capacity: cannot read file: {str(e)}", text_color=COLORS["error"]
+            )
+            return
+        remaining = capacity_bits - needed
+        if remaining < 0 and payload_file:
+            self.capacity_label.configure(
+                text=f"Capacity: file may be up to {-remaining // 8:,} bytes too large"
+                     " (before compression)",
+                text_color=COLORS["error"]
+            )
+        elif remaining < 0:
+            self.capacity_label.configure(
+                text=f"Capacity: message is {-remaining // 8:,} bytes too large for this image",
+                text_color=COLORS["error"]
+            )
+        else:
+            self.capacity_label.configure(
+                text=f"Capacity: {remaining // 8:,} bytes remaining of {capacity_bits // 8:,}",
+                text_color=COLORS["text_secondary"]
+            )
             
     def encrypt_action(self):
         """Encrypt message and embed in image"""
         image_file = self.image_path.get()
         message = self.message_entry.get()
+        payload_file = self.payload_file_path.get()
+        mode = self.embed_mode.get()
+        scatter = self.scatter_embed.get()
+        profile = self.output_profile.get()
+        output_dir = self.output_dir.get()
         
-        if not image_file or not message:
-            messagebox.showerror("Error", "Please select an image and enter a message.")
+        if not image_file or not (message or payload_file):
+            messagebox.showerror(
+                "Error", "Please select an image and enter a message or choose a file."
+            )
             return
             
-        try:
-            self.update_status("Encrypting message...", COLORS["accent"])
-            
-            # Generate encryption key
-            key = Fernet.generate_key()
-            f = Fernet(key)
-            secret_message = f.encrypt(message.encode())
-            
-            # Open the image
-            image = Image.open(image_file)
-            pixels = list(image.getdata())
-            
-            # Convert encrypted message to binary
-            binary_secret = "".join(format(byte, "08b") for byte in secret_message)
-            new_pixels = []
-            pixel_index = 0
-            
-            # Embed binary data into LSB
-            for pixel in pixels:
-                r, g, b = pixel
-                if pixel_index < len(binary_secret):
-                    r = r & 0xFE | int(binary_secret[pixel_index])
-                    pixel_index += 1
-                if pixel_index < len(binary_secret):
-                    g = g & 0xFE | int(binary_secret[pixel_index])
-                    pixel_index += 1
-                if pixel_index < len(binary_secret):
-                    b = b & 0xFE | int(binary_secret[pixel_index])
-                    pixel_index += 1
-                new_pixels.append((r, g, b))
-                
-            image.putdata(new_pixels)
-            output_image_path = f"{os.path.splitext(os.path.basename(image_file))[0]}_stego.png"
-            image.save(output_image_path, "PNG")
-            self.stego_image_path = output_image_path
-            
-            # Display key and show email section
-            self.generated_key.set(key.decode())
-            self.key_frame.pack(fill="x", padx=20, pady=5)
-            self.email_frame.pack(fill="x", padx=20, pady=5)
-            
-            # Update preview with stego image
-            self.update_image_preview(output_image_path, self.hide_preview_label)
-            
-            self.update_status(f"✓ Message encrypted successfully! Stego-image saved: {output_image_path}", COLORS["success"])
-            messagebox.showinfo("Success", f"Message encrypted!\n\nStego-image saved as: {output_image_path}\n\nPlease save your encryption key!")
-            
-        except Exception as e:
-            self.update_status(f"Encryption failed: {str(e)}", COLORS["error"])
-            messagebox.showerror("Error", f"Encryption failed: {str(e)}")
+        if output_dir and not os.path.isdir(output_dir):
+            messagebox.showerror("Error", f"Output folder does not exist: {output_dir}")
+            return
+        output_path = stego_core.default_output_path(image_file, output_dir, profile)
+        
+        if payload_file:
+            # The exact size is only known after compression, so the job checks capacity
+            status_text = "Encrypting file..."
+            def task(progress):
+                return stego_core.hide_file(
+                    image_file, payload_file, output_path, progress=progress, mode=mode,
+                    profile=profile, scatter=scatter
+                )
+        else:
+            try:
+                stego_core.check_capacity(image_file, message, mode=mode, scatter=scatter)
+            except Exception as e:
+                messagebox.showerror("Error", str(e))
+                return
+            status_text = "Encrypting message..."
+            def task(progress):
+                return stego_core.hide_message(
+                    image_file, message, output_path, progress=progress, mode=mode,
+                    profile=profile, scatter=scatter
+                )
             
+        # Encrypt, embed and save off the Tk thread
+        self.start_job("hide", status_text, task, self.on_encrypt_done, "Encryption failed")
+        
+    def on_encrypt_done(self, result):
+        """Show the key and stego-image once the background encryption finishes"""
+        key, output_image_path = result.key, result.output_path
+        self.stego_image_path = output_image_path
+        
+        # Display key and show email section
+        self.generated_key.set(key)
+        self.key_frame.pack(fill="x", padx=20, pady=5)
+        self.email_frame.pack(fill="x", padx=20, pady=5)
+        
+        # Update preview with stego image
+        self.update_image_preview(output_image_path, self.hide_preview_label)
+        
+        self.update_status(
+            f"✓ Message encrypted successfully! Stego-image saved: {output_image_path}"
+            + self.timing_text(self.traces.get("hide")),
+            COLORS["success"]
+        )
+        messagebox.showinfo(
+            "Success",
+            f"Message encrypted!\n\nStego-image saved as: {output_image_path}"
+            "\n\nPlease save your encryption key!"
+        )
+        
     def copy_key_to_clipboard(self):
         """Copy encryption key to clipboard"""
         key = self.generated_key.get()
@@ -459,12 +993,13 @@ class SteganographyApp:
             messagebox.showinfo("Success", "Encryption key copied to clipboard!")
                 
     def send_email_action(self):
-        """Send stego-image via email"""
+        """Queue the stego-image for every recipient on the background mail queue"""
         sender_email = self.sender_email_entry.get()
         sender_password = self.sender_password_entry.get()
-        recipient_email = self.recipient_email_entry.get()
+        entered = self.recipient_email_entry.get().replace(";", ",").split(",")
+        recipients = [r.strip() for r in entered if r.strip()]
         
-        if not all([sender_email, sender_password, recipient_email]):
+        if not all([sender_email, sender_password, recipients]):
             messagebox.showerror("Error", "Please fill in all email fields.")
             return
             
@@ -472,53 +1007,70 @@ class SteganographyApp:
             messagebox.showerror("Error", "Please encrypt a message first.")
             return
             
+        security = self.smtp_security.get()
         try:
-            self.update_status("Sending email...", COLORS["accent"])
-            self.send_email(
-                self.stego_image_path,
-                self.generated_key.get(),
-                sender_email,
-                sender_password,
-                recipient_email
-            )
-            self.update_status(f"✓ Email sent to {recipient_email}", COLORS["success"])
-            messagebox.showinfo("Success", f"Stego-image and key sent to {recipient_email}!")
-            
+            port = int(self.smtp_port_entry.get() or stego_mail.DEFAULT_PORTS[security])
+        except ValueError:
+            messagebox.showerror("Error", "SMTP port must be a number.")
+            return
+        config = stego_mail.MailConfig(
+            self.smtp_host_entry.get().strip() or stego_mail.DEFAULT_HOST,
+            port, security, sender_email, sender_password
+        )
+        
+        try:
+            mail_queue = self.get_mail_queue(config)
         except Exception as e:
-            self.update_status(f"Email failed: {str(e)}", COLORS["error"])
             messagebox.showerror("Error", f"Failed to send email: {str(e)}")
-            
-    def send_email(self, image_path, key, sender_email, sender_password, recipient_email):
-        """Send email with stego-image attachment"""
-        try:
-            msg = MIMEMultipart()
-            msg["From"] = sender_email
-            msg["To"] = recipient_email
-            msg["Subject"] = "StegoExpress - Encrypted Image"
-            
-            body = f"You have received an encrypted image via StegoExpress.\n\nEncryption Key: {key}\n\nPlease save this key to decrypt the hidden message."
-            msg.attach(MIMEText(body, "plain"))
-            
-            # Attach image
-            with open(image_path, "rb") as image_attachment:
-                img_base = MIMEBase("application", "octet-stream")
-                img_base.set_payload(image_attachment.read())
-                encoders.encode_base64(img_base)
-                img_base.add_header(
-                    "Content-Disposition",
-                    f'attachment; filename="{os.path.basename(image_path)}"'
+            return
+        futures = mail_queue.send_bulk(
+            sender_email,
+            [
+                (self.stego_image_path, recipient, self.generated_key.get())
+                for recipient in recipients
+            ]
+        )
+        
+        outcome = {"pending": len(futures), "failed": [], "recipients": recipients}
+        for recipient, future in zip(recipients, futures):
+            future.add_done_callback(
+                lambda done, recipient=recipient: self.root.after(
+                    0, self.on_email_done, recipient, done, outcome
                 )
-                msg.attach(img_base)
-                
-            # Send email
-            server = smtplib.SMTP("smtp.gmail.com", 587)
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.sendmail(sender_email, recipient_email, msg.as_string())
-            server.quit()
-            
-        except Exception as e:
-            raise Exception(f"Email sending failed: {str(e)}")
+            )
+        self.update_status(f"Sending email to {len(recipients)} recipient(s)...", COLORS["accent"])
+        
+    def get_mail_queue(self, config):
+        """Return the mail queue for config, replacing it when the server settings change"""
+        if self.mail_queue is None or self.mail_config != config:
+            if self.mail_queue is not None:
+                self.mail_queue.close(wait=False)
+            self.mail_queue = stego_mail.MailQueue(config)
+            self.mail_config = config
+        return self.mail_queue
+        
+    def on_email_done(self, recipient, future, outcome):
+        """Tally one finished delivery and report once every recipient is done"""
+        outcome["pending"] -= 1
+        if future.exception() is not None:
+            outcome["failed"].append(f"{recipient}: {str(future.exception())}")
+        else:
+            outcome["trace"] = future.result().trace
+        if outcome["pending"]:
+            return
+        if outcome["failed"]:
+            failures = "\n".join(outcome["failed"])
+            self.update_status(
+                f"Email failed for {len(outcome['failed'])} recipient(s)", COLORS["error"]
+            )
+            messagebox.showerror("Error", f"Failed to send email:\n{failures}")
+        else:
+            sent_to = ", ".join(outcome["recipients"])
+            self.update_status(
+                f"✓ Email sent to {sent_to}" + self.timing_text(outcome.get("trace")),
+                COLORS["success"]
+            )
+            messagebox.showinfo("Success", f"Stego-image and key sent to {sent_to}!")
             
     def decrypt_action(self):
         """Decrypt message from stego-image"""
@@ -529,48 +1081,111 @@ class SteganographyApp:
             messagebox.showerror("Error", "Please select an image and provide the decryption key.")
             return
             
-        # Run in thread to keep UI responsive
-        threading.Thread(target=self.perform_decryption, args=(encrypted_image_path, key), daemon=True).start()
+        # Run in background to keep UI responsive
+        self.start_job(
+            "extract",
+            "Decrypting message...",
+            lambda progress: stego_core.extract_data(encrypted_image_path, key, progress=progress),
+            self.on_decrypt_done,
+            "Decryption failed"
+        )
         
-    def perform_decryption(self, encrypted_image_path, key):
-        """Perform decryption in background thread"""
-        try:
-            self.root.after(0, self.update_status, "Decrypting message...", COLORS["accent"])
+    def on_decrypt_done(self, extracted):
+        """Show the decrypted message, or save the hidden file, once extraction finishes"""
+        file_name, data = extracted
+        if file_name is None:
+            self.update_status(
+                "✓ Message decrypted successfully!" + self.timing_text(self.traces.get("extract")),
+                COLORS["success"]
+            )
+            self.display_decrypted_message(data.decode("utf-8", errors="replace"))
+            return
             
-            # Convert key to bytes
-            f = Fernet(key.encode())
+        save_path = filedialog.asksaveasfilename(
+            initialdir=os.path.dirname(self.extract_image_path.get()),
+            initialfile=file_name
+        )
+        if not save_path:
+            self.update_status(f"Hidden file {file_name} was not saved", COLORS["text_secondary"])
+            return
+        try:
+            stego_core.save_file(save_path, data)
+        except Exception as e:
+            self.update_status(f"Failed to save file: {str(e)}", COLORS["error"])
+            messagebox.showerror("Error", f"Failed to save file: {str(e)}")
+            return
+        self.update_status(
+            f"✓ Hidden file saved: {save_path}" + self.timing_text(self.traces.get("extract")),
+            COLORS["success"]
+        )
+        self.display_decrypted_message(
+            f"📎 Hidden file {file_name} ({len(data):,} bytes) saved to:\n{save_path}"
+        )
+        
+    def bulk_extract_action(self):
+        """Extract every image in the chosen folder with one key, in parallel"""
+        folder = self.bulk_folder.get()
+        output_dir = self.bulk_output_dir.get() or os.path.join(folder, "extracted")
+        key = self.decrypt_key_entry.get()
+        
+        if not folder or not key:
+            messagebox.showerror(
+                "Error", "Please choose an image folder and provide the decryption key."
+            )
+            return
+        try:
+            image_paths = stego_batch.list_images(folder)
+        except Exception as e:
+            messagebox.showerror("Error", f"Cannot read folder: {str(e)}")
+            return
+        if not image_paths:
+            messagebox.showerror("Error", f"No images found in {folder}")
+            return
             
-            # Open encrypted image
-            encoded_image = Image.open(encrypted_image_path)
-            pixels = list(encoded_image.getdata())
+        self.bulk_results_box.delete("1.0", "end")
+        self.bulk_results_box.insert("end", f"{'STATUS':<7} {'IMAGE':<32} RESULT\n")
+        
+        def task(progress):
+            finished = []
             
-            # Extract binary data from LSB
-            binary_secret = ''
-            for pixel in pixels:
-                r, g, b = pixel
-                binary_secret += str(r & 1)
-                binary_secret += str(g & 1)
-                binary_secret += str(b & 1)
+            def on_result(result):
+                finished.append(result)
+                self.root.after(0, self.add_bulk_result, result)
+                progress(len(finished) / len(image_paths))
                 
-            # Convert binary to bytes
-            byte_array = bytearray()
-            for i in range(0, len(binary_secret), 8):
-                byte = binary_secret[i:i + 8]
-                if len(byte) == 8:
-                    byte_array.append(int(byte, 2))
-                    
-            # Remove padding and decrypt
-            extracted_message = bytes(byte_array).decode('utf-8', errors='ignore').rstrip('\x00')
-            original_message = f.decrypt(extracted_message.encode()).decode()
-            
-            # Display result
-            self.root.after(0, self.display_decrypted_message, original_message)
-            self.root.after(0, self.update_status, "✓ Message decrypted successfully!", COLORS["success"])
-            
-        except Exception as e:
-            self.root.after(0, self.update_status, f"Decryption failed: {str(e)}", COLORS["error"])
-            self.root.after(0, messagebox.showerror, "Error", f"Decryption failed: {str(e)}")
+            return stego_batch.extract_all(image_paths, key, output_dir, on_result=on_result)
             
+        self.start_job(
+            "extract",
+            f"Extracting {len(image_paths)} images...",
+            task,
+            lambda results: self.on_bulk_extract_done(results, output_dir),
+            "Bulk extraction failed"
+        )
+        
+    def add_bulk_result(self, result):
+        """Append one finished image to the bulk summary table"""
+        name = os.path.basename(result["image"])
+        if result["status"] == "ok":
+            detail = os.path.basename(result["output"])
+            if result["kind"] == "message":
+                detail += f"  \"{result['preview']}\""
+            else:
+                detail += f"  ({result['bytes']:,} bytes)"
+        else:
+            detail = result["error"]
+        self.bulk_results_box.insert("end", f"{result['status']:<7} {name[:32]:<32} {detail}\n")
+        
+    def on_bulk_extract_done(self, results, output_dir):
+        """Summarize a finished bulk extraction"""
+        failed = sum(1 for result in results if result["status"] != "ok")
+        summary = f"{len(results) - failed} extracted, {failed} failed; saved to {output_dir}"
+        self.bulk_results_box.insert("end", summary + "\n")
+        self.update_status(
+            ("⚠ " if failed else "✓ ") + summary + self.timing_text(self.traces.get("extract")),
+            COLORS["error"] if failed else COLORS["success"]
+        )
+        
     def display_decrypted_message(self, message):
         """Display decrypted message in textbox"""
         self.decrypted_message_box.delete("1.0", "end")
@@ -586,4 +1201,9 @@ class SteganographyApp:
 if __name__ == "__main__":
     root = ctk.CTk()
     app = SteganographyApp(root)
+    if os.environ.get(STARTUP_PROBE_ENV):
+        root.update()
+        loaded = [name for name in WARM_UP_MODULES if name in sys.modules]
+        print("first paint:", ",".join(loaded), flush=True)
+        sys.exit(0)
     root.mainloop()
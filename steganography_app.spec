@@ -6,7 +6,9 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=[],
+    # Loaded through stego_lazy after the window opens, so analysis cannot see them
+    hiddenimports=['stego_core', 'stego_mail', 'PIL.ImageTk', 'PIL.Image', 'stego_engine',
+                   'stego_batch', 'stego_pipeline'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -26,7 +28,8 @@ exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    # UPX-packed libraries are decompressed on every launch, which delays the first paint
+    upx=False,
     upx_exclude=[],
     runtime_tmpdir=None,
     console=True,
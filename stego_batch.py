@@ -0,0 +1,302 @@
+"""Batch work: multi-process or pipelined embedding from a manifest, and bulk extraction"""
+import contextvars
+import csv
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import stego_core
+import stego_mmap
+import stego_options
+import stego_output
+import stego_pipeline
+import stego_trace
+
+
+MANIFEST_FIELDS = ("cover", "message", "output")
+COVER_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp", ".npy")
+
+# Threads per stage of a pipelined batch; embedding defaults to the CPU count
+DEFAULT_READERS = 2
+DEFAULT_ENCODERS = 2
+
+# Guards choosing and reserving unique output names across extraction threads
+_output_names = threading.Lock()
+
+
+def read_manifest(manifest_path):
+    """Read a CSV manifest with cover, message and output columns
+
+    key, mode, profile and scatter columns are optional.
+    """
+    with open(manifest_path, "r", newline="", encoding="utf-8") as manifest_file:
+        reader = csv.DictReader(manifest_file)
+        missing = [field for field in MANIFEST_FIELDS if field not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"Manifest is missing column(s): {', '.join(missing)}")
+        for row in reader:
+            profile = row.get("profile") or stego_output.DEFAULT_PROFILE
+            yield {
+                "cover": row["cover"],
+                "message": row["message"],
+                "output": (row["output"]
+                           or stego_core.default_output_path(row["cover"], profile=profile)),
+                "key": row.get("key") or None,
+                "mode": row.get("mode") or stego_core.DEFAULT_MODE,
+                "profile": profile,
+                "scatter": (row.get("scatter") or "").strip().lower() in stego_options.TRUE_VALUES,
+            }
+
+
+def hide_row(row):
+    """Embed one manifest row; runs in a worker process and never raises"""
+    started = time.perf_counter()
+    result = {"cover": row["cover"], "output": row["output"], "key": None}
+    try:
+        output_dir = os.path.dirname(row["output"])
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        hidden = stego_core.hide_message(
+            row["cover"], row["message"], row["output"], row.get("key"),
+            mode=row.get("mode", stego_core.DEFAULT_MODE),
+            profile=row.get("profile", stego_output.DEFAULT_PROFILE),
+            scatter=row.get("scatter", False)
+        )
+        result.update(key=hidden.key, output=hidden.output_path, status="ok")
+    except Exception as e:
+        result.update(status="error", error=str(e))
+    result["seconds"] = round(time.perf_counter() - started, 6)
+    return result
+
+
+def run_batch(rows, report_path, workers=None, max_in_flight=None, on_result=None):
+    """Embed every manifest row across a process pool, writing one JSONL result per item
+
+    At most max_in_flight rows (default: two per worker) are submitted at a
+    time, which bounds how many decoded images are held in memory at once.
+    Returns (succeeded, failed) counts.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max(max_in_flight or workers * 2, 1)
+    succeeded = failed = 0
+    rows = iter(rows)
+    pending = set()
+
+    with open(report_path, "w", encoding="utf-8") as report, \
+            ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            for row in rows:
+                pending.add(executor.submit(hide_row, row))
+                if len(pending) >= max_in_flight:
+                    break
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if result["status"] == "ok":
+                    succeeded += 1
+                else:
+                    failed += 1
+                report.write(json.dumps(result) + "\n")
+                if on_result:
+                    on_result(result)
+            report.flush()
+    return succeeded, failed
+
+
+def run_pipeline(rows, report_path, readers=DEFAULT_READERS, embedders=None,
+                 encoders=DEFAULT_ENCODERS, queue_size=None, on_result=None):
+    """Embed every manifest row through read, embed and encode stages, one JSONL result per item
+
+    Covers are decoded on reader threads, embedded on embedder threads and
+    encoded and written on encoder threads, so disk I/O and compression of
+    one image overlap the work on the next instead of following it. Bounded
+    queues between the stages (queue_size items, default two per worker)
+    cap the decoded images held at once. Rows using the raw profile skip
+    decoding and encoding and are patched whole in the embed stage. Returns
+    (succeeded, failed, report) where report is Pipeline.report() with each
+    stage's busy time and utilisation.
+    """
+    pipeline = stego_pipeline.Pipeline([
+        stego_pipeline.Stage("read", _read_cover, readers),
+        stego_pipeline.Stage("embed", _embed_cover, embedders or os.cpu_count() or 1),
+        stego_pipeline.Stage("encode", _encode_cover, encoders),
+    ], queue_size)
+    succeeded = failed = 0
+    with open(report_path, "w", encoding="utf-8") as report:
+        for row, result, error in pipeline.run(_timed_rows(rows)):
+            if error is not None:
+                result = {"cover": row["cover"], "output": row["output"], "key": None,
+                          "status": "error", "error": str(error)}
+                failed += 1
+            else:
+                succeeded += 1
+            result["seconds"] = round(time.perf_counter() - row["started"], 6)
+            report.write(json.dumps(result) + "\n")
+            report.flush()
+            if on_result:
+                on_result(result)
+    return succeeded, failed, pipeline.report()
+
+
+def _timed_rows(rows):
+    """Copy each row with its optional settings filled in and the time it entered the pipeline"""
+    defaults = {
+        "key": None, "mode": stego_core.DEFAULT_MODE, "profile": stego_output.DEFAULT_PROFILE,
+        "scatter": False,
+    }
+    for row in rows:
+        yield dict(defaults, **row, started=time.perf_counter())
+
+
+def _read_cover(row):
+    """Pipeline read stage: decode a row's cover, leaving raw profile covers to the embed stage"""
+    if not row["message"]:
+        raise ValueError("Message is empty")
+    image = None
+    if stego_output.get_profile(row["profile"]).format is not None:
+        stego_output.check_output_path(row["output"], row["profile"])
+        image = stego_core.decode_cover(row["cover"])
+    return row, image
+
+
+def _embed_cover(job):
+    """Pipeline embed stage: encrypt the row's message and embed it into the decoded cover"""
+    row, image = job
+    output_dir = os.path.dirname(row["output"])
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    if image is None:
+        hidden = stego_core.hide_message(
+            row["cover"], row["message"], row["output"], row["key"], mode=row["mode"],
+            profile=row["profile"], scatter=row["scatter"]
+        )
+        return row, None, hidden.key
+    prepared = stego_core.prepare_payload(
+        row["cover"], row["message"].encode(), key=row["key"], mode=row["mode"],
+        scatter=row["scatter"]
+    )
+    return row, stego_core.embed_prepared(image, prepared), prepared.key
+
+
+def _encode_cover(job):
+    """Pipeline encode stage: save the stego-image with the row's profile, returning its result"""
+    row, image, key = job
+    if image is not None:
+        stego_output.save_image(image, row["output"], row["profile"])
+    return {"cover": row["cover"], "output": row["output"], "key": key, "status": "ok"}
+
+
+def extract_one(image_path, key, output_dir):
+    """Extract one stego-image into output_dir; never raises
+
+    Messages are saved as <image name>.txt and files under their stored
+    name, numbered rather than overwriting anything.
+    """
+    started = time.perf_counter()
+    result = {"image": image_path, "kind": None, "output": None, "bytes": None}
+    try:
+        file_name, data = stego_core.extract_data(image_path, key)
+        if file_name is None:
+            preview = bytes(data[:80]).decode("utf-8", errors="replace")
+            result.update(kind="message", preview=preview)
+            file_name = os.path.splitext(os.path.basename(image_path))[0] + ".txt"
+        else:
+            result["kind"] = "file"
+        with _output_names:
+            path = stego_core.unique_path(output_dir, file_name)
+            open(path, "wb").close()
+        result.update(output=stego_core.save_file(path, data), bytes=len(data), status="ok")
+    except Exception as e:
+        result.update(status="error", error=str(e))
+    result["seconds"] = round(time.perf_counter() - started, 6)
+    return result
+
+
+def extract_all(image_paths, key, output_dir, workers=None, on_result=None):
+    """Extract every image with one key on a thread pool, returning results in input order
+
+    The key is checked once up front and its cipher is shared by every
+    image. A failing image is reported in its result without stopping the
+    others. on_result(result) is called as each image finishes; an exception
+    raised from it stops the batch, abandoning images not yet started.
+    Extraction reads mostly payload rows and decrypts in C, so threads
+    overlap well without the cost of worker processes. Each image runs in a
+    copy of the caller's context, so its spans join the caller's operation.
+    """
+    stego_core.cipher(key)
+    os.makedirs(output_dir, exist_ok=True)
+    image_paths = list(image_paths)
+    results = [None] * len(image_paths)
+    with stego_trace.span("extract_all", images=len(image_paths)), \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stego-extract") as executor:
+        futures = {
+            executor.submit(contextvars.copy_context().run, extract_one, image_path, key,
+                            output_dir): index
+            for index, image_path in enumerate(image_paths)
+        }
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    results[futures[future]] = result
+                    if on_result:
+                        on_result(result)
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+    return results
+
+
+def list_images(image_dir):
+    """Return the image files directly inside image_dir, sorted by name"""
+    return [
+        os.path.join(image_dir, name) for name in sorted(os.listdir(image_dir))
+        if name.lower().endswith(COVER_EXTENSIONS) and os.path.isfile(os.path.join(image_dir, name))
+    ]
+
+
+def list_cover_capacities(cover_dir, mode=stego_core.DEFAULT_MODE):
+    """Return (capacity_bits, path) for every readable image in cover_dir, smallest first
+
+    .npy arrays are left out: only the raw profile can write them, and
+    planned manifests use the default profile.
+    """
+    covers = []
+    for path in list_images(cover_dir):
+        if path.lower().endswith(stego_mmap.NPY_EXTENSION):
+            continue
+        try:
+            capacity = stego_core.image_capacity(path).get(mode, 0)
+        except OSError:
+            continue
+        if capacity:
+            covers.append((capacity, path))
+    covers.sort()
+    return covers
+
+
+def plan_covers(messages, cover_dir, mode=stego_core.DEFAULT_MODE):
+    """Assign each message the smallest unused cover in cover_dir that can hold it
+
+    Capacities come from image headers only. Messages are placed smallest
+    first, which fits as many of them as the covers allow. Returns a list
+    of cover paths parallel to messages, with None where nothing fits.
+    """
+    covers = list_cover_capacities(cover_dir, mode)
+    capacities = [capacity for capacity, _ in covers]
+    needed = [stego_core.required_bits(message) for message in messages]
+    plan = [None] * len(messages)
+    for index in sorted(range(len(messages)), key=needed.__getitem__):
+        slot = bisect_left(capacities, needed[index])
+        if slot < len(capacities):
+            plan[index] = covers.pop(slot)[1]
+            del capacities[slot]
+    return plan
@@ -0,0 +1,327 @@
+"""Versioned, length-prefixed container for payloads embedded in stego-images
+
+The header is always written one LSB per RGB channel from the first pixel,
+so it can be read before the payload layout is known. Payloads in the
+default layout follow it directly; any other layout (deeper LSBs, alpha)
+starts on the first pixel after the header. Scattered payloads spread over
+all slots after the header in an order drawn from a key-derived seed.
+"""
+import re
+import struct
+import threading
+import zlib
+from collections import OrderedDict, namedtuple
+from functools import partial
+
+import stego_engine
+import stego_options
+from stego_engine import Layout
+
+
+MAGIC = b"SGXP"
+
+# Version 1 payloads are base64 Fernet text with no flags. Version 2
+# payloads are raw binary tokens and describe codec and layout in the flags.
+FORMAT_VERSION = 2
+
+# magic, format version, flags, payload length, CRC32 of payload
+HEADER = struct.Struct(">4sBBII")
+HEADER_BITS = HEADER.size * 8
+HEADER_LAYOUT = stego_engine.DEFAULT_LAYOUT
+HEADER_PIXELS = -(-HEADER_BITS // HEADER_LAYOUT.channels)
+
+# Header flag bits: 0-2 codec id, 3-4 LSB depth - 1, 5 alpha channel used,
+# 6 file payload (see stego_payload), 7 body scattered
+FLAG_DEPTH_SHIFT = 3
+FLAG_DEPTH_MASK = 0x18
+FLAG_ALPHA = 0x20
+FLAG_SCATTER = 0x80
+
+# Scattered bodies fill at most 1/SCATTER_DENSITY of the slots after the
+# header, which keeps drawing their slots linear in the payload size
+SCATTER_DENSITY = 2
+
+# Slot index arrays kept for reuse across images of one size under one key
+SCATTER_CACHE_BYTES = 256 << 20
+
+# Fernet tokens are urlsafe base64 text of version, timestamp, IV, HMAC and
+# whole AES blocks
+_LEGACY_TOKEN = re.compile(rb"[A-Za-z0-9_=-]*")
+_LEGACY_TOKEN_OVERHEAD = 1 + 8 + 16 + 32
+_LEGACY_TOKEN_BLOCK = 16
+
+Header = namedtuple("Header", ["version", "flags", "length", "checksum"])
+
+
+class PayloadNotFoundError(ValueError):
+    """Raised when an image does not carry a StegoExpress container header"""
+
+
+class CorruptPayloadError(ValueError):
+    """Raised when a container header is present but its payload is damaged"""
+
+
+def layout_flags(layout):
+    """Return the header flag bits describing a payload layout"""
+    if not 1 <= layout.depth <= stego_options.MAX_DEPTH:
+        raise ValueError(f"LSB depth must be between 1 and {stego_options.MAX_DEPTH}")
+    alpha = FLAG_ALPHA if layout.channels == 4 else 0
+    return ((layout.depth - 1) << FLAG_DEPTH_SHIFT) | alpha
+
+
+def flags_layout(flags):
+    """Return the payload layout recorded in header flags"""
+    channels = 4 if flags & FLAG_ALPHA else stego_engine.CHANNELS
+    return Layout(channels, ((flags & FLAG_DEPTH_MASK) >> FLAG_DEPTH_SHIFT) + 1)
+
+
+def body_offset(layout):
+    """Return the slot where the payload starts for a layout"""
+    if layout == HEADER_LAYOUT:
+        return HEADER_BITS
+    return HEADER_PIXELS * layout.channels
+
+
+def body_slots(pixel_count, layout=HEADER_LAYOUT):
+    """Return how many slots follow the header in pixel_count pixels"""
+    return max(pixel_count * layout.channels - body_offset(layout), 0)
+
+
+def capacity_bits(pixel_count, layout=HEADER_LAYOUT, scattered=False):
+    """Return how many container bits (header included) fit in pixel_count pixels"""
+    if scattered:
+        if pixel_count < HEADER_PIXELS:
+            return 0
+        return HEADER_BITS + body_slots(pixel_count, layout) // SCATTER_DENSITY * layout.depth
+    if layout == HEADER_LAYOUT:
+        return pixel_count * layout.channels
+    if pixel_count < HEADER_PIXELS:
+        return 0
+    return HEADER_BITS + (pixel_count - HEADER_PIXELS) * layout.channels * layout.depth
+
+
+def pack_container(payload, flags=0):
+    """Prefix payload bytes with a container header"""
+    payload = bytes(payload)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, flags, len(payload), zlib.crc32(payload))
+    return header + payload
+
+
+def container_bits(payload_length):
+    """Return the number of embedded bits needed for a payload of payload_length bytes"""
+    return (HEADER.size + payload_length) * 8
+
+
+def container_streams(payload, flags=0, seed=None, pixel_count=None):
+    """Return the (slot values, slot offset, layout) streams that make up a container
+
+    Scattered containers need the seed and image pixel_count; their body
+    stream's offset is the array of slots its values go to.
+    """
+    container = pack_container(payload, flags)
+    layout = flags_layout(flags)
+    if layout == HEADER_LAYOUT and not flags & FLAG_SCATTER:
+        return [(stego_engine.payload_bits(container), 0, HEADER_LAYOUT)]
+    body = stego_engine.slot_values(
+        stego_engine.payload_bits(container[HEADER.size:]), layout.depth
+    )
+    if flags & FLAG_SCATTER:
+        offset = scattered_slots(seed, pixel_count, layout, len(payload))
+    else:
+        offset = body_offset(layout)
+    return [
+        (stego_engine.payload_bits(container[:HEADER.size]), 0, HEADER_LAYOUT),
+        (body, offset, layout),
+    ]
+
+
+def pixels_needed(streams):
+    """Return how many leading pixels the container streams touch"""
+    return max(
+        -(-stego_engine.stream_end(offset, values.size) // layout.channels)
+        for values, offset, layout in streams
+    )
+
+
+def check_fits(payload_length, flags, pixel_count, channels):
+    """Raise ValueError if a payload cannot be embedded in an image"""
+    layout = flags_layout(flags)
+    if layout.channels > channels:
+        raise ValueError("Image has no alpha channel to embed into")
+    needed = container_bits(payload_length)
+    capacity = capacity_bits(pixel_count, layout, bool(flags & FLAG_SCATTER))
+    if needed > capacity:
+        raise ValueError(
+            f"Message too large for this image: needs {needed} bits, image holds {capacity}"
+        )
+
+
+def parse_header(data):
+    """Parse and validate a container header from the first HEADER.size bytes"""
+    if len(data) < HEADER.size:
+        raise PayloadNotFoundError("Image is too small to carry a payload header")
+    magic, version, flags, length, checksum = HEADER.unpack(data[:HEADER.size])
+    if magic != MAGIC:
+        raise PayloadNotFoundError("No StegoExpress payload header found")
+    if version > FORMAT_VERSION:
+        raise CorruptPayloadError(f"Unsupported payload format version {version}")
+    return Header(version, flags, length, checksum)
+
+
+def header_layout(header):
+    """Return the payload layout for a parsed header"""
+    if header.version == 1:
+        return HEADER_LAYOUT
+    return flags_layout(header.flags)
+
+
+def is_scattered(header):
+    """Return True if a header describes a scattered payload body"""
+    return header.version > 1 and bool(header.flags & FLAG_SCATTER)
+
+
+class ScatterCache:
+    """Thread-safe LRU cache of scattered slot arrays keyed by seed, pixel count and layout
+
+    Each entry holds the longest array drawn so far; shorter payloads use a
+    prefix of it. Entries are evicted oldest first to stay under max_bytes.
+    """
+
+    def __init__(self, max_bytes=SCATTER_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, seed, pixel_count, layout, count):
+        """Return count slots for a scattered body, drawing and caching them on a miss"""
+        key = (seed, pixel_count, layout)
+        with self.lock:
+            slots = self.items.get(key)
+            if slots is not None and slots.size >= count:
+                self.items.move_to_end(key)
+                return slots[:count]
+        slots = stego_engine.scatter_slots(
+            seed, body_slots(pixel_count, layout), count, body_offset(layout)
+        )
+        if slots.nbytes > self.max_bytes:
+            return slots
+        with self.lock:
+            cached = self.items.get(key)
+            if cached is None or cached.size < slots.size:
+                self.items[key] = slots
+                self.items.move_to_end(key)
+                while sum(item.nbytes for item in self.items.values()) > self.max_bytes:
+                    self.items.popitem(last=False)
+        return slots
+
+
+_scatter_cache = ScatterCache()
+
+
+def scattered_slots(seed, pixel_count, layout, payload_length):
+    """Return the slots a scattered body of payload_length bytes occupies, in stream order"""
+    if seed is None:
+        raise ValueError("A key is needed to locate a scattered payload")
+    count = stego_engine.slot_count(payload_length, layout.depth)
+    return _scatter_cache.get(seed, pixel_count, layout, count)
+
+
+def embed_payload(image, payload, flags=0, progress=None, seed=None):
+    """Embed payload with its container header into an RGB/RGBA PIL image, in place
+
+    Scattered payloads (FLAG_SCATTER) need the seed their slots are drawn from.
+    """
+    width, height = image.size
+    check_fits(len(payload), flags, width * height, len(image.mode))
+    block = stego_engine.pixel_block(image)
+    for values, offset, layout in container_streams(payload, flags, seed, width * height):
+        stego_engine.write_block(block, values, offset, layout, progress=progress)
+    return stego_engine.store_block(image, block)
+
+
+def read_header(read, pixel_count, channels=stego_engine.CHANNELS):
+    """Read a container header through read(byte_count, slot_offset, layout) -> bytes
+
+    Checks that the payload it describes fits the image, without reading it.
+    """
+    header = parse_header(read(HEADER.size, 0, HEADER_LAYOUT))
+    layout = header_layout(header)
+    capacity = capacity_bits(pixel_count, layout, is_scattered(header))
+    if layout.channels > channels or container_bits(header.length) > capacity:
+        raise CorruptPayloadError("Payload length in header exceeds image capacity")
+    return header
+
+
+def read_container(read, pixel_count, channels=stego_engine.CHANNELS, seed=None):
+    """Read and verify a container through read(byte_count, slot_offset, layout) -> bytes
+
+    For scattered payloads, slot_offset is an array of slot indexes drawn
+    from seed. Returns (header, payload).
+    """
+    header = read_header(read, pixel_count, channels)
+    layout = header_layout(header)
+    if is_scattered(header):
+        offset = scattered_slots(seed, pixel_count, layout, header.length)
+    else:
+        offset = body_offset(layout)
+    payload = read(header.length, offset, layout)
+    if zlib.crc32(payload) != header.checksum:
+        if is_scattered(header):
+            # Slots drawn from the wrong key read back noise
+            raise CorruptPayloadError("Wrong key or damaged payload")
+        raise CorruptPayloadError("Payload checksum mismatch, image may be damaged")
+    return header, payload
+
+
+def extract_payload(image, seed=None):
+    """Extract (header, payload) from a PIL image, reading only header + length bits
+
+    seed is needed only for scattered payloads.
+    """
+    width, height = image.size
+    return read_container(
+        partial(stego_engine.extract_from_image, image),
+        width * height,
+        len(image.mode),
+        seed
+    )
+
+
+def extract_header(image):
+    """Read only the container header from a PIL image"""
+    width, height = image.size
+    return read_header(
+        partial(stego_engine.extract_from_image, image),
+        width * height,
+        len(image.mode)
+    )
+
+
+def extract_legacy_token(image):
+    """Recover a Fernet token from a headerless image written before format version 1"""
+    extracted = stego_engine.extract_from_image(image)
+    # Legacy images carry no length, so cut the token where the base64 text ends
+    text = extracted.decode("utf-8", errors="ignore").rstrip("\x00")
+    return _trim_legacy_token(_LEGACY_TOKEN.match(text.encode()).group())
+
+
+def _trim_legacy_token(text):
+    """Drop cover noise that happens to read as base64 from the end of a legacy token"""
+    padding = text.find(b"=")
+    if padding >= 0:
+        # Padding fills out the token's last group of four characters
+        end = (padding // 4 + 1) * 4
+        if text[padding:end] == b"=" * (end - padding) and _token_size(end, end - padding):
+            return text[:end]
+        text = text[:padding]
+    # Unpadded tokens end on the last whole group of a valid token size
+    for length in range(len(text) // 4 * 4, 0, -4):
+        if _token_size(length, 0):
+            return text[:length]
+    return text
+
+
+def _token_size(length, padding):
+    """Return True if length base64 characters, padding of them '=', decode to a Fernet token"""
+    body = length // 4 * 3 - padding - _LEGACY_TOKEN_OVERHEAD
+    return padding < 3 and body >= 0 and body % _LEGACY_TOKEN_BLOCK == 0
@@ -0,0 +1,411 @@
+"""Importable hide/extract API for StegoExpress with no GUI dependency"""
+import hashlib
+import os
+from collections import namedtuple
+from functools import lru_cache
+
+from cryptography.fernet import Fernet, InvalidToken
+from PIL import Image
+
+import stego_container
+import stego_engine
+import stego_mmap
+import stego_output
+import stego_options
+import stego_payload
+import stego_stream
+import stego_trace
+
+
+# saved is the SaveWorker future when the image is still being written in the background
+HideResult = namedtuple("HideResult", ["key", "output_path", "saved"], defaults=(None,))
+
+# An encrypted payload ready to embed: flags and seed go with it into the container
+PreparedPayload = namedtuple("PreparedPayload", ["key", "token", "flags", "seed"])
+
+# What an image carried: file_name is None for text messages
+Extracted = namedtuple("Extracted", ["file_name", "data"])
+
+# Embedding modes as "<channels>-<LSBs per channel>", e.g. "rgb-1" or "rgba-2"
+DEFAULT_MODE = stego_options.DEFAULT_MODE
+MODES = stego_options.MODES
+
+# Raw Fernet token layout: version, timestamp, IV, AES-CBC ciphertext, HMAC
+_FERNET_OVERHEAD = 1 + 8 + 16 + 32
+_AES_BLOCK = 16
+
+# Bytes written per call when saving extracted files
+WRITE_CHUNK_SIZE = 1 << 20
+
+# Distinct keys whose Fernet ciphers are kept for reuse
+CIPHER_CACHE_SIZE = 16
+
+# Mixed into the key when deriving the scattered-embedding seed, so the seed
+# reveals nothing about the cipher key
+SCATTER_SEED_CONTEXT = b"StegoExpress scatter v1\0"
+
+
+def generate_key():
+    """Generate a new Fernet key as text"""
+    return Fernet.generate_key().decode()
+
+
+def cipher(key):
+    """Return the Fernet cipher for a text or bytes key, raising ValueError if it is malformed
+
+    Ciphers are cached, so extracting many images under one key decodes and
+    validates the key once.
+    """
+    if isinstance(key, str):
+        key = key.strip().encode()
+    return _cipher(bytes(key))
+
+
+def scatter_seed(key):
+    """Return the integer seed that picks the slots of a scattered payload for a key"""
+    if isinstance(key, str):
+        key = key.strip().encode()
+    return int.from_bytes(hashlib.sha256(SCATTER_SEED_CONTEXT + bytes(key)).digest(), "big")
+
+
+def default_output_path(image_path, output_dir="", profile=stego_output.DEFAULT_PROFILE):
+    """Return the stego-image path for a cover: <name>_stego.png (or the profile's extension)"""
+    stem, cover_extension = os.path.splitext(os.path.basename(image_path))
+    extension = stego_output.get_profile(profile).extension or cover_extension
+    name = f"{stem}_stego{extension}"
+    return os.path.join(output_dir, name)
+
+
+def pack_payload(data, key, codec="auto"):
+    """Compress then encrypt data, returning (header flags, raw token to embed)"""
+    codec_id, body = stego_payload.compress(data, codec)
+    token = stego_payload.raw_token(cipher(key).encrypt(body))
+    return codec_id, token
+
+
+def unpack_payload(header, payload, key):
+    """Decrypt then decompress an extracted payload back into the original bytes
+
+    header is None for legacy headerless images, whose payload is base64 text.
+    """
+    try:
+        if header is None or header.version == 1:
+            return cipher(key).decrypt(payload)
+        body = cipher(key).decrypt(stego_payload.text_token(payload))
+    except InvalidToken:
+        raise ValueError("Wrong key or damaged payload") from None
+    return stego_payload.decompress(header.flags & stego_payload.CODEC_MASK, body)
+
+
+def token_size(body_length):
+    """Return the raw Fernet token size in bytes for body_length bytes of plaintext"""
+    return _FERNET_OVERHEAD + (body_length // _AES_BLOCK + 1) * _AES_BLOCK
+
+
+def required_bits(message, codec="auto"):
+    """Return the number of embedded bits needed to hide a text message"""
+    _, body = stego_payload.compress(message.encode(), codec)
+    return stego_container.container_bits(token_size(len(body)))
+
+
+def required_file_bits(file_path):
+    """Return the embedded bits needed to hide a file uncompressed (an upper bound)"""
+    name = os.path.basename(file_path).encode("utf-8")
+    record_size = stego_payload.FILE_RECORD.size + len(name) + os.path.getsize(file_path)
+    return stego_container.container_bits(token_size(record_size))
+
+
+def mode_layout(mode):
+    """Return the engine Layout for an embedding mode name such as 'rgba-2'"""
+    if mode not in MODES:
+        raise ValueError(f"Unknown embedding mode '{mode}', expected one of: {', '.join(MODES)}")
+    channels, depth = mode.split("-")
+    return stego_engine.Layout(len(channels), int(depth))
+
+
+def layout_mode(layout):
+    """Return the embedding mode name for an engine Layout, the inverse of mode_layout()"""
+    return f"{'rgba' if layout.channels == 4 else 'rgb'}-{layout.depth}"
+
+
+def image_capacity(image_path, scatter=False):
+    """Return the embedding capacity in bits per mode, reading only the image header
+
+    Modes using the alpha channel are listed only for images that have one.
+    Scattered payloads fit in a fraction of the sequential capacity.
+    """
+    pixel_map = stego_mmap.probe(image_path)
+    if pixel_map is not None:
+        width, height, channels = pixel_map.width, pixel_map.height, len(pixel_map.mode)
+    else:
+        with Image.open(image_path) as image:
+            width, height = image.size
+            channels = len(stego_engine.normalized_mode(image))
+    capacity = {}
+    for mode in MODES:
+        layout = mode_layout(mode)
+        if layout.channels <= channels:
+            capacity[mode] = stego_container.capacity_bits(width * height, layout, scatter)
+    return capacity
+
+
+def check_capacity(image_path, message, codec="auto", mode=DEFAULT_MODE, scatter=False):
+    """Raise ValueError if message cannot fit in image_path, before decoding any pixels"""
+    _check_bits(image_path, required_bits(message, codec), mode, scatter)
+
+
+def hide_message(image_path, message, output_path=None, key=None, strip_rows=None,
+                 progress=None, codec="auto", mode=DEFAULT_MODE,
+                 profile=stego_output.DEFAULT_PROFILE, saver=None, scatter=False):
+    """Compress, encrypt and embed message in image_path, returning the key and output path
+
+    codec picks the compression stage ('auto' tries each and keeps the
+    smallest, skipping compression when it does not help). mode selects the
+    channels and LSB depth, e.g. 'rgb-1' (default) or 'rgba-2'. profile picks
+    the output encoder (see stego_output.PROFILES); the "raw" profile patches
+    a copy of an uncompressed BMP, TIFF or .npy cover through a memory map
+    without decoding or encoding it. With scatter, the payload
+    goes to slots spread over the whole image in an order derived from the
+    key instead of the leading pixels. With strip_rows set, PNG
+    covers are processed in strips of that many rows so memory stays bounded
+    regardless of image size. With a stego_output.SaveWorker as saver, the
+    result is returned as soon as the image is queued for saving and its
+    saved future completes once the file is written. progress, if given, is
+    called with the fraction of work done; an exception raised from it aborts
+    the operation.
+    """
+    if not message:
+        raise ValueError("Message is empty")
+    with stego_trace.operation("hide", image=image_path, mode=mode, profile=profile,
+                               scatter=scatter):
+        return _hide(image_path, message.encode(), 0, output_path, key, strip_rows, progress,
+                     codec, mode, profile, saver, scatter)
+
+
+def hide_file(image_path, file_path, output_path=None, key=None, strip_rows=None,
+              progress=None, codec="auto", mode=DEFAULT_MODE,
+              profile=stego_output.DEFAULT_PROFILE, saver=None, scatter=False):
+    """Hide any file in image_path with its name and size; options as for hide_message()"""
+    with stego_trace.operation("hide", image=image_path, mode=mode, profile=profile,
+                               scatter=scatter):
+        with stego_trace.span("read_file") as span:
+            with open(file_path, "rb") as payload_file:
+                data = payload_file.read()
+            span["bytes"] = len(data)
+        record = stego_payload.pack_file(file_path, data)
+        return _hide(image_path, record, stego_payload.FLAG_FILE, output_path, key, strip_rows,
+                     progress, codec, mode, profile, saver, scatter)
+
+
+def prepare_payload(image_path, data, flags=0, key=None, codec="auto", mode=DEFAULT_MODE,
+                    scatter=False):
+    """Compress and encrypt data for image_path and check that it fits, returning a PreparedPayload
+
+    Only the cover's header is read. flags gains the codec, mode and scatter
+    bits; seed is set for scattered payloads.
+    """
+    key = key or generate_key()
+    # Timed together with compression, which runs first on the same bytes
+    with stego_trace.span("encrypt", bytes=len(data)) as span:
+        codec_id, token = pack_payload(data, key, codec)
+        span["token_bytes"] = len(token)
+    _check_bits(image_path, stego_container.container_bits(len(token)), mode, scatter)
+    flags |= codec_id | stego_container.layout_flags(mode_layout(mode))
+    seed = None
+    if scatter:
+        flags |= stego_container.FLAG_SCATTER
+        seed = scatter_seed(key)
+    return PreparedPayload(key, token, flags, seed)
+
+
+def decode_cover(image_path):
+    """Decode a cover image into the mode its payload is embedded in"""
+    with stego_trace.span("decode") as span:
+        image = stego_engine.normalize_image(Image.open(image_path))
+        image.load()
+        span["pixels"] = image.width * image.height
+    return image
+
+
+def embed_prepared(image, prepared, progress=None):
+    """Embed a PreparedPayload with its container header into a decoded cover, in place"""
+    with stego_trace.span("embed", pixels=image.width * image.height, bytes=len(prepared.token)):
+        stego_container.embed_payload(
+            image, prepared.token, prepared.flags, progress, prepared.seed
+        )
+    return image
+
+
+def _hide(image_path, data, flags, output_path, key, strip_rows, progress, codec, mode,
+          profile, saver, scatter):
+    """Shared hide pipeline: compress, encrypt, check capacity, embed and save"""
+    report = progress or _ignore_progress
+    mapped = stego_output.get_profile(profile).format is None
+    output_path = output_path or default_output_path(image_path, profile=profile)
+    _check_paths(image_path, output_path, profile)
+    compress_level = stego_output.png_compress_level(profile) if strip_rows and not mapped else None
+    prepared = prepare_payload(image_path, data, flags, key, codec, mode, scatter)
+    key, token, flags, seed = prepared
+    report(0.05)
+
+    if mapped:
+        # Only the pages holding payload bits are read and written
+        with stego_trace.span("map", bytes=len(token)) as span:
+            stego_mmap.embed_payload_file(
+                image_path, output_path, token, flags, seed, _scaled(report, 0.05, 1.0),
+                strip_rows or stego_mmap.DEFAULT_STRIP_ROWS
+            )
+            span["file_bytes"] = os.path.getsize(output_path)
+        return HideResult(key, output_path)
+    if strip_rows:
+        # Decoding, embedding and encoding are interleaved strip by strip
+        with stego_trace.span("stream", bytes=len(token)):
+            stego_stream.embed_payload_file(
+                image_path, output_path, token, strip_rows, compress_level,
+                progress=_scaled(report, 0.05, 1.0), flags=flags, seed=seed
+            )
+        return HideResult(key, output_path)
+    image = decode_cover(image_path)
+    report(0.3)
+    embed_prepared(image, prepared, _scaled(report, 0.3, 0.6))
+    if saver is not None:
+        # The save itself runs on the worker, outside this operation
+        with stego_trace.span("queue_save"):
+            saved = saver.submit(image, output_path, profile)
+        return HideResult(key, output_path, saved)
+    with stego_trace.span("save", pixels=image.width * image.height) as span:
+        stego_output.save_image(image, output_path, profile)
+        span["bytes"] = os.path.getsize(output_path)
+    return HideResult(key, output_path)
+
+
+def extract_token(image_path, progress=None, key=None):
+    """Read (header, encrypted payload) from a stego-image; header is None for legacy images
+
+    The key is needed only to locate scattered payloads.
+    """
+    report = progress or _ignore_progress
+    seed = scatter_seed(key) if key else None
+    if stego_stream.is_streamable(image_path):
+        # Decodes only the rows holding the payload instead of the whole image
+        try:
+            return stego_stream.extract_payload_file(image_path, seed=seed)
+        except stego_container.PayloadNotFoundError:
+            pass
+    elif stego_mmap.is_mappable(image_path):
+        # Reads only the pages holding the payload, without decoding the image
+        try:
+            return stego_mmap.extract_payload_file(image_path, seed)
+        except stego_container.PayloadNotFoundError:
+            pass
+    image = stego_engine.normalize_image(Image.open(image_path))
+    image.load()
+    report(0.5)
+    try:
+        return stego_container.extract_payload(image, seed)
+    except stego_container.PayloadNotFoundError:
+        return None, stego_container.extract_legacy_token(image)
+
+
+def extract_data(image_path, key, progress=None):
+    """Extract and decrypt whatever a stego-image carries as Extracted(file_name, data)
+
+    file_name is None for text messages; file contents are a memoryview so
+    large files are never copied into a string.
+    """
+    report = progress or _ignore_progress
+    with stego_trace.operation("extract", image=image_path):
+        with stego_trace.span("read") as span:
+            header, payload = extract_token(image_path, _scaled(report, 0.0, 0.9), key)
+            span["bytes"] = len(payload)
+        report(0.9)
+        with stego_trace.span("decrypt", bytes=len(payload)) as span:
+            data = unpack_payload(header, payload, key)
+            span["data_bytes"] = len(data)
+        if header is not None and header.flags & stego_payload.FLAG_FILE:
+            return Extracted(*stego_payload.unpack_file(data))
+        return Extracted(None, data)
+
+
+def extract_message(image_path, key, progress=None):
+    """Extract and decrypt the hidden message from a stego-image"""
+    file_name, data = extract_data(image_path, key, progress)
+    if file_name is not None:
+        raise ValueError(f"Image holds a file ({file_name}), not a text message")
+    return data.decode()
+
+
+def extract_file(image_path, key, output_dir="", progress=None):
+    """Extract a hidden file into output_dir under its stored name, returning its path
+
+    An existing file is never overwritten; a numbered name is used instead.
+    """
+    with stego_trace.operation("extract", image=image_path):
+        file_name, data = extract_data(image_path, key, progress)
+        if file_name is None:
+            raise ValueError("Image holds a text message, not a file")
+        with stego_trace.span("write", bytes=len(data)):
+            return save_file(unique_path(output_dir, file_name), data)
+
+
+def save_file(path, data, progress=None):
+    """Write bytes to path in WRITE_CHUNK_SIZE pieces without copying them, returning path"""
+    view = memoryview(data)
+    with open(path, "wb") as output:
+        for start in range(0, len(view), WRITE_CHUNK_SIZE):
+            output.write(view[start:start + WRITE_CHUNK_SIZE])
+            if progress:
+                progress(min(start + WRITE_CHUNK_SIZE, len(view)) / len(view))
+    return path
+
+
+def unique_path(directory, name):
+    """Return directory/name, or directory/name (n).ext if that already exists"""
+    path = os.path.join(directory, name)
+    stem, extension = os.path.splitext(name)
+    number = 1
+    while os.path.exists(path):
+        path = os.path.join(directory, f"{stem} ({number}){extension}")
+        number += 1
+    return path
+
+
+def _check_paths(image_path, output_path, profile):
+    """Raise ValueError unless profile can write output_path from this cover"""
+    cover_format = None
+    if stego_output.get_profile(profile).format is None:
+        pixel_map = stego_mmap.probe(image_path)
+        if pixel_map is None:
+            raise ValueError(
+                f"The '{profile}' profile needs an uncompressed RGB/RGBA BMP, TIFF or .npy cover"
+            )
+        cover_format = pixel_map.format
+    elif image_path.lower().endswith(stego_mmap.NPY_EXTENSION):
+        raise ValueError(".npy covers can only be written with the 'raw' profile")
+    stego_output.check_output_path(output_path, profile, cover_format)
+
+
+def _check_bits(image_path, needed, mode, scatter=False):
+    """Raise ValueError unless needed bits fit image_path in mode, from the header alone"""
+    capacity = image_capacity(image_path, scatter)
+    if mode not in capacity:
+        raise ValueError(f"Mode '{mode}' needs an image with an alpha channel")
+    if needed > capacity[mode]:
+        raise ValueError(
+            f"Message too large for this image: needs {needed} bits, image holds {capacity[mode]}"
+        )
+
+
+def _ignore_progress(_fraction):
+    """Default progress callback that does nothing"""
+
+
+def _scaled(progress, start, end):
+    """Map a 0..1 progress callback onto the start..end range of an outer one"""
+    return lambda fraction: progress(start + (end - start) * fraction)
+
+
+@lru_cache(maxsize=CIPHER_CACHE_SIZE)
+def _cipher(key):
+    """Build (once per key) the Fernet cipher for cipher()"""
+    return Fernet(key)
@@ -0,0 +1,263 @@
+"""Vectorized LSB embed/extract engine working on NumPy pixel buffers
+
+Payload bits are written into "slots": the colour channels of each pixel in
+raster order. A Layout selects how many channels per pixel carry data (3 for
+RGB, 4 to include alpha) and how many low bits of each channel are used.
+A stream of slot values either fills consecutive slots from an offset or,
+when scattered, goes to an array of slot indexes drawn by scatter_slots().
+"""
+import math
+from collections import namedtuple
+
+import numpy as np
+
+
+Layout = namedtuple("Layout", ["channels", "depth"])
+
+# Number of colour channels carrying payload bits per pixel
+CHANNELS = 3
+DEFAULT_LAYOUT = Layout(CHANNELS, 1)
+
+# Slots written between progress callbacks
+PROGRESS_CHUNK_BITS = 1 << 22
+
+# Extra raw draws per scatter_slots() round, so a round rarely falls just short
+SCATTER_DRAW_MARGIN = 64
+
+
+def payload_bits(payload):
+    """Unpack payload bytes into a uint8 array of bits, MSB first"""
+    return np.unpackbits(np.frombuffer(bytes(payload), dtype=np.uint8))
+
+
+def slot_values(bits, depth=1):
+    """Group a bit array into depth-bit slot values, MSB first, zero-padding the tail"""
+    if depth == 1:
+        return bits
+    padding = -bits.size % depth
+    if padding:
+        bits = np.concatenate([bits, np.zeros(padding, dtype=np.uint8)])
+    weights = (1 << np.arange(depth - 1, -1, -1)).astype(np.uint8)
+    return (bits.reshape(-1, depth) * weights).sum(axis=1, dtype=np.uint8)
+
+
+def slot_bits(values, depth=1):
+    """Expand depth-bit slot values back into a bit array, MSB first"""
+    if depth == 1:
+        return values & 1
+    return np.unpackbits(values[:, None], axis=1)[:, 8 - depth:].reshape(-1)
+
+
+def write_slots(slots, values, depth=1, progress=None):
+    """Write slot values into the low depth bits of a flat uint8 buffer, in place
+
+    progress, if given, is called with the fraction written after each chunk.
+    """
+    count = min(values.size, slots.size)
+    keep = np.uint8(0xFF ^ ((1 << depth) - 1))
+    for start in range(0, count, PROGRESS_CHUNK_BITS):
+        stop = min(start + PROGRESS_CHUNK_BITS, count)
+        target = slots[start:stop]
+        target &= keep
+        target |= values[start:stop]
+        if progress:
+            progress(stop / count)
+    return count
+
+
+def write_block(block, values, slot_offset=0, layout=DEFAULT_LAYOUT, first_pixel=0,
+                progress=None):
+    """Write the part of a slot stream that falls inside a block of pixels, in place
+
+    block is a (pixels, channels) uint8 array holding image pixels
+    first_pixel onwards. Pixel p owns slots p * layout.channels onwards and
+    the stream's first value goes to slot slot_offset, or each value to its
+    own slot when slot_offset is an index array. Returns slots written.
+    """
+    if isinstance(slot_offset, np.ndarray):
+        return write_scattered(block, values, slot_offset, layout, first_pixel, progress)
+    channels, depth = layout
+    low = max(slot_offset, first_pixel * channels)
+    high = min(slot_offset + values.size, (first_pixel + len(block)) * channels)
+    if high <= low:
+        return 0
+    start = low // channels - first_pixel
+    stop = -(-high // channels) - first_pixel
+    in_place = channels == block.shape[1]
+    # Selecting fewer channels than the block holds makes reshape copy
+    slots = block[start:stop, :channels].reshape(-1)
+    local = low - (start + first_pixel) * channels
+    write_slots(
+        slots[local:local + high - low],
+        values[low - slot_offset:high - slot_offset],
+        depth,
+        progress
+    )
+    if not in_place:
+        block[start:stop, :channels] = slots.reshape(stop - start, channels)
+    return high - low
+
+
+def write_scattered(block, values, slots, layout=DEFAULT_LAYOUT, first_pixel=0, progress=None):
+    """Write values[i] into slot slots[i] for slots inside a block of pixels, in place"""
+    channels, depth = layout
+    low = first_pixel * channels
+    high = (first_pixel + len(block)) * channels
+    slots = slots[:values.size]
+    values = values[:slots.size]
+    if first_pixel or slots.size and slots.max() >= high:
+        inside = (slots >= low) & (slots < high)
+        slots, values = slots[inside] - low, values[inside]
+    keep = np.uint8(0xFF ^ ((1 << depth) - 1))
+    for start in range(0, slots.size, PROGRESS_CHUNK_BITS):
+        stop = min(start + PROGRESS_CHUNK_BITS, slots.size)
+        pixels, channel = np.divmod(slots[start:stop], channels)
+        block[pixels, channel] = (block[pixels, channel] & keep) | values[start:stop]
+        if progress:
+            progress(stop / slots.size)
+    return slots.size
+
+
+def read_scattered(block, slots, layout=DEFAULT_LAYOUT):
+    """Return the slot values at an array of slot indexes of a pixel block"""
+    pixels, channel = np.divmod(slots, layout.channels)
+    return block[pixels, channel] & np.uint8((1 << layout.depth) - 1)
+
+
+def scatter_slots(seed, population, count, start=0):
+    """Return count distinct slot indexes in [start, start + population), in seeded random order
+
+    A vectorized partial shuffle: only count indexes are drawn, never a
+    permutation of the whole population. They are the first count distinct
+    values of a PCG64 stream reduced modulo population, so the result depends
+    on nothing but the seed (not the NumPy version) and a shorter request is
+    always a prefix of a longer one.
+    """
+    if count > population:
+        raise ValueError("More scattered slots requested than the image holds")
+    generator = np.random.PCG64(seed)
+    chosen = np.zeros(0, dtype=np.uint64)
+    taken = chosen
+    while chosen.size < count:
+        need = count - chosen.size
+        free = population - chosen.size
+        # Draws expected to turn up need values not taken yet
+        draws = -population * math.log1p(-min(need / free, 0.99))
+        draws = generator.random_raw(int(draws * 1.01) + SCATTER_DRAW_MARGIN)
+        draws %= np.uint64(population)
+        draws = _first_occurrences(draws)
+        if taken.size:
+            found = np.searchsorted(taken, draws)
+            draws = draws[taken[np.minimum(found, taken.size - 1)] != draws]
+        chosen = np.concatenate([chosen, draws[:need]])
+        taken = np.sort(chosen)
+    dtype = np.uint32 if start + population <= 1 << 32 else np.uint64
+    return (chosen + np.uint64(start)).astype(dtype)
+
+
+def stream_end(slot_offset, count):
+    """Return the slot after the last of count slots starting at slot_offset (or listed in it)"""
+    if isinstance(slot_offset, np.ndarray):
+        return int(slot_offset[:count].max()) + 1 if count else 0
+    return slot_offset + count
+
+
+def read_block(block, count, slot_offset=0, layout=DEFAULT_LAYOUT):
+    """Return up to count slot values starting at slot_offset of a pixel block"""
+    channels, depth = layout
+    end = min(slot_offset + count, len(block) * channels)
+    if end <= slot_offset:
+        return np.zeros(0, dtype=np.uint8)
+    start = slot_offset // channels
+    stop = -(-end // channels)
+    slots = block[start:stop, :channels].reshape(-1)
+    local = slot_offset - start * channels
+    return slots[local:local + end - slot_offset] & np.uint8((1 << depth) - 1)
+
+
+def read_bytes(block, byte_count, slot_offset=0, layout=DEFAULT_LAYOUT):
+    """Read byte_count bytes from a slot stream inside a pixel block
+
+    slot_offset is the stream's first slot, or an array of slot indexes for
+    a scattered stream.
+    """
+    count = slot_count(byte_count, layout.depth)
+    if isinstance(slot_offset, np.ndarray):
+        values = read_scattered(block, slot_offset[:count], layout)
+    else:
+        values = read_block(block, count, slot_offset, layout)
+    return np.packbits(slot_bits(values, layout.depth)[:byte_count * 8]).tobytes()
+
+
+def slot_count(byte_count, depth=1):
+    """Return how many slots byte_count bytes occupy at the given depth"""
+    return -(-byte_count * 8 // depth)
+
+
+def normalized_mode(image):
+    """Return the mode ('RGB' or 'RGBA') an image is embedded in, from its header alone"""
+    if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info:
+        return "RGBA"
+    return "RGB"
+
+
+def normalize_image(image):
+    """Convert L, P, CMYK and other modes to RGB, or to RGBA when they carry transparency"""
+    mode = normalized_mode(image)
+    return image if image.mode == mode else image.convert(mode)
+
+
+def pixel_block(image):
+    """Return a writable (pixels, channels) uint8 copy of an RGB or RGBA image"""
+    _check_mode(image)
+    return np.array(image, dtype=np.uint8).reshape(-1, len(image.mode))
+
+
+def store_block(image, block):
+    """Write a pixel block back into its image, keeping mode and info"""
+    # frombytes keeps the ICC profile and other info so the saved PNG
+    # matches what putdata() used to produce
+    image.frombytes(block.tobytes())
+    return image
+
+
+def leading_block(image, slot_end, channels):
+    """Return a pixel block for just the leading rows that hold slots below slot_end"""
+    width, height = image.size
+    pixels = -(-slot_end // channels)
+    rows = min(height, -(-pixels // width))
+    if rows < height:
+        image = image.crop((0, 0, width, rows))
+    return np.asarray(image, dtype=np.uint8).reshape(-1, len(image.mode))
+
+
+def extract_from_image(image, byte_count=None, slot_offset=0, layout=DEFAULT_LAYOUT):
+    """Extract byte_count bytes (or all available) from a slot stream of a PIL image"""
+    _check_mode(image)
+    width, height = image.size
+    if byte_count is None:
+        available = width * height * layout.channels - slot_offset
+        byte_count = max(available * layout.depth // 8, 0)
+    slot_end = stream_end(slot_offset, slot_count(byte_count, layout.depth))
+    block = leading_block(image, slot_end, layout.channels)
+    return read_bytes(block, byte_count, slot_offset, layout)
+
+
+def _first_occurrences(values):
+    """Return a uint64 array without repeats, keeping each value's first occurrence in order"""
+    if values.size and values.size <= 1 << 32 and values.max() < 1 << 32:
+        # Sorting (value, index) pairs packed into one uint64 is several
+        # times faster than the stable argsort np.unique(return_index=True) uses
+        packed = np.sort((values << np.uint64(32)) | np.arange(values.size, dtype=np.uint64))
+        sorted_values = packed >> np.uint64(32)
+        first = np.ones(packed.size, dtype=bool)
+        first[1:] = sorted_values[1:] != sorted_values[:-1]
+        return values[np.sort(packed[first] & np.uint64(0xFFFFFFFF))]
+    _, first = np.unique(values, return_index=True)
+    return values[np.sort(first)]
+
+
+def _check_mode(image):
+    """Raise ValueError unless the image is RGB or RGBA"""
+    if image.mode not in ("RGB", "RGBA"):
+        raise ValueError(f"Unsupported image mode '{image.mode}', expected RGB or RGBA")
@@ -0,0 +1,39 @@
+"""Deferred imports, so the GUI window can open before the heavy backends are loaded"""
+import importlib
+import threading
+
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access"""
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def __getattr__(self, attribute):
+        module = self._module
+        if module is None:
+            # import_module serializes concurrent first imports of the same module
+            module = importlib.import_module(self._name)
+            self.__dict__["_module"] = module
+        return getattr(module, attribute)
+
+    def __repr__(self):
+        return f"<lazy module '{self._name}'>"
+
+
+def warm_up(names):
+    """Import modules on a daemon thread so their first use does not stall the caller"""
+    thread = threading.Thread(target=_import_all, args=(tuple(names),), name="stego-warm-up",
+                              daemon=True)
+    thread.start()
+    return thread
+
+
+def _import_all(names):
+    """Import each module, leaving failures to be reported on first real use"""
+    for name in names:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
@@ -0,0 +1,362 @@
+"""Configurable SMTP transport: pooled, reusable sessions and a background send queue
+
+Sessions are authenticated once and reused for every message sent through
+the pool, so bulk delivery pays for one TLS handshake and login per
+connection rather than per message. Messages are generated as a stream of
+byte chunks and attachments are base64-encoded piece by piece while being
+written to the socket, so memory use does not grow with attachment size.
+Point MailConfig at a local debugging server (e.g. `python -m aiosmtpd -n
+-l localhost:8025` with security="none") to test without a real mail account.
+"""
+import base64
+import csv
+import os
+import queue
+import re
+import smtplib
+import ssl
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from email import policy
+from email.message import Message
+from email.mime.base import MIMEBase
+from email.mime.text import MIMEText
+from email.utils import formatdate, make_msgid
+from functools import partial
+
+import stego_options
+import stego_trace
+
+
+DEFAULT_HOST = stego_options.DEFAULT_HOST
+SECURITY_MODES = stego_options.SECURITY_MODES
+DEFAULT_PORTS = stego_options.DEFAULT_PORTS
+
+DEFAULT_WORKERS = 2
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 1.0
+
+# Idle sessions older than this are probed with NOOP before being reused
+IDLE_CHECK_SECONDS = 10
+
+DELIVERY_FIELDS = ("image", "recipient")
+
+SUBJECT = "StegoExpress - Encrypted Image"
+
+# Raw attachment bytes read per chunk; a multiple of 57 so every chunk
+# encodes to whole 76-character base64 lines
+ATTACHMENT_READ_SIZE = 57 * 1024
+
+# Lines starting with a dot must be doubled inside SMTP DATA
+_LEADING_DOT = re.compile(rb"^\.", re.MULTILINE)
+
+MailConfig = namedtuple(
+    "MailConfig",
+    ["host", "port", "security", "username", "password", "timeout"],
+    defaults=(DEFAULT_HOST, DEFAULT_PORTS["starttls"], "starttls", None, None, 30)
+)
+
+# attachments is one path or a sequence of paths sent in the same message
+Delivery = namedtuple("Delivery", ["attachments", "recipient", "key"], defaults=(None,))
+
+# What a finished delivery resolves to; trace holds its connect/transmit timings
+Sent = namedtuple("Sent", ["recipient", "trace"])
+
+
+def is_transient(error):
+    """Return True for failures worth retrying: dropped sessions, network errors, 4xx replies"""
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    return isinstance(error, OSError)
+
+
+class SmtpPool:
+    """Keeps up to max_connections authenticated SMTP sessions open for reuse"""
+
+    def __init__(self, config, max_connections=DEFAULT_WORKERS):
+        if config.security not in SECURITY_MODES:
+            raise ValueError(
+                f"Unknown SMTP security '{config.security}',"
+                f" expected one of: {', '.join(SECURITY_MODES)}"
+            )
+        self.config = config
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.closed = False
+
+    def connect(self):
+        """Open, secure and log in a new SMTP session"""
+        config = self.config
+        with stego_trace.span("connect", host=config.host):
+            return self._connect()
+
+    def _connect(self):
+        """Open the session for connect()"""
+        config = self.config
+        if config.security == "ssl":
+            smtp = smtplib.SMTP_SSL(
+                config.host, config.port, timeout=config.timeout,
+                context=ssl.create_default_context()
+            )
+        else:
+            smtp = smtplib.SMTP(config.host, config.port, timeout=config.timeout)
+        try:
+            if config.security == "starttls":
+                smtp.starttls(context=ssl.create_default_context())
+            if config.username:
+                smtp.login(config.username, config.password or "")
+        except BaseException:
+            _quit(smtp)
+            raise
+        return smtp
+
+    def acquire(self):
+        """Return a live session, reusing an idle one when possible"""
+        self.slots.acquire()
+        try:
+            while True:
+                try:
+                    smtp, last_used = self.idle.get_nowait()
+                except queue.Empty:
+                    return self.connect()
+                if time.monotonic() - last_used < IDLE_CHECK_SECONDS or _alive(smtp):
+                    return smtp
+                _quit(smtp)
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def release(self, smtp, broken=False):
+        """Return a session to the pool, or close it if it failed or the pool is closed"""
+        if broken or self.closed:
+            _quit(smtp)
+        else:
+            self.idle.put((smtp, time.monotonic()))
+        self.slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a session for the duration of a with block"""
+        smtp = self.acquire()
+        try:
+            yield smtp
+        except Exception as e:
+            # A session closed mid-message cannot be reused whatever the error
+            self.release(smtp, broken=is_transient(e) or smtp.sock is None)
+            raise
+        except BaseException:
+            self.release(smtp, broken=True)
+            raise
+        self.release(smtp)
+
+    def close(self):
+        """Close every idle session; sessions in use are closed when released"""
+        self.closed = True
+        while True:
+            try:
+                smtp, _ = self.idle.get_nowait()
+            except queue.Empty:
+                return
+            _quit(smtp)
+
+
+class MailQueue:
+    """Sends messages on background threads over a shared SmtpPool, retrying transient failures
+
+    send() and send_bulk() return concurrent.futures.Future objects that
+    resolve to Sent(recipient, trace) or raise the final delivery error.
+    """
+
+    def __init__(self, config, workers=DEFAULT_WORKERS, retries=DEFAULT_RETRIES,
+                 backoff=DEFAULT_BACKOFF):
+        self.pool = SmtpPool(config, workers)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stego-mail")
+        self.retries = retries
+        self.backoff = backoff
+
+    def send(self, sender, attachments, recipient, key=None):
+        """Queue one message with one or more stego-images for one recipient"""
+        return self.executor.submit(self.deliver, sender, Delivery(attachments, recipient, key))
+
+    def send_bulk(self, sender, deliveries):
+        """Queue (attachments, recipient[, key]) deliveries, returning one future per item"""
+        return [self.send(sender, *delivery) for delivery in deliveries]
+
+    def deliver(self, sender, delivery):
+        """Stream one message, retrying transient failures with exponential backoff"""
+        paths = attachment_paths(delivery.attachments)
+        for path in paths:
+            # Missing files are permanent errors, so surface them before any retry loop
+            if not os.path.isfile(path):
+                raise FileNotFoundError(f"Attachment not found: {path}")
+        size = sum(os.path.getsize(path) for path in paths)
+        with stego_trace.operation("send", recipient=delivery.recipient,
+                                   attachments=len(paths)) as trace:
+            for attempt in range(self.retries + 1):
+                try:
+                    with self.pool.connection() as smtp:
+                        with stego_trace.span("transmit", bytes=size, attempt=attempt):
+                            send_chunks(
+                                smtp, sender, [delivery.recipient],
+                                message_chunks(sender, delivery.recipient, paths, delivery.key)
+                            )
+                    return Sent(delivery.recipient, trace)
+                except Exception as e:
+                    if attempt == self.retries or not is_transient(e):
+                        raise
+                    with stego_trace.span("backoff", attempt=attempt):
+                        time.sleep(self.backoff * 2 ** attempt)
+
+    def close(self, wait=True):
+        """Stop accepting messages and close the pooled sessions"""
+        self.executor.shutdown(wait=wait)
+        self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def attachment_paths(attachments):
+    """Normalize one path or a sequence of paths into a list"""
+    if isinstance(attachments, (str, bytes, os.PathLike)):
+        return [attachments]
+    return list(attachments)
+
+
+def message_body(key=None):
+    """Return the plain-text body sent with stego-images"""
+    if key:
+        return (
+            "You have received an encrypted image via StegoExpress.\n\n"
+            f"Encryption Key: {key}\n\n"
+            "Please save this key to decrypt the hidden message."
+        )
+    return (
+        "You have received an encrypted image via StegoExpress.\n\n"
+        "The sender will share the decryption key separately."
+    )
+
+
+def message_chunks(sender, recipient, attachments, key=None):
+    """Yield a multipart message carrying the attachments as CRLF-terminated byte chunks
+
+    Attachments are read and base64-encoded ATTACHMENT_READ_SIZE bytes at a
+    time, so only one chunk of each file is ever held in memory.
+    """
+    boundary = f"==StegoExpress_{uuid.uuid4().hex}=="
+    headers = Message(policy=policy.SMTP)
+    headers["From"] = sender
+    headers["To"] = recipient
+    headers["Subject"] = SUBJECT
+    headers["Date"] = formatdate(localtime=True)
+    headers["Message-ID"] = make_msgid()
+    headers["MIME-Version"] = "1.0"
+    headers["Content-Type"] = f'multipart/mixed; boundary="{boundary}"'
+    yield _header_block(headers)
+
+    yield f"--{boundary}\r\n".encode()
+    yield MIMEText(message_body(key), "plain", "utf-8").as_bytes(policy=policy.SMTP)
+
+    for path in attachment_paths(attachments):
+        part = MIMEBase("application", "octet-stream")
+        part["Content-Transfer-Encoding"] = "base64"
+        part.add_header("Content-Disposition", "attachment", filename=os.path.basename(path))
+        yield f"--{boundary}\r\n".encode()
+        yield _header_block(part)
+        with open(path, "rb") as attachment:
+            for data in iter(partial(attachment.read, ATTACHMENT_READ_SIZE), b""):
+                yield base64.encodebytes(data).replace(b"\n", b"\r\n")
+    yield f"--{boundary}--\r\n".encode()
+
+
+def send_chunks(smtp, sender, recipients, chunks):
+    """Send a message given as CRLF-terminated byte chunks, writing each to the socket as it comes
+
+    Mirrors SMTP.sendmail() error handling; the session is closed if the
+    transfer fails part-way through DATA, since it cannot be resumed.
+    """
+    smtp.ehlo_or_helo_if_needed()
+    code, response = smtp.mail(sender)
+    if code != 250:
+        _reset(smtp)
+        raise smtplib.SMTPSenderRefused(code, response, sender)
+    refused = {}
+    for recipient in recipients:
+        code, response = smtp.rcpt(recipient)
+        if code not in (250, 251):
+            refused[recipient] = (code, response)
+    if len(refused) == len(recipients):
+        _reset(smtp)
+        raise smtplib.SMTPRecipientsRefused(refused)
+
+    smtp.putcmd("data")
+    code, response = smtp.getreply()
+    if code != 354:
+        _reset(smtp)
+        raise smtplib.SMTPDataError(code, response)
+    try:
+        for chunk in chunks:
+            smtp.send(_LEADING_DOT.sub(b"..", chunk))
+        smtp.send(b".\r\n")
+    except BaseException:
+        smtp.close()
+        raise
+    code, response = smtp.getreply()
+    if code != 250:
+        _reset(smtp)
+        raise smtplib.SMTPDataError(code, response)
+    return refused
+
+
+def read_deliveries(manifest_path):
+    """Read a CSV with image and recipient columns (key optional) as Delivery tuples"""
+    with open(manifest_path, "r", newline="", encoding="utf-8") as manifest_file:
+        reader = csv.DictReader(manifest_file)
+        missing = [field for field in DELIVERY_FIELDS if field not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"Delivery list is missing column(s): {', '.join(missing)}")
+        for row in reader:
+            # Several images for one message are separated by ';'
+            images = [path.strip() for path in row["image"].split(";") if path.strip()]
+            yield Delivery(images, row["recipient"], row.get("key") or None)
+
+
+def _alive(smtp):
+    """Return True if an idle session still answers NOOP"""
+    try:
+        return smtp.noop()[0] == 250
+    except (smtplib.SMTPException, OSError):
+        return False
+
+
+def _header_block(message):
+    """Return a message's header block, ending with the blank separator line"""
+    data = message.as_bytes(policy=policy.SMTP)
+    return data[:data.index(b"\r\n\r\n") + 4]
+
+
+def _reset(smtp):
+    """Abandon the current mail transaction so the session can be reused"""
+    try:
+        smtp.rset()
+    except smtplib.SMTPServerDisconnected:
+        pass
+
+
+def _quit(smtp):
+    """Close a session, ignoring errors from one that is already gone"""
+    try:
+        smtp.quit()
+    except (smtplib.SMTPException, OSError):
+        smtp.close()
@@ -0,0 +1,290 @@
+"""Memory-mapped embed/extract for covers stored as uncompressed pixels: BMP, TIFF and .npy
+
+Such covers are never decoded. Their pixel rows are mapped straight from the
+file, so only the pages holding payload bits are read, and embedding patches
+those pages in a copy of the cover instead of re-encoding the whole image.
+The copy is made inside the kernel and shares the cover's blocks on
+filesystems with copy-on-write support, so the cost of a small payload does
+not grow with the size of the cover.
+"""
+import mmap
+import os
+import shutil
+from collections import namedtuple
+
+import numpy as np
+from PIL import Image
+
+import stego_container
+import stego_engine
+
+
+# Where the pixels of a mapped cover are: mode is the image mode Pillow
+# reads it as, channel_order the byte within a pixel of each R, G, B(, A)
+PixelMap = namedtuple("PixelMap", [
+    "format", "mode", "width", "height", "offset", "row_stride", "pixel_bytes", "channel_order",
+    "bottom_up",
+])
+
+# Pillow raw modes of uncompressed 8-bit pixels: (image mode, bytes per pixel, channel order)
+RAW_MODES = {
+    "RGB": ("RGB", 3, (0, 1, 2)),
+    "BGR": ("RGB", 3, (2, 1, 0)),
+    "RGBX": ("RGB", 4, (0, 1, 2)),
+    "BGRX": ("RGB", 4, (2, 1, 0)),
+    "RGBA": ("RGBA", 4, (0, 1, 2, 3)),
+    "BGRA": ("RGBA", 4, (2, 1, 0, 3)),
+}
+MAPPED_FORMATS = ("BMP", "TIFF")
+NPY_EXTENSION = ".npy"
+
+DEFAULT_STRIP_ROWS = 256
+
+# Scattered slots located per step when reading them from the mapping
+GATHER_CHUNK_SLOTS = 1 << 20
+
+
+def probe(image_path):
+    """Return the PixelMap of an uncompressed RGB/RGBA cover, or None if it cannot be mapped"""
+    try:
+        if image_path.lower().endswith(NPY_EXTENSION):
+            return _probe_npy(image_path)
+        with Image.open(image_path) as image:
+            if image.format not in MAPPED_FORMATS:
+                return None
+            if stego_engine.normalized_mode(image) != image.mode:
+                return None
+            pixel_map = _probe_tiles(image)
+    except (OSError, ValueError, SyntaxError):
+        return None
+    if pixel_map is None:
+        return None
+    if pixel_map.offset + pixel_map.row_stride * pixel_map.height > os.path.getsize(image_path):
+        return None
+    return pixel_map
+
+
+def is_mappable(image_path):
+    """Return True if image_path holds uncompressed pixels this module can map"""
+    return probe(image_path) is not None
+
+
+class MappedPixels:
+    """Pixel rows of a mapped cover, read and written in RGB(A) order without decoding the file"""
+
+    def __init__(self, image_path, pixel_map, writable=False):
+        self.width = pixel_map.width
+        self.height = pixel_map.height
+        self.order = list(pixel_map.channel_order)
+        self.writable = writable
+        with open(image_path, "r+b" if writable else "rb") as image_file:
+            # The mapping keeps its own handle on the file
+            self.mapping = mmap.mmap(
+                image_file.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+            )
+        view = np.ndarray(
+            (pixel_map.height, pixel_map.width, pixel_map.pixel_bytes), dtype=np.uint8,
+            buffer=self.mapping, offset=pixel_map.offset,
+            strides=(pixel_map.row_stride, pixel_map.pixel_bytes, 1)
+        )
+        self.pixels = view[::-1] if pixel_map.bottom_up else view
+
+    def rows(self, start, stop):
+        """Return image rows start..stop as a contiguous (pixels, channels) uint8 copy"""
+        # Indexing the channels alone can leave the copy non-contiguous, and
+        # write_block needs to modify it in place
+        block = np.ascontiguousarray(self.pixels[start:stop][:, :, self.order])
+        return block.reshape(-1, len(self.order))
+
+    def write_rows(self, start, block):
+        """Write a (pixels, channels) block back over image rows from start onwards"""
+        rows = len(block) // self.width
+        self.pixels[start:start + rows, :, self.order] = block.reshape(rows, self.width, -1)
+
+    def read(self, byte_count, slot_offset, layout):
+        """Return byte_count bytes of the slot stream at slot_offset (or at the slots it lists)"""
+        count = stego_engine.slot_count(byte_count, layout.depth)
+        if isinstance(slot_offset, np.ndarray):
+            values = self.gather(slot_offset[:count], layout)
+            bits = stego_engine.slot_bits(values, layout.depth)[:byte_count * 8]
+            return np.packbits(bits).tobytes()
+        row_slots = self.width * layout.channels
+        first_row = slot_offset // row_slots
+        last_row = min(-(-(slot_offset + count) // row_slots), self.height)
+        block = self.rows(first_row, last_row)
+        local_offset = slot_offset - first_row * row_slots
+        return stego_engine.read_bytes(block, byte_count, local_offset, layout)
+
+    def gather(self, slots, layout):
+        """Return the slot values at an array of slot indexes, touching only their pages"""
+        values = np.empty(slots.size, dtype=np.uint8)
+        order = np.array(self.order)
+        for start in range(0, slots.size, GATHER_CHUNK_SLOTS):
+            stop = min(start + GATHER_CHUNK_SLOTS, slots.size)
+            pixel, channel = np.divmod(slots[start:stop], layout.channels)
+            row, column = np.divmod(pixel, self.width)
+            values[start:stop] = self.pixels[row, column, order[channel]]
+        return values & np.uint8((1 << layout.depth) - 1)
+
+    def close(self):
+        """Flush written pages and unmap the file"""
+        # The mapping cannot be closed while arrays still point into it
+        self.pixels = None
+        if not self.mapping.closed:
+            if self.writable:
+                self.mapping.flush()
+            self.mapping.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def copy_file(source_path, output_path):
+    """Copy a file inside the kernel, sharing its blocks on copy-on-write filesystems"""
+    copy_range = getattr(os, "copy_file_range", None)
+    if copy_range is not None:
+        try:
+            with open(source_path, "rb") as source, open(output_path, "wb") as output:
+                remaining = os.fstat(source.fileno()).st_size
+                while remaining:
+                    copied = copy_range(source.fileno(), output.fileno(), remaining)
+                    if not copied:
+                        break
+                    remaining -= copied
+            if not remaining:
+                return output_path
+        except OSError:
+            # Not supported between these files; fall back to a plain copy
+            pass
+    shutil.copyfile(source_path, output_path)
+    return output_path
+
+
+def embed_payload_file(source_path, output_path, payload, flags=0, seed=None, progress=None,
+                       strip_rows=DEFAULT_STRIP_ROWS):
+    """Embed payload with its container header into a copy of a mapped cover, patched in place
+
+    Only the rows holding payload bits are read and rewritten; scattered
+    payloads touch rows throughout the image. progress, if given, is called
+    with the fraction of those rows done. A partially written output file is
+    removed on failure.
+    """
+    if os.path.exists(output_path) and os.path.samefile(source_path, output_path):
+        raise ValueError("Mapped output must not overwrite the cover image")
+    pixel_map = probe(source_path)
+    if pixel_map is None:
+        raise ValueError("Cover is not an uncompressed RGB/RGBA BMP, TIFF or .npy file")
+    pixel_count = pixel_map.width * pixel_map.height
+    stego_container.check_fits(len(payload), flags, pixel_count, len(pixel_map.mode))
+    streams = stego_container.container_streams(payload, flags, seed, pixel_count)
+    strip_rows = max(int(strip_rows), 1)
+
+    copy_file(source_path, output_path)
+    try:
+        with MappedPixels(output_path, pixel_map, writable=True) as pixels:
+            touched_rows = -(-stego_container.pixels_needed(streams) // pixels.width)
+            for row in range(0, touched_rows, strip_rows):
+                block = pixels.rows(row, min(row + strip_rows, touched_rows))
+                for values, offset, layout in streams:
+                    stego_engine.write_block(
+                        block, values, offset, layout, first_pixel=row * pixels.width
+                    )
+                pixels.write_rows(row, block)
+                if progress:
+                    progress(min(row + strip_rows, touched_rows) / touched_rows)
+    except BaseException:
+        os.remove(output_path)
+        raise
+    return output_path
+
+
+def extract_payload_file(image_path, seed=None):
+    """Extract (header, payload) from a mapped image, reading only the pages that hold it
+
+    seed is needed only for scattered payloads.
+    """
+    pixel_map = _require(image_path)
+    with MappedPixels(image_path, pixel_map) as pixels:
+        return stego_container.read_container(
+            pixels.read, pixel_map.width * pixel_map.height, len(pixel_map.mode), seed
+        )
+
+
+def extract_header_file(image_path):
+    """Read only the container header from a mapped image"""
+    pixel_map = _require(image_path)
+    with MappedPixels(image_path, pixel_map) as pixels:
+        return stego_container.read_header(
+            pixels.read, pixel_map.width * pixel_map.height, len(pixel_map.mode)
+        )
+
+
+def _require(image_path):
+    """Return the PixelMap of image_path, raising ValueError if it cannot be mapped"""
+    pixel_map = probe(image_path)
+    if pixel_map is None:
+        raise ValueError("Image is not an uncompressed RGB/RGBA BMP, TIFF or .npy file")
+    return pixel_map
+
+
+def _probe_tiles(image):
+    """Return the PixelMap described by an opened BMP/TIFF's raw tiles, or None"""
+    width, height = image.size
+    rows = []
+    for name, extents, offset, args in image.tile:
+        if isinstance(args, str):
+            args = (args,)
+        rawmode, stride, orientation = (tuple(args) + (0, 1))[:3]
+        if name != "raw" or rawmode not in RAW_MODES or extents[0] != 0 or extents[2] != width:
+            return None
+        rows.append((extents[1], extents[3], offset, rawmode, stride, orientation))
+    if not rows:
+        return None
+    top, _, offset, rawmode, stride, orientation = rows[0]
+    mode, pixel_bytes, channel_order = RAW_MODES[rawmode]
+    stride = stride or width * pixel_bytes
+    if top != 0 or mode != image.mode or stride < width * pixel_bytes:
+        return None
+    # Strips must follow each other in the file, top to bottom
+    expected_top = 0
+    for strip in rows:
+        strip_top, strip_bottom, strip_offset, strip_rawmode, strip_stride, strip_orientation = (
+            strip
+        )
+        if strip_top != expected_top or strip_rawmode != rawmode:
+            return None
+        if (strip_stride or stride) != stride or strip_orientation != orientation:
+            return None
+        if strip_offset != offset + strip_top * stride:
+            return None
+        expected_top = strip_bottom
+    if expected_top != height or (orientation < 0 and len(rows) > 1):
+        return None
+    return PixelMap(
+        image.format, mode, width, height, offset, stride, pixel_bytes, channel_order,
+        orientation < 0
+    )
+
+
+def _probe_npy(image_path):
+    """Return the PixelMap of a C-ordered uint8 (height, width, 3 or 4) .npy array, or None"""
+    with open(image_path, "rb") as npy_file:
+        version = np.lib.format.read_magic(npy_file)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(npy_file)
+        elif version == (2, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(npy_file)
+        else:
+            return None
+        offset = npy_file.tell()
+    if dtype != np.uint8 or fortran_order or len(shape) != 3 or shape[2] not in (3, 4):
+        return None
+    height, width, channels = shape
+    mode = "RGBA" if channels == 4 else "RGB"
+    return PixelMap(
+        "NPY", mode, width, height, offset, width * channels, channels, tuple(range(channels)),
+        False
+    )
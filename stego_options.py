@@ -0,0 +1,20 @@
+"""Option names and defaults, importable without loading the image, crypto or mail backends"""
+
+
+# Deepest LSB layout the engine supports
+MAX_DEPTH = 4
+
+# Embedding modes as "<channels>-<LSBs per channel>", e.g. "rgb-1" or "rgba-2"
+DEFAULT_MODE = "rgb-1"
+MODES = [
+    f"{channels}-{depth}"
+    for channels in ("rgb", "rgba")
+    for depth in range(1, MAX_DEPTH + 1)
+]
+
+# Spellings accepted as "on" for yes/no fields in manifests and service forms
+TRUE_VALUES = ("1", "true", "yes", "on")
+
+DEFAULT_HOST = "smtp.gmail.com"
+SECURITY_MODES = ("starttls", "ssl", "none")
+DEFAULT_PORTS = {"starttls": 587, "ssl": 465, "none": 25}
@@ -0,0 +1,118 @@
+"""Output profiles for stego-images and a background save worker
+
+Every profile is lossless, so the embedded bits survive saving. "fast"
+trades file size for encode speed, "small" does the opposite, and "webp"
+and "tiff" are lossless alternatives to PNG. "raw" encodes nothing: it
+keeps an uncompressed BMP, TIFF or .npy cover's own format and patches the
+payload into a copy of it (see stego_mmap).
+"""
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+
+OutputProfile = namedtuple("OutputProfile", ["format", "extension", "options"])
+
+DEFAULT_PROFILE = "default"
+PROFILES = {
+    "default": OutputProfile("PNG", ".png", {}),
+    "fast": OutputProfile("PNG", ".png", {"compress_level": 1}),
+    "small": OutputProfile("PNG", ".png", {"compress_level": 9, "optimize": True}),
+    # exact keeps the colour of fully transparent pixels, which may carry payload bits
+    "webp": OutputProfile("WEBP", ".webp", {"lossless": True, "exact": True, "method": 4}),
+    "tiff": OutputProfile("TIFF", ".tiff", {"compression": "tiff_adobe_deflate"}),
+    # Format and extension are the cover's own
+    "raw": OutputProfile(None, None, {}),
+}
+
+# File extensions an output of each format may be saved under
+FORMAT_EXTENSIONS = {
+    "PNG": (".png",),
+    "WEBP": (".webp",),
+    "TIFF": (".tif", ".tiff"),
+    "BMP": (".bmp",),
+    "NPY": (".npy",),
+}
+
+# zlib level used for each PNG profile when the cover is streamed
+_PNG_DEFAULT_LEVEL = 6
+
+# Pillow releases the GIL while encoding, so several saves can run at once
+DEFAULT_SAVE_WORKERS = 2
+
+
+def get_profile(name):
+    """Look up an output profile by name"""
+    if name not in PROFILES:
+        raise ValueError(f"Unknown output profile '{name}', expected one of: {', '.join(PROFILES)}")
+    return PROFILES[name]
+
+
+def png_compress_level(name):
+    """Return the zlib level for streaming a PNG profile; other formats cannot be streamed"""
+    profile = get_profile(name)
+    if profile.format != "PNG":
+        raise ValueError(f"Streaming writes PNG only, not the '{name}' profile")
+    return profile.options.get("compress_level", _PNG_DEFAULT_LEVEL)
+
+
+def check_output_path(output_path, profile=DEFAULT_PROFILE, cover_format=None):
+    """Raise ValueError unless output_path's extension names the format profile writes
+
+    The raw profile writes the cover's own format, passed as cover_format.
+    """
+    output_format = get_profile(profile).format or cover_format
+    extension = os.path.splitext(output_path)[1].lower()
+    if output_format is not None and extension not in FORMAT_EXTENSIONS.get(output_format, ()):
+        raise ValueError(
+            f"The '{profile}' profile writes {output_format}, not a '{extension}' file:"
+            f" {os.path.basename(output_path)}"
+        )
+
+
+def save_image(image, output_path, profile=DEFAULT_PROFILE):
+    """Save a stego-image with an output profile, returning output_path"""
+    chosen = get_profile(profile)
+    if chosen.format is None:
+        raise ValueError(
+            f"The '{profile}' profile patches a copy of the cover and cannot encode images"
+        )
+    check_output_path(output_path, profile)
+    image.save(output_path, chosen.format, **chosen.options)
+    return output_path
+
+
+class SaveWorker:
+    """Encodes images on background threads so saving overlaps embedding the next image
+
+    submit() blocks while max_pending images (default: two per worker) are
+    already queued or being saved, which bounds how many decoded images are
+    held in memory.
+    """
+
+    def __init__(self, workers=DEFAULT_SAVE_WORKERS, max_pending=None):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stego-save")
+        self.slots = threading.BoundedSemaphore(max(max_pending or workers * 2, 1))
+
+    def submit(self, image, output_path, profile=DEFAULT_PROFILE):
+        """Queue an image for saving, returning a future that resolves to output_path"""
+        get_profile(profile)
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(save_image, image, output_path, profile)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _done: self.slots.release())
+        return future
+
+    def close(self, wait=True):
+        """Finish (or with wait=False, abandon) queued saves and stop the worker"""
+        self.executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
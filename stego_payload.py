@@ -0,0 +1,133 @@
+"""Payload pipeline stages: file records, compression codecs and compact Fernet tokens"""
+import base64
+import lzma
+import ntpath
+import os
+import struct
+import zlib
+from collections import namedtuple
+
+
+Codec = namedtuple("Codec", ["codec_id", "name", "compress", "decompress"])
+
+# Codec ids are stored in the low bits of the container header flags
+CODEC_MASK = 0x07
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_LZMA = 2
+
+CODECS = {}
+
+# Header flag bit set when the payload is a file record rather than text
+FLAG_FILE = 0x40
+
+# File record prefix: name length, file size; the UTF-8 name and file bytes follow
+FILE_RECORD = struct.Struct(">HQ")
+DEFAULT_FILE_NAME = "extracted.bin"
+
+# Inputs above PROBE_THRESHOLD bytes are sampled before 'auto' runs every codec
+# over them, so already-compressed files (archives, media) are stored as-is
+PROBE_THRESHOLD = 1 << 20
+PROBE_SIZE = 1 << 16
+PROBE_MIN_SAVING = 0.03
+
+
+def register_codec(codec_id, name, compressor, decompressor):
+    """Register a compression codec under a header codec id (0-7)"""
+    if not 0 <= codec_id <= CODEC_MASK:
+        raise ValueError(f"Codec id must be between 0 and {CODEC_MASK}")
+    CODECS[codec_id] = Codec(codec_id, name, compressor, decompressor)
+
+
+register_codec(CODEC_NONE, "none", bytes, bytes)
+register_codec(CODEC_ZLIB, "zlib", lambda data: zlib.compress(data, 9), zlib.decompress)
+register_codec(CODEC_LZMA, "lzma", lzma.compress, lzma.decompress)
+
+
+def codec_names():
+    """Return the registered codec names plus 'auto'"""
+    return ["auto"] + [codec.name for codec in CODECS.values()]
+
+
+def compress(data, codec="auto"):
+    """Compress data and return (codec_id, compressed)
+
+    With codec='auto' every registered codec is tried and the smallest
+    output wins; data is stored as-is when no codec makes it smaller, or
+    when a sample of large data shows it is already compressed.
+    """
+    data = bytes(data)
+    if codec != "auto":
+        chosen = _codec_by_name(codec)
+        return chosen.codec_id, chosen.compress(data)
+    if len(data) > PROBE_THRESHOLD and not _compressible(data):
+        return CODEC_NONE, data
+    best_id, best = CODEC_NONE, data
+    for candidate in CODECS.values():
+        if candidate.codec_id == CODEC_NONE:
+            continue
+        compressed = candidate.compress(data)
+        if len(compressed) < len(best):
+            best_id, best = candidate.codec_id, compressed
+    return best_id, best
+
+
+def decompress(codec_id, data):
+    """Undo compress() for the codec id recorded in the container header"""
+    if codec_id not in CODECS:
+        raise ValueError(f"Unknown payload codec id {codec_id}")
+    return CODECS[codec_id].decompress(data)
+
+
+def pack_file(name, data):
+    """Build a file record carrying a file's base name, size and contents"""
+    name = os.path.basename(name).encode("utf-8")
+    if len(name) > 0xFFFF:
+        raise ValueError("File name is too long")
+    return b"".join([FILE_RECORD.pack(len(name), len(data)), name, data])
+
+
+def unpack_file(record):
+    """Split a file record into (safe base name, contents as a memoryview)"""
+    record = memoryview(record)
+    if len(record) < FILE_RECORD.size:
+        raise ValueError("File payload is truncated")
+    name_length, size = FILE_RECORD.unpack(record[:FILE_RECORD.size])
+    start = FILE_RECORD.size + name_length
+    if len(record) != start + size:
+        raise ValueError("File payload size does not match its metadata")
+    name = bytes(record[FILE_RECORD.size:start]).decode("utf-8", errors="replace")
+    return safe_file_name(name), record[start:]
+
+
+def safe_file_name(name):
+    """Reduce a stored file name to a plain base name that cannot escape a directory"""
+    # ntpath splits on both / and \ on every platform; a drive left after the
+    # last separator (e.g. "C:x") would make Windows ignore the directory
+    name = ntpath.splitdrive(ntpath.basename(name))[1].strip()
+    return name if name not in ("", ".", "..") else DEFAULT_FILE_NAME
+
+
+def raw_token(token):
+    """Strip the base64 text encoding from a Fernet token"""
+    return base64.urlsafe_b64decode(token)
+
+
+def text_token(raw):
+    """Restore the base64 text form of a raw Fernet token for decryption"""
+    return base64.urlsafe_b64encode(raw)
+
+
+def _compressible(data):
+    """Return True if a fast zlib pass over a sample of data saves at least PROBE_MIN_SAVING"""
+    middle = (len(data) - PROBE_SIZE) // 2
+    sample = data[middle:middle + PROBE_SIZE]
+    return len(zlib.compress(sample, 1)) < len(sample) * (1 - PROBE_MIN_SAVING)
+
+
+def _codec_by_name(name):
+    """Look up a registered codec by name"""
+    for codec in CODECS.values():
+        if codec.name == name:
+            return codec
+    raise ValueError(f"Unknown codec '{name}', expected one of: {', '.join(codec_names())}")
@@ -0,0 +1,228 @@
+"""Staged pipelines: thread pools connected by bounded queues, with per-stage utilisation
+
+A multi-image job split into stages (e.g. read → embed → encode) runs each
+stage on its own pool of threads, handing items on through a bounded queue.
+Disk reads, NumPy embedding and zlib encoding release the GIL, so while one
+image is being encoded the next is embedded and a third is read, and the
+wall time approaches that of the slowest stage rather than the sum of all
+of them. The queues bound how many decoded images are held at once.
+
+    pipeline = Pipeline([
+        Stage("read", decode, 2), Stage("embed", embed, 2), Stage("encode", save, 2)
+    ])
+    for item, value, error in pipeline.run(paths):
+        ...
+    print(pipeline.summary())   # "read 2x 41% busy, embed 2x 38% busy, encode 2x 97% busy"
+"""
+import queue
+import threading
+import time
+from collections import namedtuple
+
+
+# function(value) is called with the previous stage's return value (the
+# input item for the first stage) on one of workers threads
+Stage = namedtuple("Stage", ["name", "function", "workers"])
+
+# What left the pipeline: value is the last stage's return value, or None
+# with error set to the exception of the stage that failed
+PipelineResult = namedtuple("PipelineResult", ["item", "value", "error"])
+
+# Items queued in front of each stage, per worker of that stage
+DEFAULT_QUEUE_PER_WORKER = 2
+
+# How often blocked threads check whether the pipeline was abandoned
+_POLL_SECONDS = 0.1
+
+# Marks the end of the input on a queue
+_DONE = object()
+
+
+class StageStats:
+    """Time the workers of one stage spent busy, waiting for input and waiting to hand on"""
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.starved_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, busy, starved, blocked, failed):
+        """Record one item handled by a worker"""
+        with self.lock:
+            self.items += 1
+            self.failed += failed
+            self.busy_seconds += busy
+            self.starved_seconds += starved
+            self.blocked_seconds += blocked
+
+    def utilisation(self, wall_seconds):
+        """Return the fraction of the stage's worker time spent busy"""
+        return self.busy_seconds / (self.workers * wall_seconds) if wall_seconds else 0.0
+
+    def record(self, wall_seconds):
+        """Return the stage's metrics as a JSON-serializable dict"""
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "items": self.items,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy_seconds, 6),
+            "starved_seconds": round(self.starved_seconds, 6),
+            "blocked_seconds": round(self.blocked_seconds, 6),
+            "utilisation": round(self.utilisation(wall_seconds), 4),
+        }
+
+
+class Pipeline:
+    """Runs items through stages on per-stage thread pools linked by bounded queues
+
+    An item whose stage raises skips the remaining stages and leaves the
+    pipeline with the error set, without stopping the others. queue_size
+    overrides the number of items queued in front of each stage (default:
+    two per worker of that stage).
+    """
+
+    def __init__(self, stages, queue_size=None):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = [
+            Stage(name, function, max(int(workers or 1), 1))
+            for name, function, workers in stages
+        ]
+        self.queue_size = queue_size
+        self.stats = [StageStats(stage.name, stage.workers) for stage in self.stages]
+        self.seconds = None
+
+    def run(self, items):
+        """Yield a PipelineResult for every item as it leaves the last stage, in completion order
+
+        Items are drawn from the iterable as the first stage has room for
+        them. Closing the generator early (or an exception in the caller's
+        loop) abandons items still in flight and stops every thread.
+        """
+        queues = [
+            queue.Queue(max(self.queue_size or stage.workers * DEFAULT_QUEUE_PER_WORKER, 1))
+            for stage in self.stages
+        ]
+        # The results queue is unbounded so the last stage never waits on the caller
+        queues.append(queue.Queue())
+        stop = threading.Event()
+        failure = []
+        threads = [threading.Thread(target=self._feed, args=(items, queues[0], stop, failure),
+                                    name="stego-pipeline-feed", daemon=True)]
+        for index, stage in enumerate(self.stages):
+            remaining = [stage.workers]
+            for number in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._work,
+                    args=(index, queues[index], queues[index + 1], remaining, stop),
+                    name=f"stego-pipeline-{stage.name}-{number}", daemon=True
+                ))
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                job = _get(queues[-1], stop)
+                if job is _DONE:
+                    break
+                yield PipelineResult(*job)
+            if failure:
+                # Reading the input failed; the items before it have been yielded
+                raise failure[0]
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            self.seconds = time.perf_counter() - started
+
+    def report(self):
+        """Return wall time and per-stage metrics of the last run as a JSON-serializable dict"""
+        seconds = self.seconds or 0.0
+        return {
+            "seconds": round(seconds, 6),
+            "stages": [stats.record(seconds) for stats in self.stats],
+        }
+
+    def summary(self):
+        """Return each stage's utilisation as text, e.g. 'read 2x 41% busy, embed 1x 88% busy'"""
+        seconds = self.seconds or 0.0
+        return ", ".join(
+            f"{stats.name} {stats.workers}x {stats.utilisation(seconds) * 100:.0f}% busy"
+            for stats in self.stats
+        )
+
+    def _feed(self, items, first, stop, failure):
+        """Put every input item on the first stage's queue, then one end marker per worker"""
+        try:
+            for item in items:
+                if not _put(first, (item, item, None), stop):
+                    return
+        except Exception as e:
+            failure.append(e)
+        for _ in range(self.stages[0].workers):
+            if not _put(first, _DONE, stop):
+                return
+
+    def _work(self, index, inbox, outbox, remaining, stop):
+        """Run one stage's function over items from inbox until it is exhausted"""
+        stage = self.stages[index]
+        stats = self.stats[index]
+        while True:
+            waited = time.perf_counter()
+            job = _get(inbox, stop)
+            if job is None:
+                return
+            if job is _DONE:
+                break
+            item, value, error = job
+            if error is not None:
+                # Failed in an earlier stage; handed on untouched and not counted here
+                if not _put(outbox, job, stop):
+                    return
+                continue
+            started = time.perf_counter()
+            try:
+                value = stage.function(value)
+            except Exception as e:
+                value, error = None, e
+            finished = time.perf_counter()
+            if not _put(outbox, (item, value, error), stop):
+                return
+            stats.add(finished - started, started - waited, time.perf_counter() - finished,
+                      error is not None)
+        with stats.lock:
+            remaining[0] -= 1
+            last = not remaining[0]
+        if last:
+            # The next stage (or the caller, after the last one) sees the end once this one drains
+            following = self.stages[index + 1].workers if index + 1 < len(self.stages) else 1
+            for _ in range(following):
+                if not _put(outbox, _DONE, stop):
+                    return
+
+
+def _get(inbox, stop):
+    """Take the next job from a queue, or return None once the pipeline is stopped"""
+    while not stop.is_set():
+        try:
+            return inbox.get(timeout=_POLL_SECONDS)
+        except queue.Empty:
+            continue
+    return None
+
+
+def _put(outbox, job, stop):
+    """Hand a job to a queue, returning False if the pipeline was stopped while waiting for room"""
+    while not stop.is_set():
+        try:
+            outbox.put(job, timeout=_POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
@@ -0,0 +1,73 @@
+"""Preview thumbnails decoded at reduced size, with an LRU cache keyed by file identity"""
+import os
+import threading
+from collections import OrderedDict
+
+import stego_lazy
+
+# Loaded on the first decode so creating a cache costs nothing at startup
+Image = stego_lazy.LazyModule("PIL.Image")
+stego_engine = stego_lazy.LazyModule("stego_engine")
+
+
+PREVIEW_SIZE = (500, 400)
+DEFAULT_CACHE_ITEMS = 32
+
+
+def make_thumbnail(image_path, size=PREVIEW_SIZE):
+    """Decode image_path no larger than needed and return a thumbnail fitting size
+
+    JPEGs are decoded at 1/2, 1/4 or 1/8 scale through draft(); other
+    formats are shrunk by an integer factor with reduce() before the final
+    resample, which is much cheaper than resampling the full image.
+    """
+    with Image.open(image_path) as image:
+        image.draft("RGB", size)
+        image = stego_engine.normalize_image(image)
+        factor = min(image.width // size[0], image.height // size[1])
+        if factor > 1:
+            image = image.reduce(factor)
+        image.thumbnail(size)
+        image.load()
+    return image
+
+
+class ThumbnailCache:
+    """Thread-safe LRU cache of thumbnails keyed by path, modification time and file size"""
+
+    def __init__(self, max_items=DEFAULT_CACHE_ITEMS, size=PREVIEW_SIZE):
+        self.max_items = max_items
+        self.size = size
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def key(self, image_path):
+        """Return the cache key for a file; it changes whenever the file is rewritten"""
+        stat = os.stat(image_path)
+        return os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size
+
+    def peek(self, image_path):
+        """Return the cached thumbnail for image_path, or None without decoding anything"""
+        try:
+            key = self.key(image_path)
+        except OSError:
+            return None
+        with self.lock:
+            thumbnail = self.items.get(key)
+            if thumbnail is not None:
+                self.items.move_to_end(key)
+            return thumbnail
+
+    def get(self, image_path):
+        """Return the thumbnail for image_path, decoding and caching it on a miss"""
+        key = self.key(image_path)
+        thumbnail = self.peek(image_path)
+        if thumbnail is not None:
+            return thumbnail
+        thumbnail = make_thumbnail(image_path, self.size)
+        with self.lock:
+            self.items[key] = thumbnail
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_items:
+                self.items.popitem(last=False)
+        return thumbnail
@@ -0,0 +1,208 @@
+"""Find StegoExpress images in large collections by reading payload headers only
+
+Each image is checked by decoding just the pixels that hold the container
+header (the first row of a PNG, or the mapped pages of an uncompressed
+BMP, TIFF or .npy file), which tells whether it carries a payload
+and its format version, length, codec and embedding mode without a key.
+Results are kept in an SQLite index keyed by path, modification time and
+size, so rescanning a tree only reads files that were added or changed.
+Headerless images written before format version 1 are not detected.
+"""
+import json
+import os
+import sqlite3
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+import stego_batch
+import stego_container
+import stego_core
+import stego_engine
+import stego_mmap
+import stego_payload
+import stego_stream
+
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser("~"), ".stegoexpress", "scan_index.sqlite")
+
+# Formats whose compression destroys LSBs, so they are never opened
+LOSSY_FORMATS = ("JPEG", "MPO")
+
+# Files handed to each worker process at a time, and results per index commit
+SCAN_CHUNK_SIZE = 64
+COMMIT_EVERY = 1000
+
+# results are dicts as returned by scan_file(); scanned counts files read
+# rather than taken from the index, removed counts index entries dropped
+# for files that no longer exist
+ScanReport = namedtuple("ScanReport", ["results", "scanned", "removed"])
+
+
+def read_header(image_path):
+    """Return the container Header of an image, decoding only the pixels that hold it"""
+    if stego_stream.is_streamable(image_path):
+        return stego_stream.extract_header_file(image_path)
+    if stego_mmap.is_mappable(image_path):
+        return stego_mmap.extract_header_file(image_path)
+    with Image.open(image_path) as image:
+        if image.format in LOSSY_FORMATS:
+            raise stego_container.PayloadNotFoundError(
+                f"{image.format} images cannot carry a payload"
+            )
+        return stego_container.extract_header(stego_engine.normalize_image(image))
+
+
+def scan_file(image_path):
+    """Describe the payload header of one image as a dict; never raises
+
+    payload is False for images without a header; error is set for files
+    that cannot be read or whose header is implausible.
+    """
+    result = {"path": image_path, "payload": False}
+    try:
+        header = read_header(image_path)
+    except stego_container.PayloadNotFoundError:
+        return result
+    except Exception as e:
+        result["error"] = str(e)
+        return result
+    codec = stego_payload.CODECS.get(header.flags & stego_payload.CODEC_MASK)
+    file_payload = header.version > 1 and header.flags & stego_payload.FLAG_FILE
+    result.update(
+        payload=True,
+        version=header.version,
+        length=header.length,
+        codec=codec.name if codec else f"unknown-{header.flags & stego_payload.CODEC_MASK}",
+        mode=stego_core.layout_mode(stego_container.header_layout(header)),
+        kind="file" if file_payload else "message",
+        scattered=stego_container.is_scattered(header),
+    )
+    return result
+
+
+def walk_images(root):
+    """Yield (path, os.stat_result) for every image file under root (or root itself)"""
+    if os.path.isfile(root):
+        yield root, os.stat(root)
+        return
+    for directory, subdirectories, names in os.walk(root):
+        subdirectories.sort()
+        for name in sorted(names):
+            if name.lower().endswith(stego_batch.COVER_EXTENSIONS):
+                path = os.path.join(directory, name)
+                try:
+                    yield path, os.stat(path)
+                except OSError:
+                    continue
+
+
+class ScanIndex:
+    """SQLite cache of scan results keyed by path, modification time and size"""
+
+    def __init__(self, index_path=DEFAULT_INDEX_PATH):
+        directory = os.path.dirname(index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(index_path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS scans"
+            " (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, result TEXT)"
+        )
+
+    def entries(self, root):
+        """Return {path: (mtime_ns, size, result)} for everything indexed under root"""
+        if os.path.isfile(root):
+            rows = self.db.execute(
+                "SELECT path, mtime_ns, size, result FROM scans WHERE path = ?", (root,)
+            )
+        else:
+            prefix = os.path.join(root, "")
+            # Paths starting with prefix sort between it and prefix + U+10FFFF
+            rows = self.db.execute(
+                "SELECT path, mtime_ns, size, result FROM scans WHERE path >= ? AND path < ?",
+                (prefix, prefix + "\U0010ffff")
+            )
+        return {path: (mtime_ns, size, result) for path, mtime_ns, size, result in rows}
+
+    def store(self, result, stat):
+        """Record the result of scanning a file with the given stat"""
+        self.db.execute(
+            "INSERT OR REPLACE INTO scans VALUES (?, ?, ?, ?)",
+            (result["path"], stat.st_mtime_ns, stat.st_size, json.dumps(result))
+        )
+
+    def remove(self, paths):
+        """Forget files that no longer exist"""
+        self.db.executemany("DELETE FROM scans WHERE path = ?", ((path,) for path in paths))
+
+    def commit(self):
+        """Write the results stored so far to disk"""
+        self.db.commit()
+
+    def close(self):
+        """Commit pending results and close the database"""
+        self.db.commit()
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def scan_tree(roots, index_path=DEFAULT_INDEX_PATH, workers=None, on_result=None):
+    """Scan every image under roots in parallel, reusing indexed results for unchanged files
+
+    Returns a ScanReport. on_result(result) is called for each image, cached
+    or freshly scanned. Results with an error are not indexed, so those
+    files are read again on the next scan. Pass index_path=":memory:" to
+    scan without an index.
+    """
+    results = []
+    scanned = removed = 0
+    with ScanIndex(index_path) as index, ProcessPoolExecutor(max_workers=workers) as executor:
+        for root in roots:
+            root = os.path.abspath(root)
+            known = index.entries(root)
+            stale = []
+            for path, stat in walk_images(root):
+                result = _cached_result(known.pop(path, None), stat)
+                if result is not None:
+                    _report(results, result, on_result)
+                else:
+                    stale.append((path, stat))
+            fresh = executor.map(scan_file, [path for path, _ in stale], chunksize=SCAN_CHUNK_SIZE)
+            for count, ((path, stat), result) in enumerate(zip(stale, fresh), start=1):
+                if "error" in result:
+                    index.remove([path])
+                else:
+                    index.store(result, stat)
+                if count % COMMIT_EVERY == 0:
+                    index.commit()
+                _report(results, result, on_result)
+            index.remove(known)
+            scanned += len(stale)
+            removed += len(known)
+    return ScanReport(results, scanned, removed)
+
+
+def _cached_result(cached, stat):
+    """Return an indexed (mtime_ns, size, result) entry's result if still valid, else None
+
+    Errors are never reused, even from indexes written by older versions:
+    they can come from a file still being copied or a passing read failure.
+    """
+    if not cached or cached[:2] != (stat.st_mtime_ns, stat.st_size):
+        return None
+    result = json.loads(cached[2])
+    return None if "error" in result else result
+
+
+def _report(results, result, on_result):
+    """Collect one result and pass it to the caller's callback"""
+    results.append(result)
+    if on_result:
+        on_result(result)
@@ -0,0 +1,310 @@
+"""Local HTTP service exposing hide, extract and capacity over the stego_core API
+
+Endpoints (all POST, plus GET /health):
+
+    /hide      multipart/form-data with a cover file and a message text field
+               or a file to hide; optional key, mode, profile, codec and
+               scatter (1/true) fields.
+               Responds with the stego-image and its key in X-Stego-Key.
+    /extract   the stego-image as the request body, key in X-Stego-Key.
+               Responds with the message as text/plain, or the hidden file.
+    /capacity  an image as the request body; responds with bits per mode as JSON.
+
+Connections are handled on threads while embedding and extraction run in a
+process pool. Requests larger than max_request_bytes are refused with 413,
+and once max_pending requests are in progress new ones get 503 with
+Retry-After instead of queueing without bound. Uploads are spooled to a
+temporary directory and results are streamed back from disk.
+
+    curl -F cover=@cover.png -F message="Meet at noon" -D - -o stego.png http://127.0.0.1:8765/hide
+    curl --data-binary @stego.png -H "X-Stego-Key: <key>" http://127.0.0.1:8765/extract
+"""
+import json
+import mimetypes
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, urlsplit
+
+from PIL import UnidentifiedImageError
+
+import stego_core
+import stego_options
+import stego_output
+import stego_payload
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_REQUEST_BYTES = 64 << 20
+
+# Bytes copied per read/write when spooling uploads and streaming responses
+STREAM_CHUNK_SIZE = 1 << 16
+
+KEY_HEADER = "X-Stego-Key"
+HIDE_OPTIONS = ("key", "mode", "profile", "codec", "scatter")
+
+
+class RequestError(Exception):
+    """A request the service refuses, with the HTTP status to answer with"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def hide_job(cover_path, message, file_path, output_dir, options):
+    """Hide a message or file in a spooled cover; runs in a worker process"""
+    profile = options.get("profile") or stego_output.DEFAULT_PROFILE
+    output_path = stego_core.default_output_path(cover_path, output_dir, profile)
+    settings = {
+        "key": options.get("key") or None,
+        "mode": options.get("mode") or stego_core.DEFAULT_MODE,
+        "codec": options.get("codec") or "auto",
+        "profile": profile,
+        "scatter": (options.get("scatter") or "").strip().lower() in stego_options.TRUE_VALUES,
+    }
+    if file_path:
+        hidden = stego_core.hide_file(cover_path, file_path, output_path, **settings)
+    else:
+        hidden = stego_core.hide_message(cover_path, message, output_path, **settings)
+    return hidden.key, hidden.output_path
+
+
+def extract_job(image_path, key, output_dir):
+    """Extract a spooled stego-image into output_dir; runs in a worker process
+
+    Returns (file_name, path of the extracted bytes); file_name is None for
+    text messages.
+    """
+    file_name, data = stego_core.extract_data(image_path, key)
+    return file_name, stego_core.save_file(os.path.join(output_dir, "extracted"), data)
+
+
+def parse_form(content_type, body):
+    """Split a multipart/form-data body into {name: (file name or None, bytes)}"""
+    if not content_type or not content_type.startswith("multipart/form-data"):
+        raise RequestError(415, "Expected a multipart/form-data request")
+    message = BytesParser(policy=policy.HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body
+    )
+    if not message.is_multipart():
+        raise RequestError(400, "Malformed multipart body")
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        if name:
+            fields[name] = (part.get_filename(), part.get_payload(decode=True) or b"")
+    return fields
+
+
+class StegoService(ThreadingHTTPServer):
+    """Threaded HTTP server that hands embedding and extraction to a process pool"""
+
+    daemon_threads = True
+
+    def __init__(self, address=(DEFAULT_HOST, DEFAULT_PORT), workers=None, max_pending=None,
+                 max_request_bytes=MAX_REQUEST_BYTES, quiet=False):
+        super().__init__(address, StegoRequestHandler)
+        workers = workers or os.cpu_count() or 1
+        # Spawned, not forked: the server already runs threads when the pool starts
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self.slots = threading.BoundedSemaphore(max(max_pending or workers * 2, 1))
+        self.max_request_bytes = max_request_bytes
+        self.quiet = quiet
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True)
+
+
+class StegoRequestHandler(BaseHTTPRequestHandler):
+    """Routes one request to hide, extract or capacity"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "StegoExpress"
+
+    def do_GET(self):
+        """GET /health: report that the service is up"""
+        if urlsplit(self.path).path == "/health":
+            self.send_json(200, {"status": "ok"})
+        else:
+            self.send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        """Route a POST to its endpoint, answering 503 once max_pending requests are in progress"""
+        routes = {"/hide": self.hide, "/extract": self.extract, "/capacity": self.capacity}
+        route = routes.get(urlsplit(self.path).path)
+        try:
+            length = self.content_length()
+        except RequestError as e:
+            # The body is too large to skip, so the connection cannot carry another request
+            self.close_connection = True
+            self.send_json(e.status, {"error": str(e)})
+            return
+        if route is None or not self.server.slots.acquire(blocking=False):
+            # Skipping the (bounded) body lets the client read the answer and reuse the connection
+            self.discard_body(length)
+            if route is None:
+                self.send_json(404, {"error": "Not found"})
+            else:
+                self.send_json(503, {"error": "Service busy, retry shortly"}, {"Retry-After": "1"})
+            return
+        try:
+            with tempfile.TemporaryDirectory(prefix="stego-service-") as directory:
+                route(directory, length)
+        except ConnectionError:
+            # The client went away; there is no one left to answer
+            self.close_connection = True
+        except Exception as e:
+            # Part of the body may be unread, so never reuse the connection after an error
+            self.close_connection = True
+            if isinstance(e, RequestError):
+                status = e.status
+            elif isinstance(e, (ValueError, UnidentifiedImageError)):
+                status = 400
+            else:
+                status = 500
+            self.send_json(status, {"error": str(e)})
+        finally:
+            self.server.slots.release()
+
+    def hide(self, directory, length):
+        """POST /hide: embed the form's message or file in its cover and stream the image back"""
+        fields = parse_form(self.headers.get("Content-Type"), self.read_body(length))
+        if "cover" not in fields:
+            raise RequestError(400, "Missing cover file")
+        cover_name, cover = fields["cover"]
+        cover_path = os.path.join(directory, "cover" + os.path.splitext(cover_name or "")[1])
+        _write(cover_path, cover)
+        message = file_path = None
+        if "file" in fields:
+            file_name, data = fields["file"]
+            safe_name = stego_payload.safe_file_name(file_name or "")
+            file_path = os.path.join(directory, "payload", safe_name)
+            os.makedirs(os.path.dirname(file_path))
+            _write(file_path, data)
+        elif "message" in fields:
+            message = fields["message"][1].decode("utf-8")
+        else:
+            raise RequestError(400, "Missing message or file to hide")
+        options = {name: fields[name][1].decode("utf-8") for name in HIDE_OPTIONS if name in fields}
+        del fields, cover
+        key, output_path = self.server.executor.submit(
+            hide_job, cover_path, message, file_path, directory, options
+        ).result()
+        content_type = mimetypes.guess_type(output_path)[0] or "application/octet-stream"
+        self.send_file(output_path, content_type, {KEY_HEADER: key})
+
+    def extract(self, directory, length):
+        """POST /extract: decrypt the body image with the X-Stego-Key header, return the payload"""
+        key = self.headers.get(KEY_HEADER)
+        if not key:
+            raise RequestError(400, f"Missing {KEY_HEADER} header")
+        image_path = self.spool_body(os.path.join(directory, "image"), length)
+        file_name, data_path = self.server.executor.submit(
+            extract_job, image_path, key, directory
+        ).result()
+        if file_name is None:
+            self.send_file(data_path, "text/plain; charset=utf-8")
+        else:
+            self.send_file(data_path, "application/octet-stream", {
+                "Content-Disposition": f"attachment; filename*=UTF-8''{quote(file_name)}"
+            })
+
+    def capacity(self, directory, length):
+        """POST /capacity: report the body image's capacity per mode, read from its header"""
+        image_path = self.spool_body(os.path.join(directory, "image"), length)
+        self.send_json(200, {"capacity_bits": stego_core.image_capacity(image_path)})
+
+    def content_length(self):
+        """Return the declared body size, refusing missing or oversized bodies"""
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            raise RequestError(411, "Content-Length required") from None
+        if length > self.server.max_request_bytes:
+            raise RequestError(413, f"Request body over {self.server.max_request_bytes} bytes")
+        return length
+
+    def read_body(self, length):
+        """Read the whole request body"""
+        body = self.rfile.read(length)
+        if len(body) != length:
+            raise ConnectionError("Request body ended early")
+        return body
+
+    def discard_body(self, length):
+        """Read and drop the request body"""
+        remaining = length
+        while remaining:
+            chunk = self.rfile.read(min(remaining, STREAM_CHUNK_SIZE))
+            if not chunk:
+                self.close_connection = True
+                return
+            remaining -= len(chunk)
+
+    def spool_body(self, path, length):
+        """Copy the request body to path in chunks, returning path"""
+        remaining = length
+        with open(path, "wb") as spool:
+            while remaining:
+                chunk = self.rfile.read(min(remaining, STREAM_CHUNK_SIZE))
+                if not chunk:
+                    raise ConnectionError("Request body ended early")
+                spool.write(chunk)
+                remaining -= len(chunk)
+        return path
+
+    def send_file(self, path, content_type, headers=None):
+        """Stream a file as a 200 response"""
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        with open(path, "rb") as response_file:
+            shutil.copyfileobj(response_file, self.wfile, STREAM_CHUNK_SIZE)
+
+    def send_json(self, status, document, headers=None):
+        """Send a small JSON response"""
+        body = json.dumps(document).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        if not self.server.quiet:
+            super().log_message(*args)
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, max_pending=None,
+          max_request_bytes=MAX_REQUEST_BYTES, quiet=False):
+    """Run the service until interrupted"""
+    with StegoService((host, port), workers, max_pending, max_request_bytes, quiet) as service:
+        print(f"StegoExpress service on http://{host}:{service.server_address[1]}",
+              file=sys.stderr, flush=True)
+        try:
+            service.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def _write(path, data):
+    """Write bytes to a new file"""
+    with open(path, "wb") as output:
+        output.write(data)
@@ -0,0 +1,317 @@
+"""Strip-wise streaming embed/extract for PNG covers larger than RAM
+
+The IDAT stream is inflated and re-deflated a strip of scanlines at a time.
+Only the rows that carry payload bits are unfiltered and rewritten; every
+other row is passed through in its original filtered form, so peak memory
+is bounded by the strip size rather than by the image dimensions.
+"""
+import os
+import struct
+import zlib
+
+import numpy as np
+from PIL import Image
+
+import stego_container
+import stego_engine
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+CHUNK_HEADER = struct.Struct(">I4s")
+IHDR = struct.Struct(">IIBBBBB")
+
+# PNG colour types 2 and 6: 8-bit truecolour (RGB) and truecolour with alpha (RGBA)
+COLOR_TYPE_MODES = {2: "RGB", 6: "RGBA"}
+
+DEFAULT_STRIP_ROWS = 256
+IDAT_CHUNK_SIZE = 1 << 16
+READ_BLOCK_SIZE = 1 << 16
+
+# PNG filter types that reference the previous scanline
+_PREVIOUS_ROW_FILTERS = (2, 3, 4)
+
+
+class PngReader:
+    """Forward-only reader yielding the inflated, still-filtered scanline stream"""
+
+    def __init__(self, fileobj):
+        self.file = fileobj
+        if self.file.read(len(PNG_SIGNATURE)) != PNG_SIGNATURE:
+            raise ValueError("Not a PNG file")
+        self.leading_chunks = []
+        self._pending_chunk = None
+        self._idat_left = 0
+        self._idat_done = False
+        self._inflater = zlib.decompressobj()
+        self._tail = b""
+
+        chunk_type, data = self._read_chunk()
+        if chunk_type != b"IHDR":
+            raise ValueError("PNG is missing its IHDR chunk")
+        self.leading_chunks.append((chunk_type, data))
+        width, height, bit_depth, color_type, _, _, interlace = IHDR.unpack(data)
+        if bit_depth != 8 or color_type not in COLOR_TYPE_MODES or interlace:
+            raise ValueError(
+                "Streaming mode supports non-interlaced 8-bit RGB/RGBA PNG images only"
+            )
+        self.width = width
+        self.height = height
+        self.mode = COLOR_TYPE_MODES[color_type]
+        self.channels = len(self.mode)
+        self.row_bytes = width * self.channels
+        self.stride = self.row_bytes + 1
+
+        while True:
+            length, chunk_type = CHUNK_HEADER.unpack(self._read_exact(CHUNK_HEADER.size))
+            if chunk_type == b"IDAT":
+                self._idat_left = length
+                break
+            self.leading_chunks.append((chunk_type, self._read_body(length)))
+
+    def _read_exact(self, size):
+        """Read exactly size bytes from the file"""
+        data = self.file.read(size)
+        if len(data) != size:
+            raise ValueError("Truncated PNG file")
+        return data
+
+    def _read_body(self, length):
+        """Read a chunk body and skip its CRC"""
+        data = self._read_exact(length)
+        self._read_exact(4)
+        return data
+
+    def _read_chunk(self):
+        """Read one whole chunk and return (type, data)"""
+        length, chunk_type = CHUNK_HEADER.unpack(self._read_exact(CHUNK_HEADER.size))
+        return chunk_type, self._read_body(length)
+
+    def _read_idat(self):
+        """Return the next block of compressed IDAT data, or b'' after the last IDAT"""
+        while not self._idat_done:
+            if self._idat_left:
+                data = self._read_exact(min(self._idat_left, READ_BLOCK_SIZE))
+                self._idat_left -= len(data)
+                if not self._idat_left:
+                    self._read_exact(4)
+                return data
+            length, chunk_type = CHUNK_HEADER.unpack(self._read_exact(CHUNK_HEADER.size))
+            if chunk_type == b"IDAT":
+                self._idat_left = length
+            else:
+                self._pending_chunk = (chunk_type, self._read_body(length))
+                self._idat_done = True
+        return b""
+
+    def read(self, size):
+        """Return up to size bytes of the inflated scanline stream (b'' at the end)"""
+        out = bytearray()
+        while len(out) < size:
+            if not self._tail:
+                self._tail = self._read_idat()
+                if not self._tail:
+                    out += self._inflater.flush()
+                    break
+            out += self._inflater.decompress(self._tail, size - len(out))
+            self._tail = self._inflater.unconsumed_tail
+        return bytes(out)
+
+    def read_rows(self, count):
+        """Return exactly count filtered scanlines as a bytes object"""
+        data = self.read(count * self.stride)
+        if len(data) != count * self.stride:
+            raise ValueError("PNG image data is truncated")
+        return data
+
+    def trailing_chunks(self):
+        """Yield (type, data) for the chunks after the image data, ending with IEND"""
+        while self._read_idat():
+            pass
+        chunk = self._pending_chunk
+        while chunk:
+            yield chunk
+            if chunk[0] == b"IEND":
+                break
+            chunk = self._read_chunk()
+
+
+class PngWriter:
+    """Writes PNG chunks, deflating scanlines incrementally into IDAT chunks"""
+
+    def __init__(self, fileobj, compress_level=6):
+        self.file = fileobj
+        self.file.write(PNG_SIGNATURE)
+        self._deflater = zlib.compressobj(compress_level)
+        self._pending = bytearray()
+
+    def write_chunk(self, chunk_type, data):
+        """Write one chunk with its CRC"""
+        self.file.write(CHUNK_HEADER.pack(len(data), chunk_type))
+        self.file.write(data)
+        self.file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(chunk_type))))
+
+    def write_rows(self, data):
+        """Deflate filtered scanline bytes, emitting full IDAT chunks as they fill"""
+        self._pending += self._deflater.compress(data)
+        while len(self._pending) >= IDAT_CHUNK_SIZE:
+            self.write_chunk(b"IDAT", bytes(self._pending[:IDAT_CHUNK_SIZE]))
+            del self._pending[:IDAT_CHUNK_SIZE]
+
+    def finish_rows(self):
+        """Flush the deflate stream into the final IDAT chunk(s)"""
+        self._pending += self._deflater.flush()
+        for start in range(0, len(self._pending), IDAT_CHUNK_SIZE):
+            self.write_chunk(b"IDAT", bytes(self._pending[start:start + IDAT_CHUNK_SIZE]))
+        self._pending = bytearray()
+
+
+def unfilter_rows(reader, filtered, previous_row):
+    """Undo PNG filtering for a strip of scanlines, returning a (rows, row_bytes) array
+
+    previous_row is the unfiltered row above the strip (zeros for the first
+    row). The work is done by Pillow's PNG decoder in C.
+    """
+    rows = len(filtered) // reader.stride
+    block = b"\x00" + previous_row.tobytes() + filtered
+    image = Image.frombytes(
+        reader.mode, (reader.width, rows + 1), zlib.compress(block, 0), "zip", reader.mode
+    )
+    return np.array(image, dtype=np.uint8).reshape(rows + 1, -1)[1:]
+
+
+def _filter_none(rows):
+    """Encode unfiltered rows with PNG filter type 0"""
+    return np.insert(rows, 0, 0, axis=1).tobytes()
+
+
+def embed_payload_file(source_path, output_path, payload, strip_rows=DEFAULT_STRIP_ROWS,
+                       compress_level=6, progress=None, flags=0, seed=None):
+    """Embed payload with its container header into a PNG, one strip of rows at a time
+
+    progress, if given, is called with the fraction of rows written after
+    each strip. A partially written output file is removed on failure.
+    Scattered payloads touch rows throughout the image, so every strip is
+    rewritten.
+    """
+    if os.path.exists(output_path) and os.path.samefile(source_path, output_path):
+        raise ValueError("Streaming output must not overwrite the cover image")
+    strip_rows = max(int(strip_rows), 1)
+
+    with open(source_path, "rb") as source:
+        reader = PngReader(source)
+        pixel_count = reader.width * reader.height
+        stego_container.check_fits(len(payload), flags, pixel_count, reader.channels)
+        streams = stego_container.container_streams(payload, flags, seed, pixel_count)
+        try:
+            with open(output_path, "wb") as output:
+                _stream_embed(reader, PngWriter(output, compress_level), streams, strip_rows,
+                              progress)
+        except BaseException:
+            os.remove(output_path)
+            raise
+    return output_path
+
+
+def _stream_embed(reader, writer, streams, strip_rows, progress):
+    """Copy reader to writer, rewriting the rows that carry the container streams"""
+    for chunk_type, data in reader.leading_chunks:
+        writer.write_chunk(chunk_type, data)
+
+    # Rewrite the rows carrying payload bits as unfiltered rows
+    touched_rows = -(-stego_container.pixels_needed(streams) // reader.width)
+    previous = np.zeros(reader.row_bytes, dtype=np.uint8)
+    row = 0
+    while row < touched_rows:
+        count = min(strip_rows, touched_rows - row)
+        rows = unfilter_rows(reader, reader.read_rows(count), previous)
+        previous = rows[-1].copy()
+        block = rows.reshape(-1, reader.channels)
+        for values, offset, layout in streams:
+            stego_engine.write_block(block, values, offset, layout, first_pixel=row * reader.width)
+        writer.write_rows(_filter_none(rows))
+        row += count
+        if progress:
+            progress(row / reader.height)
+
+    # The first untouched row may reference the rewritten row above it
+    if row < reader.height:
+        filtered = reader.read_rows(1)
+        if filtered[0] in _PREVIOUS_ROW_FILTERS:
+            filtered = _filter_none(unfilter_rows(reader, filtered, previous))
+        writer.write_rows(filtered)
+        row += 1
+
+    # Everything below is copied straight through
+    block_size = strip_rows * reader.stride
+    data = reader.read(block_size)
+    while data:
+        writer.write_rows(data)
+        row += len(data) // reader.stride
+        if progress:
+            progress(min(row / reader.height, 1.0))
+        data = reader.read(block_size)
+    writer.finish_rows()
+
+    for chunk_type, data in reader.trailing_chunks():
+        writer.write_chunk(chunk_type, data)
+
+
+class _PixelStream:
+    """Reads container bytes from a PNG, decoding leading rows only on demand"""
+
+    def __init__(self, reader, strip_rows):
+        self.reader = reader
+        self.strip_rows = strip_rows
+        self.rows_read = 0
+        self.previous = np.zeros(reader.row_bytes, dtype=np.uint8)
+        self.strips = []
+        self.block = np.zeros((0, reader.channels), dtype=np.uint8)
+
+    def read(self, byte_count, slot_offset, layout):
+        """Return byte_count bytes of the slot stream from slot_offset (or at the slots it lists)"""
+        slots = stego_engine.slot_count(byte_count, layout.depth)
+        slot_end = stego_engine.stream_end(slot_offset, slots)
+        pixels = -(-slot_end // layout.channels)
+        rows = min(-(-pixels // self.reader.width), self.reader.height)
+        while self.rows_read < rows:
+            count = min(self.strip_rows, rows - self.rows_read)
+            decoded = unfilter_rows(self.reader, self.reader.read_rows(count), self.previous)
+            self.previous = decoded[-1].copy()
+            self.strips.append(decoded.reshape(-1, self.reader.channels))
+            self.rows_read += count
+        if self.strips:
+            self.block = np.concatenate([self.block] + self.strips)
+            self.strips = []
+        return stego_engine.read_bytes(self.block, byte_count, slot_offset, layout)
+
+
+def extract_payload_file(image_path, strip_rows=DEFAULT_STRIP_ROWS, seed=None):
+    """Extract (header, payload) from a PNG, decoding only the rows that hold it
+
+    seed is needed only for scattered payloads, which span the whole image.
+    """
+    with open(image_path, "rb") as image_file:
+        reader = PngReader(image_file)
+        stream = _PixelStream(reader, max(int(strip_rows), 1))
+        return stego_container.read_container(
+            stream.read, reader.width * reader.height, reader.channels, seed
+        )
+
+
+def extract_header_file(image_path):
+    """Read only the container header from a PNG, decoding just the first row or two"""
+    with open(image_path, "rb") as image_file:
+        reader = PngReader(image_file)
+        stream = _PixelStream(reader, 1)
+        return stego_container.read_header(stream.read, reader.width * reader.height,
+                                           reader.channels)
+
+
+def is_streamable(image_path):
+    """Return True if image_path is a PNG the streaming reader can handle"""
+    try:
+        with open(image_path, "rb") as image_file:
+            PngReader(image_file)
+        return True
+    except (OSError, ValueError, struct.error):
+        return False
@@ -0,0 +1,151 @@
+"""Lightweight per-stage timing: spans grouped into operations, logged as JSONL
+
+An operation (one hide, extract or send) collects the spans opened while it
+is active on the current thread. Spans are cheap no-ops when no operation is
+active, so library code can be instrumented unconditionally:
+
+    with stego_trace.operation("hide", image=path) as trace:
+        with stego_trace.span("embed", pixels=width * height):
+            ...
+    print(trace.summary())   # "embed 120 ms"
+
+Finished operations are appended to the log configured with configure().
+"""
+import contextvars
+import cProfile
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+DEFAULT_DIR = os.path.join(os.path.expanduser("~"), ".stegoexpress")
+DEFAULT_LOG_PATH = os.path.join(DEFAULT_DIR, "trace.jsonl")
+
+_current = contextvars.ContextVar("stego_trace", default=None)
+_log_path = os.environ.get("STEGOEXPRESS_TRACE_LOG") or None
+_log_lock = threading.Lock()
+
+
+class Trace:
+    """The spans recorded during one operation"""
+
+    def __init__(self, name, **fields):
+        self.name = name
+        self.fields = fields
+        self.spans = []
+        self.started = time.time()
+        self.seconds = None
+        self.status = None
+        self.cprofile_path = None
+
+    def add(self, name, seconds, **fields):
+        """Record a finished span"""
+        self.spans.append(dict(name=name, seconds=round(seconds, 6), **fields))
+
+    def summary(self):
+        """Return the span durations as text, e.g. 'embed 120 ms, save 340 ms'"""
+        return ", ".join(f"{span['name']} {span['seconds'] * 1000:.0f} ms" for span in self.spans)
+
+    def record(self):
+        """Return the operation as a JSON-serializable dict"""
+        record = {
+            "operation": self.name,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "seconds": self.seconds,
+            "status": self.status,
+        }
+        record.update(self.fields)
+        if self.cprofile_path:
+            record["cprofile"] = self.cprofile_path
+        record["spans"] = self.spans
+        return record
+
+
+def configure(log_path=None):
+    """Set the JSONL file finished operations are appended to (None disables logging)"""
+    global _log_path
+    _log_path = log_path
+
+
+def current():
+    """Return the active Trace on this thread, or None"""
+    return _current.get()
+
+
+@contextmanager
+def span(name, **fields):
+    """Time a stage of the active operation; yields a dict for counts known only afterwards"""
+    trace = _current.get()
+    if trace is None:
+        yield fields
+        return
+    started = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        trace.add(name, time.perf_counter() - started, **fields)
+
+
+@contextmanager
+def operation(name, cprofile_path=None, **fields):
+    """Collect spans for one operation, then log it
+
+    Inside an already active operation this joins the outer one instead of
+    starting a new record. With cprofile_path, the operation also runs under
+    cProfile and its stats are written there (read them with pstats or
+    snakeviz).
+    """
+    outer = _current.get()
+    if outer is not None:
+        outer.fields.update(fields)
+        yield outer
+        return
+    trace = Trace(name, **fields)
+    trace.cprofile_path = cprofile_path
+    token = _current.set(trace)
+    started = time.perf_counter()
+    try:
+        with profiled(cprofile_path):
+            yield trace
+        trace.status = "ok"
+    except BaseException as e:
+        trace.status = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        trace.seconds = round(time.perf_counter() - started, 6)
+        if _log_path:
+            _append(_log_path, trace.record())
+
+
+@contextmanager
+def profiled(cprofile_path):
+    """Run the block under cProfile and dump stats to cprofile_path (no-op if None)"""
+    if not cprofile_path:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        directory = os.path.dirname(cprofile_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        profiler.dump_stats(cprofile_path)
+
+
+def _append(log_path, record):
+    """Append one JSON line to the log, ignoring an unwritable log"""
+    try:
+        directory = os.path.dirname(log_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        line = json.dumps(record, default=str) + "\n"
+        with _log_lock, open(log_path, "a", encoding="utf-8") as log_file:
+            log_file.write(line)
+    except OSError:
+        pass
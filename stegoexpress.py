@@ -0,0 +1,496 @@
+"""Command-line interface for StegoExpress
+
+    stegoexpress hide|extract|batch|capacity|plan|send|serve|scan
+"""
+import argparse
+import csv
+import getpass
+import glob
+import os
+import sys
+from collections import deque
+from functools import partial
+
+import stego_batch
+import stego_core
+import stego_mail
+import stego_output
+import stego_payload
+import stego_scan
+import stego_service
+import stego_trace
+
+
+def expand_paths(patterns):
+    """Expand file names and glob patterns into a sorted, de-duplicated path list"""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            print(f"warning: no files match '{pattern}'", file=sys.stderr)
+        for path in matches:
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+def read_message(args):
+    """Return the message from --message or --message-file"""
+    if args.message_file:
+        if args.message_file == "-":
+            return sys.stdin.read()
+        with open(args.message_file, "r", encoding="utf-8") as message_file:
+            return message_file.read()
+    return args.message
+
+
+def run_each(patterns, action):
+    """Apply action to every matched path, reporting failures; returns the failure count
+
+    action returns the line to print, or (line, future) when part of its work
+    finishes in the background; such lines are printed, in input order, once
+    their future completes.
+    """
+    paths = expand_paths(patterns)
+    if not paths:
+        print("error: no input images", file=sys.stderr)
+        return 1
+    failures = 0
+    pending = deque()
+    for image_path in paths:
+        try:
+            outcome = action(image_path)
+            if not isinstance(outcome, tuple):
+                outcome = (outcome, None)
+            pending.append((image_path,) + outcome)
+        except Exception as e:
+            failures += 1
+            print(f"error: {image_path}: {e}", file=sys.stderr)
+        failures += report_finished(pending, wait=False)
+    return failures + report_finished(pending, wait=True)
+
+
+def report_finished(pending, wait):
+    """Print queued run_each lines whose background work is done; returns the failure count"""
+    failures = 0
+    while pending:
+        image_path, line, future = pending[0]
+        if future is not None and not (wait or future.done()):
+            break
+        pending.popleft()
+        try:
+            if future is not None:
+                future.result()
+            print(line)
+        except Exception as e:
+            failures += 1
+            print(f"error: {image_path}: {e}", file=sys.stderr)
+    return failures
+
+
+def hide_command(args):
+    """Hide one message or file in every cover image; prints input, output and key per line"""
+    message = None if args.file else read_message(args)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    # Each image is encoded on the save worker while the next one is embedded
+    with stego_output.SaveWorker() as saver:
+        def hide(image_path):
+            output_path = stego_core.default_output_path(image_path, args.output_dir, args.profile)
+            if args.file:
+                hide_payload = partial(stego_core.hide_file, image_path, args.file)
+            else:
+                hide_payload = partial(stego_core.hide_message, image_path, message)
+            result = hide_payload(
+                output_path, args.key, strip_rows=args.strip_rows, codec=args.codec, mode=args.mode,
+                profile=args.profile, saver=saver, scatter=args.scatter
+            )
+            return f"{image_path}\t{result.output_path}\t{result.key}", result.saved
+
+        return run_each(args.images, hide)
+
+
+def extract_command(args):
+    """Extract the hidden message (or file, into --output-dir) from every stego-image"""
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    def extract(image_path):
+        file_name, data = stego_core.extract_data(image_path, args.key)
+        if file_name is None:
+            return f"{image_path}\t{data.decode()}"
+        path = stego_core.unique_path(args.output_dir, file_name)
+        return f"{image_path}\t{stego_core.save_file(path, data)}"
+
+    return run_each(args.images, extract)
+
+
+def batch_command(args):
+    """Embed every row of a manifest across a process pool"""
+    def report(result):
+        if result["status"] != "ok":
+            print(f"error: {result['cover']}: {result['error']}", file=sys.stderr)
+
+    if args.pipeline:
+        succeeded, failed, stages = stego_batch.run_pipeline(
+            stego_batch.read_manifest(args.manifest),
+            args.report,
+            readers=args.readers,
+            embedders=args.workers,
+            encoders=args.encoders,
+            queue_size=args.max_in_flight,
+            on_result=report
+        )
+        print(f"{stages['seconds']:.2f} s; " + ", ".join(
+            f"{stage['stage']} {stage['workers']}x {stage['utilisation'] * 100:.0f}% busy"
+            for stage in stages["stages"]
+        ), file=sys.stderr)
+    else:
+        succeeded, failed = stego_batch.run_batch(
+            stego_batch.read_manifest(args.manifest),
+            args.report,
+            workers=args.workers,
+            max_in_flight=args.max_in_flight,
+            on_result=report
+        )
+    print(f"{succeeded} embedded, {failed} failed; results in {args.report}")
+    return failed
+
+
+def capacity_command(args):
+    """Print the embedding capacity of each image, from its header only"""
+    def capacity(image_path):
+        needed = stego_core.required_bits(args.message) if args.message is not None else 0
+        modes = stego_core.image_capacity(image_path, args.scatter)
+        return image_path + "".join(f"\t{mode}={bits - needed}" for mode, bits in modes.items())
+
+    return run_each(args.images, capacity)
+
+
+def plan_command(args):
+    """Pick the smallest fitting cover for each message and write a batch manifest"""
+    with open(args.messages, "r", newline="", encoding="utf-8") as messages_file:
+        rows = list(csv.DictReader(messages_file))
+    if rows and "message" not in rows[0]:
+        print("error: messages file needs a 'message' column", file=sys.stderr)
+        return 1
+    plan = stego_batch.plan_covers([row["message"] for row in rows], args.cover_dir, args.mode)
+
+    failures = 0
+    with open(args.manifest, "w", newline="", encoding="utf-8") as manifest_file:
+        writer = csv.DictWriter(
+            manifest_file, fieldnames=stego_batch.MANIFEST_FIELDS + ("key", "mode")
+        )
+        writer.writeheader()
+        for line, (row, cover) in enumerate(zip(rows, plan), start=2):
+            if cover is None:
+                failures += 1
+                print(f"error: {args.messages}:{line}: no remaining cover is large enough",
+                      file=sys.stderr)
+                continue
+            writer.writerow({
+                "cover": cover,
+                "message": row["message"],
+                "output": (row.get("output")
+                           or stego_core.default_output_path(cover, args.output_dir)),
+                "key": row.get("key") or "",
+                "mode": args.mode,
+            })
+    print(f"{len(rows) - failures} planned, {failures} without a cover;"
+          f" manifest in {args.manifest}")
+    return failures
+
+
+def send_command(args):
+    """Email every (image, recipient) row of a delivery list over pooled SMTP sessions"""
+    password = None
+    if args.user:
+        password = (os.environ.get(args.password_env)
+                    or getpass.getpass(f"SMTP password for {args.user}: "))
+    config = stego_mail.MailConfig(
+        args.host, args.port or stego_mail.DEFAULT_PORTS[args.security], args.security, args.user,
+        password
+    )
+    deliveries = list(stego_mail.read_deliveries(args.deliveries))
+
+    failures = 0
+    with stego_mail.MailQueue(config, workers=args.workers, retries=args.retries) as mail:
+        futures = mail.send_bulk(args.sender, deliveries)
+        for delivery, future in zip(deliveries, futures):
+            images = ";".join(delivery.attachments)
+            try:
+                future.result()
+                print(f"{images}\t{delivery.recipient}\tsent")
+            except Exception as e:
+                failures += 1
+                print(f"error: {images} -> {delivery.recipient}: {e}", file=sys.stderr)
+    return failures
+
+
+def serve_command(args):
+    """Run the local HTTP service until interrupted"""
+    stego_service.serve(
+        args.host, args.port, args.workers, args.max_pending, args.max_request_mib << 20, args.quiet
+    )
+    return 0
+
+
+def scan_command(args):
+    """List the images under each root that carry a payload, reading only their headers"""
+    def show(result):
+        if result.get("error"):
+            print(f"error: {result['path']}: {result['error']}", file=sys.stderr)
+        elif result["payload"]:
+            print(f"{result['path']}\t{result['mode']}\t{result['codec']}\t{result['kind']}"
+                  f"\t{result['length']}")
+        elif args.all:
+            print(f"{result['path']}\t-")
+
+    index_path = ":memory:" if args.no_index else args.index
+    report = stego_scan.scan_tree(args.roots, index_path, args.workers, show)
+    found = sum(1 for result in report.results if result["payload"])
+    print(
+        f"{found} of {len(report.results)} images carry a payload"
+        f" ({report.scanned} read, {len(report.results) - report.scanned} from the index)",
+        file=sys.stderr
+    )
+    return 0
+
+
+def _add_hide_parser(subparsers):
+    """Add the hide subcommand"""
+    hide = subparsers.add_parser("hide", help="encrypt a message and embed it in images")
+    message_group = hide.add_mutually_exclusive_group(required=True)
+    message_group.add_argument("-m", "--message", help="secret message text")
+    message_group.add_argument(
+        "-f", "--message-file",
+        help="read the message from a file ('-' for stdin)"
+    )
+    message_group.add_argument(
+        "--file",
+        help="hide any file (stored with its name and size) instead of text"
+    )
+    hide.add_argument("-k", "--key", help="Fernet key to use (default: a new key per image)")
+    hide.add_argument("-o", "--output-dir", default="", help="directory for *_stego.png files")
+    hide.add_argument(
+        "--profile", default=stego_output.DEFAULT_PROFILE, choices=list(stego_output.PROFILES),
+        help="output encoder: default, fast, small (PNG), lossless webp/tiff, or raw to patch"
+             " an uncompressed BMP/TIFF/.npy cover in place"
+    )
+    hide.add_argument(
+        "--mode", default=stego_core.DEFAULT_MODE, choices=stego_core.MODES,
+        help="channels and LSBs per channel to embed into (default: rgb-1)"
+    )
+    hide.add_argument(
+        "--codec", default="auto", choices=stego_payload.codec_names(),
+        help="compression applied before encryption (default: smallest result)"
+    )
+    hide.add_argument(
+        "--scatter", action="store_true",
+        help="spread the payload over the whole image in a key-derived order"
+             " (holds about half as much)"
+    )
+    hide.add_argument(
+        "--strip-rows", type=int,
+        help="stream PNG covers in strips of this many rows to bound memory use"
+    )
+    hide.add_argument("images", nargs="+", help="cover image files or glob patterns")
+    hide.set_defaults(handler=hide_command)
+
+
+def _add_extract_parser(subparsers):
+    """Add the extract subcommand"""
+    extract = subparsers.add_parser("extract", help="extract and decrypt messages from images")
+    extract.add_argument("-k", "--key", required=True, help="Fernet key used when hiding")
+    extract.add_argument("-o", "--output-dir", default="", help="directory for extracted files")
+    extract.add_argument("images", nargs="+", help="stego-image files or glob patterns")
+    extract.set_defaults(handler=extract_command)
+
+
+def _add_batch_parser(subparsers):
+    """Add the batch subcommand"""
+    batch = subparsers.add_parser("batch", help="embed a CSV manifest of cover,message,output rows")
+    batch.add_argument(
+        "manifest",
+        help="CSV file with cover, message, output (optional key, mode, profile, scatter) columns"
+    )
+    batch.add_argument(
+        "-r", "--report", default="stego_batch.jsonl",
+        help="JSONL file for per-item results"
+    )
+    batch.add_argument(
+        "-j", "--workers", type=int,
+        help="worker processes, or embed threads with --pipeline (default: CPU count)"
+    )
+    batch.add_argument(
+        "--max-in-flight", type=int,
+        help="images in memory at once (default: 2 per worker), or queued per stage with --pipeline"
+    )
+    batch.add_argument(
+        "--pipeline", action="store_true",
+        help="run read, embed and encode as overlapping thread-pool stages in one process"
+    )
+    batch.add_argument(
+        "--readers", type=int, default=stego_batch.DEFAULT_READERS,
+        help="cover reading threads with --pipeline (default: %(default)s)"
+    )
+    batch.add_argument(
+        "--encoders", type=int, default=stego_batch.DEFAULT_ENCODERS,
+        help="encoding threads with --pipeline (default: %(default)s)"
+    )
+    batch.set_defaults(handler=batch_command)
+
+
+def _add_capacity_parser(subparsers):
+    """Add the capacity subcommand"""
+    capacity = subparsers.add_parser("capacity", help="show how many bits each image can hold")
+    capacity.add_argument("-m", "--message", help="show the bits left per mode after this message")
+    capacity.add_argument(
+        "--scatter", action="store_true",
+        help="show capacity for scattered embedding"
+    )
+    capacity.add_argument("images", nargs="+", help="image files or glob patterns")
+    capacity.set_defaults(handler=capacity_command)
+
+
+def _add_plan_parser(subparsers):
+    """Add the plan subcommand"""
+    plan = subparsers.add_parser("plan", help="assign the smallest fitting cover to each message")
+    plan.add_argument("cover_dir", help="directory of candidate cover images")
+    plan.add_argument("messages", help="CSV file with a message column (output and key optional)")
+    plan.add_argument("-m", "--manifest", default="manifest.csv", help="batch manifest to write")
+    plan.add_argument("-o", "--output-dir", default="", help="directory for *_stego.png files")
+    plan.add_argument(
+        "--mode", default=stego_core.DEFAULT_MODE, choices=stego_core.MODES,
+        help="embedding mode the covers are sized for (default: rgb-1)"
+    )
+    plan.set_defaults(handler=plan_command)
+
+
+def _add_send_parser(subparsers):
+    """Add the send subcommand"""
+    send = subparsers.add_parser(
+        "send",
+        help="email stego-images to recipients over pooled SMTP sessions"
+    )
+    send.add_argument(
+        "deliveries",
+        help="CSV file with image (several separated by ';') and recipient (optional key) columns"
+    )
+    send.add_argument("--from", dest="sender", required=True, help="sender address")
+    send.add_argument(
+        "--host", default=stego_mail.DEFAULT_HOST,
+        help="SMTP server (default: smtp.gmail.com)"
+    )
+    send.add_argument("--port", type=int, help="SMTP port (default: 587, 465 for ssl, 25 for none)")
+    send.add_argument(
+        "--security", default="starttls", choices=stego_mail.SECURITY_MODES,
+        help="connection security (default: starttls)"
+    )
+    send.add_argument(
+        "--user",
+        help="log in as this user (password from --password-env or a prompt)"
+    )
+    send.add_argument(
+        "--password-env", default="STEGOEXPRESS_SMTP_PASSWORD",
+        help="environment variable holding the SMTP password"
+    )
+    send.add_argument(
+        "-j", "--workers", type=int, default=stego_mail.DEFAULT_WORKERS,
+        help="parallel SMTP sessions (default: 2)"
+    )
+    send.add_argument(
+        "--retries", type=int, default=stego_mail.DEFAULT_RETRIES,
+        help="retries per message on transient failures (default: 3)"
+    )
+    send.set_defaults(handler=send_command)
+
+
+def _add_serve_parser(subparsers):
+    """Add the serve subcommand"""
+    serve = subparsers.add_parser(
+        "serve",
+        help="run a local HTTP service for hide, extract and capacity"
+    )
+    serve.add_argument(
+        "--host", default=stego_service.DEFAULT_HOST,
+        help="address to bind (default: %(default)s)"
+    )
+    serve.add_argument(
+        "--port", type=int, default=stego_service.DEFAULT_PORT,
+        help="port (default: %(default)s)"
+    )
+    serve.add_argument("-j", "--workers", type=int, help="worker processes (default: CPU count)")
+    serve.add_argument(
+        "--max-pending", type=int,
+        help="requests in progress before new ones get 503 (default: 2 per worker)"
+    )
+    serve.add_argument(
+        "--max-request-mib", type=int, default=stego_service.MAX_REQUEST_BYTES >> 20,
+        help="largest accepted request body in MiB (default: %(default)s)"
+    )
+    serve.add_argument("-q", "--quiet", action="store_true", help="do not log each request")
+    serve.set_defaults(handler=serve_command)
+
+
+def _add_scan_parser(subparsers):
+    """Add the scan subcommand"""
+    scan = subparsers.add_parser(
+        "scan",
+        help="list images that carry a payload, reading only their headers"
+    )
+    scan.add_argument("roots", nargs="+", help="directories or image files to scan")
+    scan.add_argument(
+        "--index", default=stego_scan.DEFAULT_INDEX_PATH,
+        help="SQLite index of earlier results, reused for unchanged files"
+             " (default: ~/.stegoexpress)"
+    )
+    scan.add_argument("--no-index", action="store_true", help="read every image and keep no index")
+    scan.add_argument("-j", "--workers", type=int, help="worker processes (default: CPU count)")
+    scan.add_argument("--all", action="store_true", help="also list images without a payload")
+    scan.set_defaults(handler=scan_command)
+
+
+def build_parser():
+    """Build the argument parser for every subcommand
+
+    hide, extract (one or more images), batch, capacity, plan, send, serve
+    and scan.
+    """
+    parser = argparse.ArgumentParser(
+        prog="stegoexpress",
+        description="Hide and extract encrypted messages in images (LSB steganography)"
+    )
+    parser.add_argument(
+        "--trace-log", help="append per-stage timings of every operation to this JSONL file"
+        " (default: $STEGOEXPRESS_TRACE_LOG, if set)"
+    )
+    parser.add_argument(
+        "--cprofile", metavar="PATH",
+        help="run the command under cProfile and write its stats here (main thread only)"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    _add_hide_parser(subparsers)
+    _add_extract_parser(subparsers)
+    _add_batch_parser(subparsers)
+    _add_capacity_parser(subparsers)
+    _add_plan_parser(subparsers)
+    _add_send_parser(subparsers)
+    _add_serve_parser(subparsers)
+    _add_scan_parser(subparsers)
+    return parser
+
+
+def main(argv=None):
+    """Run the CLI and return the process exit status"""
+    args = build_parser().parse_args(argv)
+    if args.trace_log:
+        stego_trace.configure(args.trace_log)
+    with stego_trace.profiled(args.cprofile):
+        failures = args.handler(args)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Batch work: manifest rows with mismatched output names, and bulk extraction
+
+    python -m unittest discover tests
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+import stego_batch  # noqa: E402
+import stego_core  # noqa: E402
+import stego_trace  # noqa: E402
+# pylint: enable=wrong-import-position
+
+
+# (profile, output name) pairs whose extension names another format
+MISMATCHED = (("default", "out.bmp"), ("default", "out.jpg"), ("webp", "out.png"),
+              ("tiff", "out.webp"), ("raw", "out.png"))
+
+
+class OutputExtensionTest(unittest.TestCase):
+    """Rows whose output extension does not name the format their profile writes"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.cover_path = os.path.join(self.directory, "cover.bmp")
+        pixels = np.random.default_rng(0).integers(0, 256, (32, 32, 3), dtype=np.uint8)
+        Image.fromarray(pixels).save(self.cover_path)
+
+    def row(self, profile, output):
+        """Return a manifest row hiding a short message into output with profile"""
+        return {"cover": self.cover_path, "message": "Meet at noon", "profile": profile,
+                "output": os.path.join(self.directory, output)}
+
+    def test_hide_row(self):
+        """Mismatched rows are reported as errors and write nothing"""
+        for profile, output in MISMATCHED:
+            with self.subTest(profile=profile, output=output):
+                result = stego_batch.hide_row(self.row(profile, output))
+                self.assertEqual(result["status"], "error")
+                self.assertFalse(os.path.exists(os.path.join(self.directory, output)))
+
+    def test_pipeline(self):
+        """The pipeline reports mismatched rows and still writes the matching ones"""
+        rows = [self.row(profile, output) for profile, output in MISMATCHED]
+        rows += [self.row("tiff", "good.tif"), self.row("raw", "good.bmp")]
+        report_path = os.path.join(self.directory, "report.jsonl")
+        succeeded, failed, _ = stego_batch.run_pipeline(rows, report_path, embedders=2)
+        self.assertEqual((succeeded, failed), (2, len(MISMATCHED)))
+        with open(report_path, "r", encoding="utf-8") as report:
+            results = [json.loads(line) for line in report]
+        for result in results:
+            if result["status"] == "ok":
+                self.assertEqual(stego_core.extract_message(result["output"], result["key"]),
+                                 "Meet at noon")
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ["cover.bmp", "good.bmp", "good.tif", "report.jsonl"])
+
+
+class ExtractAllTest(unittest.TestCase):
+    """Bulk extraction on the thread pool"""
+
+    def test_spans_join_operation(self):
+        """Spans opened on the pool threads are recorded in the caller's operation"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        key = stego_core.generate_key()
+        image_paths = []
+        for index in range(4):
+            cover_path = os.path.join(directory, f"cover_{index}.png")
+            pixels = np.random.default_rng(index).integers(0, 256, (32, 32, 3), dtype=np.uint8)
+            Image.fromarray(pixels).save(cover_path)
+            output_path = os.path.join(directory, f"stego_{index}.png")
+            image_paths.append(stego_core.hide_message(cover_path, f"message {index}",
+                                                       output_path, key).output_path)
+        with stego_trace.operation("bulk") as trace:
+            results = stego_batch.extract_all(image_paths, key, os.path.join(directory, "out"),
+                                              workers=4)
+        self.assertEqual([result["status"] for result in results], ["ok"] * 4)
+        names = [span["name"] for span in trace.spans]
+        self.assertEqual(names.count("read"), 4)
+        self.assertEqual(names.count("decrypt"), 4)
+        self.assertEqual(names[-1], "extract_all")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+"""Round-trip and golden-bytes tests of the container format
+
+Images already written depend on these bytes, so the golden values must
+never change without a new format version.
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+import zlib
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+import stego_container  # noqa: E402
+# pylint: enable=wrong-import-position
+
+
+# pack_container(b"hello", 0x0A): magic, version 2, flags, length 5, crc32, payload
+GOLDEN_CONTAINER = bytes.fromhex("53475850020a000000053610a68668656c6c6f")
+
+# LSBs of the first 128 channel values of an 8x8 black image after embedding b"hi"
+GOLDEN_EMBEDDED = bytes.fromhex("53475850020000000002d8932aac6869")
+
+
+def noise_image(width, height, mode="RGB", seed=0):
+    """Return a random image, so no payload bit happens to match the cover"""
+    shape = (height, width, len(mode))
+    pixels = np.random.default_rng(seed).integers(0, 256, shape, dtype=np.uint8)
+    return Image.fromarray(pixels, mode)
+
+
+class ContainerFormatTest(unittest.TestCase):
+    """The header layout and its placement in the image"""
+
+    def test_header_bytes(self):
+        """The header packs to the same bytes as always"""
+        self.assertEqual(stego_container.pack_container(b"hello", 0x0A), GOLDEN_CONTAINER)
+
+    def test_parse_header(self):
+        """A golden header parses to its fields"""
+        header = stego_container.parse_header(GOLDEN_CONTAINER)
+        self.assertEqual(header, stego_container.Header(2, 0x0A, 5, 0x3610A686))
+
+    def test_embedded_bits(self):
+        """Container bits go MSB first into successive channel LSBs"""
+        image = Image.new("RGB", (8, 8))
+        stego_container.embed_payload(image, b"hi")
+        lsbs = np.asarray(image).reshape(-1)[:len(GOLDEN_EMBEDDED) * 8] & 1
+        self.assertEqual(np.packbits(lsbs).tobytes(), GOLDEN_EMBEDDED)
+
+    def test_missing_header(self):
+        """An image without a header is reported as carrying no payload"""
+        with self.assertRaises(stego_container.PayloadNotFoundError):
+            stego_container.extract_payload(noise_image(16, 16))
+
+
+class ContainerRoundTripTest(unittest.TestCase):
+    """Payloads come back unchanged and damage is detected"""
+
+    payload = bytes(range(256)) * 3
+
+    def test_round_trip(self):
+        """A payload comes back with the header it was written with"""
+        image = noise_image(48, 48)
+        stego_container.embed_payload(image, self.payload, 0x02)
+        header, payload = stego_container.extract_payload(image)
+        self.assertEqual(header, stego_container.Header(2, 0x02, len(self.payload),
+                                                        zlib.crc32(self.payload)))
+        self.assertEqual(payload, self.payload)
+
+    def test_too_large(self):
+        """A payload larger than the image is refused before anything is written"""
+        with self.assertRaises(ValueError):
+            stego_container.embed_payload(noise_image(8, 8), self.payload)
+
+    def test_damaged_payload(self):
+        """A flipped payload bit fails the checksum"""
+        image = noise_image(32, 32)
+        stego_container.embed_payload(image, self.payload[:64])
+        pixels = np.array(image)
+        # One LSB in the body, past the header's 43 pixels
+        pixels[2, 0, 0] ^= 1
+        with self.assertRaises(stego_container.CorruptPayloadError):
+            stego_container.extract_payload(Image.fromarray(pixels))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+"""Hidden files: the name and size record, stored names that try to escape, and saving
+
+    python -m unittest discover tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+import stego_core  # noqa: E402
+import stego_output  # noqa: E402
+import stego_payload  # noqa: E402
+# pylint: enable=wrong-import-position
+
+
+# Stored names and the base name each must be reduced to
+ESCAPING_NAMES = {
+    "../../x": "x",
+    "/etc/passwd": "passwd",
+    "C:\\x": "x",
+    "C:x": "x",
+    "dir/C:x": "x",
+    "..\\..\\evil.txt": "evil.txt",
+    "\\\\server\\share\\x": "x",
+    " report.pdf ": "report.pdf",
+    "..": stego_payload.DEFAULT_FILE_NAME,
+    ".": stego_payload.DEFAULT_FILE_NAME,
+    "": stego_payload.DEFAULT_FILE_NAME,
+    "dir/": stego_payload.DEFAULT_FILE_NAME,
+}
+
+
+def raw_record(name, data):
+    """Build a file record with name stored exactly as given, as a crafted image could"""
+    name = name.encode("utf-8")
+    return stego_payload.FILE_RECORD.pack(len(name), len(data)) + name + data
+
+
+class FileRecordTest(unittest.TestCase):
+    """The record that carries a file's name and size"""
+
+    def test_round_trip(self):
+        """Name, size and contents come back, for empty and binary files and any name"""
+        for name, data in (("notes.txt", b"hello"), ("empty", b""), ("Über π.bin", bytes(256))):
+            with self.subTest(name=name):
+                record = stego_payload.pack_file(os.path.join("some", "dir", name), data)
+                stored_name, contents = stego_payload.unpack_file(record)
+                self.assertEqual(stored_name, name)
+                self.assertEqual(bytes(contents), data)
+
+    def test_size_mismatch(self):
+        """Records whose size does not match their contents are refused"""
+        record = stego_payload.pack_file("notes.txt", b"hello")
+        for damaged in (record[:-1], record + b"!", record[:stego_payload.FILE_RECORD.size - 1]):
+            with self.subTest(length=len(damaged)):
+                with self.assertRaises(ValueError):
+                    stego_payload.unpack_file(damaged)
+
+    def test_safe_file_name(self):
+        """Stored names are reduced to a base name inside the output directory"""
+        for name, expected in ESCAPING_NAMES.items():
+            with self.subTest(name=name):
+                self.assertEqual(stego_payload.safe_file_name(name), expected)
+                self.assertEqual(stego_payload.unpack_file(raw_record(name, b"x"))[0], expected)
+
+
+class SaveFileTest(unittest.TestCase):
+    """Extracted files land inside the output directory and never overwrite anything"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.output_dir = os.path.join(self.directory, "out")
+        os.makedirs(self.output_dir)
+        self.cover_path = os.path.join(self.directory, "cover.png")
+        pixels = np.random.default_rng(0).integers(0, 256, (64, 64, 3), dtype=np.uint8)
+        Image.fromarray(pixels).save(self.cover_path)
+
+    def hide_record(self, record):
+        """Hide a file record as it is, returning (output path, key)"""
+        prepared = stego_core.prepare_payload(self.cover_path, record, stego_payload.FLAG_FILE)
+        image = stego_core.embed_prepared(stego_core.decode_cover(self.cover_path), prepared)
+        output_path = os.path.join(self.directory, "stego.png")
+        stego_output.save_image(image, output_path)
+        return output_path, prepared.key
+
+    def test_unique_path(self):
+        """Existing names get a number before their extension"""
+        first = stego_core.unique_path(self.output_dir, "notes.txt")
+        self.assertEqual(first, os.path.join(self.output_dir, "notes.txt"))
+        for number in (1, 2):
+            with open(stego_core.unique_path(self.output_dir, "notes.txt"), "wb"):
+                pass
+            self.assertEqual(stego_core.unique_path(self.output_dir, "notes.txt"),
+                             os.path.join(self.output_dir, f"notes ({number}).txt"))
+
+    def test_hide_and_extract_file(self):
+        """A hidden file extracts under its name without overwriting one already there"""
+        payload_path = os.path.join(self.directory, "notes.txt")
+        with open(payload_path, "wb") as payload_file:
+            payload_file.write(b"meet at noon\n" * 100)
+        existing = os.path.join(self.output_dir, "notes.txt")
+        with open(existing, "wb") as existing_file:
+            existing_file.write(b"keep me")
+        hidden = stego_core.hide_file(self.cover_path, payload_path,
+                                      os.path.join(self.directory, "stego.png"))
+        extracted = stego_core.extract_file(hidden.output_path, hidden.key, self.output_dir)
+        self.assertEqual(extracted, os.path.join(self.output_dir, "notes (1).txt"))
+        with open(extracted, "rb") as extracted_file:
+            self.assertEqual(extracted_file.read(), b"meet at noon\n" * 100)
+        with open(existing, "rb") as existing_file:
+            self.assertEqual(existing_file.read(), b"keep me")
+
+    def test_escaping_name(self):
+        """A crafted record naming a path outside the output directory is written inside it"""
+        for name in ("../../escaped.txt", "C:\\escaped.txt", "C:escaped.txt"):
+            with self.subTest(name=name):
+                output_path, key = self.hide_record(raw_record(name, b"payload"))
+                extracted = stego_core.extract_file(output_path, key, self.output_dir)
+                self.assertEqual(os.path.dirname(extracted), self.output_dir)
+                self.assertTrue(os.path.basename(extracted).startswith("escaped"))
+        self.assertEqual(sorted(os.listdir(self.directory)), ["cover.png", "out", "stego.png"])
+
+
+if __name__ == "__main__":
+    unittest.main()
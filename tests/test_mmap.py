@@ -0,0 +1,157 @@
+"""Raw-profile embedding into memory-mapped BMP, TIFF and .npy covers
+
+The patched copy must decode to exactly the pixels the decode, embed and
+re-encode path writes, and the cover itself must be left untouched.
+
+    python -m unittest discover tests
+"""
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+import stego_container  # noqa: E402
+import stego_core  # noqa: E402
+import stego_engine  # noqa: E402
+import stego_mmap  # noqa: E402
+# pylint: enable=wrong-import-position
+
+
+WIDTH, HEIGHT = 48, 40
+SEED = 1234
+
+# (cover extension, cover image mode, embedding mode); Pillow writes BMPs
+# bottom-up and reads 32-bit ones as RGB, and TIFFs here have 8-row strips
+COVERS = (
+    ("bmp", "RGB", "rgb-1"),
+    ("bmp", "RGBA", "rgb-2"),
+    ("tif", "RGB", "rgb-3"),
+    ("tif", "RGBA", "rgba-2"),
+    ("npy", "RGB", "rgb-1"),
+    ("npy", "RGBA", "rgba-1"),
+)
+STRIP_ROWS = (1, 3, 64)
+
+
+def write_cover(path, image_mode, seed=0):
+    """Write random pixels as an uncompressed BMP, multi-strip TIFF or .npy cover"""
+    shape = (HEIGHT, WIDTH, len(image_mode))
+    pixels = np.random.default_rng(seed).integers(0, 256, shape, dtype=np.uint8)
+    if path.endswith(".npy"):
+        np.save(path, pixels)
+    elif path.endswith(".tif"):
+        # Tag 278 is RowsPerStrip
+        Image.fromarray(pixels, image_mode).save(path, tiffinfo={278: 8})
+    else:
+        Image.fromarray(pixels, image_mode).save(path)
+    return path
+
+
+def decode(path):
+    """Decode a cover or stego-image the way the non-mapped path would"""
+    if path.endswith(".npy"):
+        return stego_engine.normalize_image(Image.fromarray(np.load(path)))
+    return stego_core.decode_cover(path)
+
+
+def file_hash(path):
+    """Return the SHA-256 of a file's contents"""
+    with open(path, "rb") as checked:
+        return hashlib.sha256(checked.read()).hexdigest()
+
+
+class MappedEmbedTest(unittest.TestCase):
+    """Patched copies match the decode/re-encode path and leave the cover alone"""
+
+    payload = bytes(range(256))[:200]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_probe(self):
+        """Every cover here maps, in the mode it decodes to"""
+        for extension, image_mode, _ in COVERS:
+            with self.subTest(cover=extension, image_mode=image_mode):
+                path = write_cover(os.path.join(self.directory, f"cover.{extension}"),
+                                   image_mode)
+                pixel_map = stego_mmap.probe(path)
+                self.assertIsNotNone(pixel_map)
+                self.assertEqual(pixel_map.mode, decode(path).mode)
+                self.assertEqual(pixel_map.bottom_up, extension == "bmp")
+
+    def test_compressed_not_mapped(self):
+        """Compressed and non-raw covers are refused by probe and by the raw profile"""
+        pixels = np.random.default_rng(0).integers(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+        for name, options in (("lzw.tif", {"compression": "tiff_lzw"}),
+                              ("deflate.tif", {"compression": "tiff_adobe_deflate"}),
+                              ("cover.png", {})):
+            with self.subTest(cover=name):
+                path = os.path.join(self.directory, name)
+                Image.fromarray(pixels).save(path, **options)
+                self.assertIsNone(stego_mmap.probe(path))
+                with self.assertRaises(ValueError):
+                    stego_core.hide_message(path, "Meet at noon",
+                                            os.path.join(self.directory, "out.tif"),
+                                            profile="raw")
+
+    def test_matches_decoded_embed(self):
+        """Sequential and scattered payloads match the in-memory embed for every strip size"""
+        for extension, image_mode, mode in COVERS:
+            cover_path = write_cover(os.path.join(self.directory, f"cover.{extension}"),
+                                     image_mode)
+            cover_hash = file_hash(cover_path)
+            for scatter in (False, True):
+                flags = stego_container.layout_flags(stego_core.mode_layout(mode))
+                flags |= stego_container.FLAG_SCATTER if scatter else 0
+                seed = SEED if scatter else None
+                expected = decode(cover_path)
+                stego_container.embed_payload(expected, self.payload, flags, seed=seed)
+                for strip_rows in STRIP_ROWS:
+                    with self.subTest(cover=extension, mode=mode, scatter=scatter,
+                                      strip_rows=strip_rows):
+                        output_path = os.path.join(self.directory, f"stego.{extension}")
+                        stego_mmap.embed_payload_file(cover_path, output_path, self.payload,
+                                                      flags, seed, strip_rows=strip_rows)
+                        np.testing.assert_array_equal(np.asarray(decode(output_path)),
+                                                      np.asarray(expected))
+                        self.assertEqual(os.path.getsize(output_path),
+                                         os.path.getsize(cover_path))
+                        header, payload = stego_mmap.extract_payload_file(output_path, seed)
+                        self.assertEqual((header.flags, payload), (flags, self.payload))
+            self.assertEqual(file_hash(cover_path), cover_hash)
+
+    def test_hide_message(self):
+        """The raw profile round-trips messages and never changes the cover"""
+        for extension, image_mode, mode in COVERS:
+            cover_path = write_cover(os.path.join(self.directory, f"cover.{extension}"),
+                                     image_mode)
+            cover_hash = file_hash(cover_path)
+            for scatter in (False, True):
+                with self.subTest(cover=extension, mode=mode, scatter=scatter):
+                    output_path = os.path.join(self.directory, f"stego_{scatter}.{extension}")
+                    hidden = stego_core.hide_message(cover_path, "Meet at noon", output_path,
+                                                     mode=mode, profile="raw", scatter=scatter)
+                    self.assertEqual(stego_core.extract_message(output_path, hidden.key),
+                                     "Meet at noon")
+                    self.assertEqual(file_hash(cover_path), cover_hash)
+
+    def test_output_is_not_cover(self):
+        """Patching the cover itself is refused"""
+        cover_path = write_cover(os.path.join(self.directory, "cover.bmp"), "RGB")
+        cover_hash = file_hash(cover_path)
+        with self.assertRaises(ValueError):
+            stego_mmap.embed_payload_file(cover_path, cover_path, self.payload)
+        self.assertEqual(file_hash(cover_path), cover_hash)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+"""Multi-bit and alpha-channel embedding modes
+
+    python -m unittest discover tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+import stego_container  # noqa: E402
+import stego_core  # noqa: E402
+import stego_engine  # noqa: E402
+# pylint: enable=wrong-import-position
+
+
+def noise_image(width, height, mode="RGB", seed=0):
+    """Return a random image, so no payload bit happens to match the cover"""
+    shape = (height, width, len(mode))
+    pixels = np.random.default_rng(seed).integers(0, 256, shape, dtype=np.uint8)
+    return Image.fromarray(pixels, mode)
+
+
+def image_mode(mode):
+    """Return the PIL image mode an embedding mode needs"""
+    return "RGBA" if mode.startswith("rgba") else "RGB"
+
+
+class ModeLayoutTest(unittest.TestCase):
+    """Mode names, layouts and the header flags that record them"""
+
+    def test_flags(self):
+        """Every mode's layout survives the header flags"""
+        for mode in stego_core.MODES:
+            with self.subTest(mode=mode):
+                layout = stego_core.mode_layout(mode)
+                self.assertEqual(stego_core.layout_mode(layout), mode)
+                flags = stego_container.layout_flags(layout)
+                self.assertEqual(stego_container.flags_layout(flags), layout)
+
+    def test_unknown_mode(self):
+        """Unknown modes and depths are refused"""
+        with self.assertRaises(ValueError):
+            stego_core.mode_layout("rgb-9")
+        with self.assertRaises(ValueError):
+            stego_container.layout_flags(stego_engine.Layout(3, 9))
+
+    def test_capacity(self):
+        """Other modes start on the pixel after the header and hold depth bits per channel"""
+        pixels = 100 * 100
+        base = stego_container.capacity_bits(pixels)
+        self.assertEqual(base, pixels * 3)
+        for mode in (mode for mode in stego_core.MODES if mode != stego_core.DEFAULT_MODE):
+            with self.subTest(mode=mode):
+                layout = stego_core.mode_layout(mode)
+                capacity = stego_container.capacity_bits(pixels, layout)
+                body = (pixels - stego_container.HEADER_PIXELS) * layout.channels * layout.depth
+                self.assertEqual(capacity, stego_container.HEADER_BITS + body)
+                self.assertGreater(capacity, base)
+
+
+class ModeRoundTripTest(unittest.TestCase):
+    """Payloads come back unchanged in every mode"""
+
+    payload = bytes(range(256)) * 3
+
+    def test_modes(self):
+        """Every embedding mode round-trips and records its layout in the flags"""
+        for mode in stego_core.MODES:
+            with self.subTest(mode=mode):
+                image = noise_image(64, 64, image_mode(mode))
+                flags = stego_container.layout_flags(stego_core.mode_layout(mode))
+                stego_container.embed_payload(image, self.payload, flags)
+                header, payload = stego_container.extract_payload(image)
+                self.assertEqual(header.flags, flags)
+                self.assertEqual(payload, self.payload)
+
+    def test_alpha_needs_alpha_channel(self):
+        """Alpha modes are refused for covers without an alpha channel"""
+        flags = stego_container.layout_flags(stego_core.mode_layout("rgba-1"))
+        with self.assertRaises(ValueError):
+            stego_container.embed_payload(noise_image(64, 64), self.payload, flags)
+
+    def test_hide_message(self):
+        """Messages hidden through the API in every mode extract without naming the mode"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        for mode in stego_core.MODES:
+            with self.subTest(mode=mode):
+                cover_path = os.path.join(directory, f"cover_{mode}.png")
+                noise_image(32, 32, image_mode(mode)).save(cover_path)
+                output_path = stego_core.default_output_path(cover_path, directory)
+                hidden = stego_core.hide_message(cover_path, "Meet at noon", output_path,
+                                                 mode=mode)
+                self.assertEqual(stego_core.extract_message(hidden.output_path, hidden.key),
+                                 "Meet at noon")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+"""Compression codecs, raw tokens and the fallbacks for images written by older versions
+
+Images written before the container header, and with format version 1,
+must keep decoding: their layouts are rebuilt here the way those versions
+wrote them.
+
+    python -m unittest discover tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import zlib
+
+import numpy as np
+from cryptography.fernet import Fernet
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+import stego_container  # noqa: E402
+import stego_core  # noqa: E402
+import stego_payload  # noqa: E402
+# pylint: enable=wrong-import-position
+
+
+TEXT = "Meet at the north gate at noon and bring the files. " * 40
+
+
+def incompressible(size, seed=0):
+    """Return random bytes no codec can shrink"""
+    return np.random.default_rng(seed).integers(0, 256, size, dtype=np.uint8).tobytes()
+
+
+def embed_bits(pixels, data):
+    """Write data MSB first into the RGB LSBs from the first pixel, as versions before 2 did"""
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+    flat = pixels.reshape(-1)
+    flat[:bits.size] = flat[:bits.size] & 0xFE | bits
+    return pixels
+
+
+class CodecTest(unittest.TestCase):
+    """Every registered codec, and the choice 'auto' makes between them"""
+
+    def test_round_trip(self):
+        """Each codec restores what it compressed and records its own id"""
+        data = TEXT.encode()
+        for codec in stego_payload.CODECS.values():
+            with self.subTest(codec=codec.name):
+                codec_id, body = stego_payload.compress(data, codec.name)
+                self.assertEqual(codec_id, codec.codec_id)
+                self.assertEqual(stego_payload.decompress(codec_id, body), data)
+
+    def test_auto_keeps_smallest(self):
+        """'auto' keeps whichever codec output is smallest"""
+        data = TEXT.encode()
+        codec_id, body = stego_payload.compress(data)
+        sizes = {
+            codec.codec_id: len(stego_payload.compress(data, codec.name)[1])
+            for codec in stego_payload.CODECS.values()
+        }
+        self.assertEqual(len(body), min(sizes.values()))
+        self.assertEqual(sizes[codec_id], len(body))
+        self.assertNotEqual(codec_id, stego_payload.CODEC_NONE)
+
+    def test_auto_falls_back_to_none(self):
+        """Data no codec shrinks is stored as-is, below and above the probe threshold"""
+        for size in (4096, stego_payload.PROBE_THRESHOLD + 1):
+            with self.subTest(size=size):
+                data = incompressible(size)
+                self.assertEqual(stego_payload.compress(data), (stego_payload.CODEC_NONE, data))
+
+    def test_unknown_codec(self):
+        """Unknown codec names, ids and out-of-range registrations are refused"""
+        with self.assertRaises(ValueError):
+            stego_payload.compress(b"data", "brotli")
+        with self.assertRaises(ValueError):
+            stego_payload.decompress(stego_payload.CODEC_MASK, b"data")
+        with self.assertRaises(ValueError):
+            stego_payload.register_codec(stego_payload.CODEC_MASK + 1, "spare", bytes, bytes)
+
+    def test_raw_token(self):
+        """A raw token converts back to the text token Fernet decrypts"""
+        token = Fernet(Fernet.generate_key()).encrypt(b"hello")
+        raw = stego_payload.raw_token(token)
+        self.assertEqual(len(raw), stego_core.token_size(len(b"hello")))
+        self.assertEqual(stego_payload.text_token(raw), token)
+
+
+class LegacyImageTest(unittest.TestCase):
+    """Images written before format version 2 still extract"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.key = stego_core.generate_key()
+        self.token = Fernet(self.key.encode()).encrypt(b"Meet at noon")
+        # The cover's own noisy LSBs follow the token, as in real images
+        rng = np.random.default_rng(0)
+        self.pixels = rng.integers(0, 256, (32, 32, 3), dtype=np.uint8)
+
+    def save(self, pixels, name):
+        """Save pixels as a PNG and a BMP, returning both paths"""
+        paths = [os.path.join(self.directory, name + extension) for extension in (".png", ".bmp")]
+        for path in paths:
+            Image.fromarray(pixels).save(path)
+        return paths
+
+    def test_version_1(self):
+        """Version 1 carries base64 token text behind a header with no flags"""
+        header = stego_container.HEADER.pack(
+            stego_container.MAGIC, 1, 0, len(self.token), zlib.crc32(self.token)
+        )
+        for path in self.save(embed_bits(self.pixels, header + self.token), "v1"):
+            with self.subTest(path=os.path.basename(path)):
+                header, payload = stego_core.extract_token(path)
+                self.assertEqual(header.version, 1)
+                self.assertEqual(payload, self.token)
+                self.assertEqual(stego_core.extract_message(path, self.key), "Meet at noon")
+
+    def test_headerless(self):
+        """Images from before the header carry only the token, cut where its base64 text ends"""
+        for path in self.save(embed_bits(self.pixels, self.token), "legacy"):
+            with self.subTest(path=os.path.basename(path)):
+                header, payload = stego_core.extract_token(path)
+                self.assertIsNone(header)
+                self.assertEqual(payload, self.token)
+                self.assertEqual(stego_core.extract_message(path, self.key), "Meet at noon")
+
+    def test_headerless_wrong_key(self):
+        """A wrong key for a headerless image is reported, not crashed on"""
+        path = self.save(embed_bits(self.pixels, self.token), "legacy")[0]
+        with self.assertRaises(ValueError):
+            stego_core.extract_message(path, stego_core.generate_key())
+
+
+if __name__ == "__main__":
+    unittest.main()
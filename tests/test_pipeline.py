@@ -0,0 +1,143 @@
+"""Staged pipelines: failing items, failing input, early exits and bounded queues
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+import stego_pipeline  # noqa: E402
+# pylint: enable=wrong-import-position
+
+
+# Longest a test waits for pipeline threads to reach an expected state
+SETTLE_SECONDS = 5.0
+
+
+def pipeline_threads():
+    """Return the pipeline threads still alive"""
+    return [thread for thread in threading.enumerate() if thread.name.startswith("stego-pipeline")]
+
+
+def wait_for(condition):
+    """Poll condition until it holds or SETTLE_SECONDS pass, returning its last value"""
+    deadline = time.monotonic() + SETTLE_SECONDS
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def counted(items, drawn):
+    """Yield items, appending each to drawn as the pipeline takes it"""
+    for item in items:
+        drawn.append(item)
+        yield item
+
+
+class PipelineTest(unittest.TestCase):
+    """Items, errors and threads of Pipeline.run"""
+
+    def setUp(self):
+        self.addCleanup(lambda: self.assertTrue(wait_for(lambda: not pipeline_threads())))
+
+    def test_results(self):
+        """Every item passes through every stage once"""
+        pipeline = stego_pipeline.Pipeline([
+            stego_pipeline.Stage("double", lambda value: value * 2, 3),
+            stego_pipeline.Stage("add", lambda value: value + 1, 2),
+        ])
+        results = list(pipeline.run(range(50)))
+        self.assertEqual(sorted((item, value) for item, value, _ in results),
+                         [(item, item * 2 + 1) for item in range(50)])
+        self.assertTrue(all(error is None for _, _, error in results))
+        self.assertEqual([stage["items"] for stage in pipeline.report()["stages"]], [50, 50])
+
+    def test_stage_error_skips_later_stages(self):
+        """An item whose stage raises leaves with its error and never reaches later stages"""
+        reached = []
+
+        def check(value):
+            if value % 5 == 0:
+                raise ValueError(f"bad item {value}")
+            return value
+
+        def record(value):
+            reached.append(value)
+            return value
+
+        pipeline = stego_pipeline.Pipeline([
+            stego_pipeline.Stage("check", check, 2), stego_pipeline.Stage("record", record, 2),
+        ])
+        results = {item: (value, error) for item, value, error in pipeline.run(range(20))}
+        self.assertEqual(sorted(results), list(range(20)))
+        for item, (value, error) in results.items():
+            if item % 5 == 0:
+                self.assertIsNone(value)
+                self.assertIsInstance(error, ValueError)
+            else:
+                self.assertEqual((value, error), (item, None))
+        self.assertEqual(sorted(reached), [item for item in range(20) if item % 5])
+        check_stats, record_stats = pipeline.report()["stages"]
+        self.assertEqual((check_stats["items"], check_stats["failed"]), (20, 4))
+        self.assertEqual((record_stats["items"], record_stats["failed"]), (16, 0))
+
+    def test_input_error_reraised(self):
+        """An exception from the input is raised after the items read before it"""
+        def items():
+            yield from range(5)
+            raise OSError("manifest unreadable")
+
+        pipeline = stego_pipeline.Pipeline([stego_pipeline.Stage("same", lambda value: value, 2)])
+        seen = []
+        with self.assertRaises(OSError):
+            for item, _, _ in pipeline.run(items()):
+                seen.append(item)
+        self.assertEqual(sorted(seen), list(range(5)))
+
+    def test_close_joins_threads(self):
+        """Closing the generator early stops and joins every thread, blocked ones included"""
+        def slow(value):
+            time.sleep(0.01)
+            return value
+
+        pipeline = stego_pipeline.Pipeline([
+            stego_pipeline.Stage("quick", lambda value: value, 2),
+            stego_pipeline.Stage("slow", slow, 1),
+        ], queue_size=1)
+        results = pipeline.run(range(1000))
+        next(results)
+        self.assertTrue(pipeline_threads())
+        results.close()
+        self.assertEqual(pipeline_threads(), [])
+        self.assertIsNotNone(pipeline.seconds)
+
+    def test_queue_bounds_in_flight(self):
+        """No more items are drawn than the workers and queues can hold"""
+        release = threading.Event()
+        self.addCleanup(release.set)
+        drawn = []
+        pipeline = stego_pipeline.Pipeline([
+            stego_pipeline.Stage("pass", lambda value: value, 2),
+            stego_pipeline.Stage("blocked", lambda value: release.wait() and value, 1),
+        ], queue_size=1)
+        # Each worker holds an item, each queue one more, and the feeder one it cannot place
+        bound = (2 + 1) + (1 + 1) + 1
+        results = pipeline.run(counted(range(100), drawn))
+        collected = []
+        consumer = threading.Thread(target=lambda: collected.extend(results), daemon=True)
+        consumer.start()
+        self.assertTrue(wait_for(lambda: len(drawn) >= bound))
+        time.sleep(0.3)
+        self.assertEqual(len(drawn), bound)
+        release.set()
+        consumer.join(SETTLE_SECONDS)
+        self.assertEqual(sorted(item for item, _, _ in collected), list(range(100)))
+
+
+if __name__ == "__main__":
+    unittest.main()
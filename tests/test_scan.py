@@ -0,0 +1,73 @@
+"""Header scanning and its index of results
+
+    python -m unittest discover tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+import stego_core  # noqa: E402
+import stego_scan  # noqa: E402
+# pylint: enable=wrong-import-position
+
+
+class ScanIndexTest(unittest.TestCase):
+    """Indexed results are reused for unchanged files, errors never are"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.images = os.path.join(self.directory, "images")
+        os.makedirs(self.images)
+        self.index_path = os.path.join(self.directory, "index.sqlite")
+        cover_path = os.path.join(self.images, "cover.png")
+        pixels = np.random.default_rng(0).integers(0, 256, (32, 32, 3), dtype=np.uint8)
+        Image.fromarray(pixels).save(cover_path)
+        stego_core.hide_message(cover_path, "Meet at noon",
+                                os.path.join(self.images, "stego.png"))
+        self.broken_path = os.path.join(self.images, "broken.png")
+        with open(self.broken_path, "wb") as broken:
+            broken.write(b"not an image")
+
+    def scan(self):
+        """Scan the image directory with the test index, returning {name: result} and the report"""
+        report = stego_scan.scan_tree([self.images], self.index_path, workers=1)
+        return {os.path.basename(result["path"]): result for result in report.results}, report
+
+    def test_errors_not_indexed(self):
+        """Unreadable files are reported but left out of the index and read again"""
+        results, report = self.scan()
+        self.assertIn("error", results["broken.png"])
+        self.assertTrue(results["stego.png"]["payload"])
+        self.assertFalse(results["cover.png"]["payload"])
+        self.assertEqual(report.scanned, 3)
+        with stego_scan.ScanIndex(self.index_path) as index:
+            indexed = index.entries(os.path.abspath(self.images))
+        self.assertEqual(sorted(os.path.basename(path) for path in indexed),
+                         ["cover.png", "stego.png"])
+        results, report = self.scan()
+        self.assertEqual(report.scanned, 1)
+        self.assertIn("error", results["broken.png"])
+
+    def test_cached_error_rescanned(self):
+        """An error stored by an older index is scanned again rather than reused"""
+        self.scan()
+        stat = os.stat(self.broken_path)
+        with stego_scan.ScanIndex(self.index_path) as index:
+            index.store({"path": os.path.abspath(self.broken_path), "payload": False,
+                         "error": "cached"}, stat)
+        results, report = self.scan()
+        self.assertEqual(report.scanned, 1)
+        self.assertNotEqual(results["broken.png"]["error"], "cached")
+
+
+if __name__ == "__main__":
+    unittest.main()
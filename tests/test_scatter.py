@@ -0,0 +1,96 @@
+"""Scattered embedding: round trips and the key-seeded slot order
+
+Images already written depend on this slot order, so the golden values
+must never change without a new format version.
+
+    python -m unittest discover tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+import stego_container  # noqa: E402
+import stego_core  # noqa: E402
+import stego_engine  # noqa: E402
+# pylint: enable=wrong-import-position
+
+
+# scatter_slots(1234, 10000, 16, start=50)
+GOLDEN_SLOTS = [
+    6940, 2643, 9350, 3520, 1062, 4156, 9385, 6237, 1630, 1021, 4834, 7412, 4879, 3510, 6271, 1263
+]
+
+# scatter_seed of a key of 43 "A"s and "="
+GOLDEN_SEED = 113909683966744582764238865418860229501534142622921211372995546213717355592828
+
+
+def noise_image(width, height, mode="RGB", seed=0):
+    """Return a random image, so no payload bit happens to match the cover"""
+    shape = (height, width, len(mode))
+    pixels = np.random.default_rng(seed).integers(0, 256, shape, dtype=np.uint8)
+    return Image.fromarray(pixels, mode)
+
+
+class ScatterRoundTripTest(unittest.TestCase):
+    """Scattered payloads come back with their seed and only with it"""
+
+    payload = bytes(range(256)) * 3
+
+    def test_scattered(self):
+        """Scattered payloads round-trip with their seed and fail with another"""
+        seed = stego_core.scatter_seed(stego_core.generate_key())
+        for mode in ("rgb-1", "rgba-2"):
+            with self.subTest(mode=mode):
+                image = noise_image(96, 96, "RGBA" if mode.startswith("rgba") else "RGB")
+                flags = stego_container.layout_flags(stego_core.mode_layout(mode))
+                flags |= stego_container.FLAG_SCATTER
+                stego_container.embed_payload(image, self.payload, flags, seed=seed)
+                header, payload = stego_container.extract_payload(image, seed)
+                self.assertTrue(stego_container.is_scattered(header))
+                self.assertEqual(payload, self.payload)
+                with self.assertRaises(stego_container.CorruptPayloadError):
+                    stego_container.extract_payload(image, seed + 1)
+
+    def test_hide_message(self):
+        """A scattered message extracts with its key alone and not with another key"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        cover_path = os.path.join(directory, "cover.png")
+        noise_image(64, 64).save(cover_path)
+        hidden = stego_core.hide_message(cover_path, "Meet at noon",
+                                         os.path.join(directory, "stego.png"), scatter=True)
+        self.assertEqual(stego_core.extract_message(hidden.output_path, hidden.key),
+                         "Meet at noon")
+        with self.assertRaises(ValueError):
+            stego_core.extract_message(hidden.output_path, stego_core.generate_key())
+
+
+class ScatterOrderTest(unittest.TestCase):
+    """The key-seeded slot order scattered payloads are written in"""
+
+    def test_slot_prefix(self):
+        """A fixed seed draws the same slots as always"""
+        self.assertEqual(stego_engine.scatter_slots(1234, 10000, 16, 50).tolist(), GOLDEN_SLOTS)
+
+    def test_prefix_stable(self):
+        """Longer draws extend shorter ones with distinct in-range slots"""
+        longer = stego_engine.scatter_slots(1234, 10000, 5000, 50)
+        self.assertEqual(longer[:16].tolist(), GOLDEN_SLOTS)
+        self.assertEqual(len(np.unique(longer)), longer.size)
+        self.assertTrue(((longer >= 50) & (longer < 10050)).all())
+
+    def test_key_seed(self):
+        """A key always maps to the same seed"""
+        self.assertEqual(stego_core.scatter_seed("A" * 43 + "="), GOLDEN_SEED)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,187 @@
+"""Strip-wise streaming embed/extract against the in-memory embed, pixel for pixel
+
+Covers are written with a chosen PNG filter type per row, so every filter
+type that refers to the row above (Up, Avg, Paeth) lands on the first row
+after a rewritten strip for some strip size.
+
+    python -m unittest discover tests
+"""
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import unittest
+import zlib
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+import stego_container  # noqa: E402
+import stego_core  # noqa: E402
+import stego_stream  # noqa: E402
+# pylint: enable=wrong-import-position
+
+
+WIDTH, HEIGHT = 40, 36
+STRIP_ROWS = (1, 2, 3, 7, 64)
+FILTER_TYPES = 5
+SEED = 1234
+
+
+def filter_row(kind, row, above, pixel_bytes):
+    """Encode one scanline with PNG filter type kind (0 None, 1 Sub, 2 Up, 3 Avg, 4 Paeth)"""
+    row = row.astype(np.int16)
+    above = above.astype(np.int16)
+    left = np.concatenate([np.zeros(pixel_bytes, np.int16), row[:-pixel_bytes]])
+    upper_left = np.concatenate([np.zeros(pixel_bytes, np.int16), above[:-pixel_bytes]])
+    if kind == 0:
+        predicted = np.zeros_like(row)
+    elif kind == 1:
+        predicted = left
+    elif kind == 2:
+        predicted = above
+    elif kind == 3:
+        predicted = (left + above) // 2
+    else:
+        estimate = left + above - upper_left
+        to_left = np.abs(estimate - left)
+        to_above = np.abs(estimate - above)
+        to_upper_left = np.abs(estimate - upper_left)
+        predicted = np.where(
+            (to_left <= to_above) & (to_left <= to_upper_left), left,
+            np.where(to_above <= to_upper_left, above, upper_left)
+        )
+    return bytes([kind]) + ((row - predicted) % 256).astype(np.uint8).tobytes()
+
+
+def write_png(path, pixels, filters):
+    """Write an 8-bit RGB/RGBA PNG with filters[row] as the filter type of each row"""
+    height, width, channels = pixels.shape
+    rows = pixels.reshape(height, -1)
+    above = np.zeros_like(rows[0])
+    scanlines = []
+    for row, kind in zip(rows, filters):
+        scanlines.append(filter_row(kind, row, above, channels))
+        above = row
+    chunks = [
+        (b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6 if channels == 4 else 2, 0, 0, 0)),
+        (b"IDAT", zlib.compress(b"".join(scanlines))),
+        (b"IEND", b""),
+    ]
+    with open(path, "wb") as png:
+        png.write(stego_stream.PNG_SIGNATURE)
+        for chunk_type, data in chunks:
+            png.write(struct.pack(">I4s", len(data), chunk_type) + data)
+            png.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(chunk_type))))
+    return path
+
+
+def cover_pixels(channels, seed=0):
+    """Return random cover pixels, so no payload bit happens to match the cover"""
+    shape = (HEIGHT, WIDTH, channels)
+    return np.random.default_rng(seed).integers(0, 256, shape, dtype=np.uint8)
+
+
+class StreamEmbedTest(unittest.TestCase):
+    """Streamed embedding writes the same pixels as decoding, embedding and re-encoding"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def check(self, mode, payload, scatter=False):
+        """Stream-embed into covers of every filter pattern and strip size, comparing pixels"""
+        layout = stego_core.mode_layout(mode)
+        flags = stego_container.layout_flags(layout)
+        if scatter:
+            flags |= stego_container.FLAG_SCATTER
+        seed = SEED if scatter else None
+        pixels = cover_pixels(layout.channels)
+        expected = Image.fromarray(pixels, "RGBA" if layout.channels == 4 else "RGB")
+        stego_container.embed_payload(expected, payload, flags, seed=seed)
+        for shift in range(FILTER_TYPES):
+            filters = [(row + shift) % FILTER_TYPES for row in range(HEIGHT)]
+            cover_path = write_png(os.path.join(self.directory, f"cover_{shift}.png"), pixels,
+                                   filters)
+            for strip_rows in STRIP_ROWS:
+                with self.subTest(mode=mode, filters=shift, strip_rows=strip_rows):
+                    self.check_strips(cover_path, strip_rows, expected, (payload, flags, seed))
+
+    def check_strips(self, cover_path, strip_rows, expected, container):
+        """Stream-embed a (payload, flags, seed) container into one cover and compare pixels"""
+        payload, flags, seed = container
+        output_path = os.path.join(self.directory, "stego.png")
+        stego_stream.embed_payload_file(cover_path, output_path, payload, strip_rows,
+                                        flags=flags, seed=seed)
+        with Image.open(output_path) as written:
+            np.testing.assert_array_equal(np.asarray(written), np.asarray(expected))
+        header, extracted = stego_stream.extract_payload_file(output_path, strip_rows, seed)
+        self.assertEqual(header.flags, flags)
+        self.assertEqual(extracted, payload)
+
+    def test_modes(self):
+        """Every embedding mode matches the in-memory embed"""
+        payload = bytes(range(256))[:160]
+        for mode in stego_core.MODES:
+            self.check(mode, payload)
+
+    def test_scattered(self):
+        """Scattered payloads, which touch rows all over the image, match too"""
+        payload = bytes(range(96))
+        for mode in ("rgb-1", "rgba-2"):
+            self.check(mode, payload, scatter=True)
+
+    def test_rows_below_payload(self):
+        """Rows after the payload keep their original filtered bytes"""
+        pixels = cover_pixels(3)
+        filters = [row % FILTER_TYPES for row in range(HEIGHT)]
+        cover_path = write_png(os.path.join(self.directory, "cover.png"), pixels, filters)
+        output_path = os.path.join(self.directory, "stego.png")
+        stego_stream.embed_payload_file(cover_path, output_path, b"short", 2)
+        with open(cover_path, "rb") as cover, open(output_path, "rb") as output:
+            cover_rows = stego_stream.PngReader(cover)
+            output_rows = stego_stream.PngReader(output)
+            cover_rows.read_rows(2)
+            output_rows.read_rows(2)
+            # The first untouched row is re-filtered as None; the rest are copied as-is
+            self.assertEqual(output_rows.read_rows(1)[0], 0)
+            cover_rows.read_rows(1)
+            self.assertEqual(output_rows.read_rows(HEIGHT - 3), cover_rows.read_rows(HEIGHT - 3))
+
+
+class StreamHideTest(unittest.TestCase):
+    """Streaming through the stego_core API"""
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+        self.cover_path = os.path.join(self.output_dir, "cover.png")
+        Image.fromarray(cover_pixels(3)).save(self.cover_path)
+
+    def test_round_trip(self):
+        """A message hidden strip by strip extracts again, sequential and scattered"""
+        for scatter in (False, True):
+            with self.subTest(scatter=scatter):
+                output_path = os.path.join(self.output_dir, f"stego_{scatter}.png")
+                hidden = stego_core.hide_message(self.cover_path, "Meet at noon", output_path,
+                                                 strip_rows=4, scatter=scatter)
+                self.assertEqual(stego_core.extract_message(output_path, hidden.key),
+                                 "Meet at noon")
+
+    def test_non_png_profile(self):
+        """Streaming refuses profiles that do not write PNG, before writing anything"""
+        for profile in ("webp", "tiff"):
+            with self.subTest(profile=profile):
+                output_path = os.path.join(self.output_dir, f"stego.{profile}")
+                with self.assertRaises(ValueError):
+                    stego_core.hide_message(self.cover_path, "Meet at noon", output_path,
+                                            strip_rows=4, profile=profile)
+                self.assertFalse(os.path.exists(output_path))
+
+
+if __name__ == "__main__":
+    unittest.main()